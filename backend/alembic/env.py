@@ -19,6 +19,9 @@ from app.database.base import Base
 from app.models.user import User
 from app.models.chat_session import ChatSession
 from app.models.message import Message
+from app.models.batch_job import BatchJob
+from app.models.session_archive import SessionArchive
+from app.models.content_dictionary import ContentDictionary
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,28 @@
+"""Add response cache opt-out flag to users
+
+Revision ID: 002_user_response_cache_opt_out
+Revises: 001_initial_migration
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '002_user_response_cache_opt_out'
+down_revision: Union[str, None] = '001_initial_migration'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users',
+        sa.Column('response_cache_opt_out', sa.Boolean(), server_default=sa.text('false'), nullable=False)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'response_cache_opt_out')
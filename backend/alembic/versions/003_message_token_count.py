@@ -0,0 +1,27 @@
+"""Store per-message token counts
+
+Revision ID: 003_message_token_count
+Revises: 002_user_response_cache_opt_out
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '003_message_token_count'
+down_revision: Union[str, None] = '002_user_response_cache_opt_out'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing rows stay NULL; the context builder estimates them from length
+    op.add_column('messages', sa.Column('token_count', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('messages', 'token_count')
@@ -0,0 +1,49 @@
+"""Add batch generation jobs
+
+Revision ID: 005_batch_jobs
+Revises: 004_chat_session_summary
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '005_batch_jobs'
+down_revision: Union[str, None] = '004_chat_session_summary'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('batch_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.Enum('PENDING', 'RUNNING', 'COMPLETED', 'FAILED', 'CANCELLED', name='batchjobstatus'), nullable=False),
+        sa.Column('use_cache', sa.Boolean(), server_default='true', nullable=False),
+        sa.Column('total_items', sa.Integer(), nullable=False),
+        sa.Column('completed_items', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('failed_items', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('claimed_by', sa.String(length=64), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_batch_jobs_id'), 'batch_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_batch_jobs_user_id'), 'batch_jobs', ['user_id'], unique=False)
+    op.create_index(op.f('ix_batch_jobs_status'), 'batch_jobs', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_batch_jobs_status'), table_name='batch_jobs')
+    op.drop_index(op.f('ix_batch_jobs_user_id'), table_name='batch_jobs')
+    op.drop_index(op.f('ix_batch_jobs_id'), table_name='batch_jobs')
+    op.drop_table('batch_jobs')
+    sa.Enum(name='batchjobstatus').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,26 @@
+"""Add completion status to messages
+
+Revision ID: 006_message_status
+Revises: 005_batch_jobs
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '006_message_status'
+down_revision: Union[str, None] = '005_batch_jobs'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('messages', sa.Column('status', sa.String(length=20), server_default='complete', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('messages', 'status')
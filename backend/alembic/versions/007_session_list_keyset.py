@@ -0,0 +1,36 @@
+"""Keyset index for session lists and per-user session counts
+
+Revision ID: 007_session_list_keyset
+Revises: 006_message_status
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '007_session_list_keyset'
+down_revision: Union[str, None] = '006_message_status'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Covers user_id lookups too, so the single-column index goes
+    op.create_index('ix_chat_sessions_user_updated', 'chat_sessions', ['user_id', 'updated_at', 'id'], unique=False)
+    op.drop_index('ix_chat_sessions_user_id', table_name='chat_sessions')
+
+    op.add_column('users', sa.Column('session_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute(
+        "UPDATE users SET session_count = "
+        "(SELECT count(*) FROM chat_sessions WHERE chat_sessions.user_id = users.id)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'session_count')
+    op.create_index('ix_chat_sessions_user_id', 'chat_sessions', ['user_id'], unique=False)
+    op.drop_index('ix_chat_sessions_user_updated', table_name='chat_sessions')
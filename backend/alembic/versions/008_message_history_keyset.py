@@ -0,0 +1,28 @@
+"""Keyset index for message history pages
+
+Revision ID: 008_message_history_keyset
+Revises: 007_session_list_keyset
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '008_message_history_keyset'
+down_revision: Union[str, None] = '007_session_list_keyset'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Covers session_id lookups too, so the single-column index goes
+    op.create_index('ix_messages_session_created', 'messages', ['session_id', 'created_at', 'id'], unique=False)
+    op.drop_index('ix_messages_session_id', table_name='messages')
+
+
+def downgrade() -> None:
+    op.create_index('ix_messages_session_id', 'messages', ['session_id'], unique=False)
+    op.drop_index('ix_messages_session_created', table_name='messages')
@@ -0,0 +1,79 @@
+"""Hash-partition messages by session
+
+Revision ID: 009_partition_messages
+Revises: 008_message_history_keyset
+Create Date: 2026-10-17 16:00:00.000000
+
+Rebuilds messages as a table partitioned by HASH (session_id), so every
+per-session query touches one partition and vacuum and index maintenance
+work on 1/PARTITIONS of the data at a time. The primary key becomes
+(id, session_id), as PostgreSQL requires the partition key in it; ids
+still come from the same sequence.
+
+Rows are copied inside the migration's transaction, which blocks writes
+to messages for the duration: run it in a maintenance window on large
+databases. PostgreSQL only; other databases keep the plain table.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '009_partition_messages'
+down_revision: Union[str, None] = '008_message_history_keyset'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PARTITIONS = 16
+
+
+def _finish_rebuild(new_table: str) -> None:
+    """Swap `new_table` in for messages and restore its keys and indexes"""
+    op.execute("DROP TABLE messages")
+    op.execute(f"ALTER TABLE {new_table} RENAME TO messages")
+    op.execute(f"ALTER INDEX {new_table}_pkey RENAME TO messages_pkey")
+    op.execute(
+        "ALTER TABLE messages ADD CONSTRAINT messages_session_id_fkey "
+        "FOREIGN KEY (session_id) REFERENCES chat_sessions (id) ON DELETE CASCADE"
+    )
+    op.create_index('ix_messages_id', 'messages', ['id'], unique=False)
+    op.create_index('ix_messages_session_created', 'messages', ['session_id', 'created_at', 'id'], unique=False)
+    op.execute("ALTER SEQUENCE messages_id_seq OWNED BY messages.id")
+
+
+def upgrade() -> None:
+    if op.get_context().dialect.name != 'postgresql':
+        return
+
+    # Keep the id sequence when the old table is dropped
+    op.execute("ALTER SEQUENCE messages_id_seq OWNED BY NONE")
+    op.execute(
+        "CREATE TABLE messages_partitioned ("
+        "LIKE messages INCLUDING DEFAULTS INCLUDING CONSTRAINTS, "
+        "PRIMARY KEY (id, session_id)"
+        ") PARTITION BY HASH (session_id)"
+    )
+    for remainder in range(PARTITIONS):
+        op.execute(
+            f"CREATE TABLE messages_p{remainder:02d} PARTITION OF messages_partitioned "
+            f"FOR VALUES WITH (MODULUS {PARTITIONS}, REMAINDER {remainder})"
+        )
+    op.execute("INSERT INTO messages_partitioned SELECT * FROM messages")
+    _finish_rebuild('messages_partitioned')
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name != 'postgresql':
+        return
+
+    op.execute("ALTER SEQUENCE messages_id_seq OWNED BY NONE")
+    op.execute(
+        "CREATE TABLE messages_unpartitioned ("
+        "LIKE messages INCLUDING DEFAULTS INCLUDING CONSTRAINTS, "
+        "PRIMARY KEY (id)"
+        ")"
+    )
+    op.execute("INSERT INTO messages_unpartitioned SELECT * FROM messages")
+    _finish_rebuild('messages_unpartitioned')
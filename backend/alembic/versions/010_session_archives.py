@@ -0,0 +1,100 @@
+"""Archive storage for idle chat sessions
+
+Revision ID: 010_session_archives
+Revises: 009_partition_messages
+Create Date: 2026-10-17 16:30:00.000000
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+import json
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+import zstandard
+
+
+# revision identifiers, used by Alembic.
+revision: str = '010_session_archives'
+down_revision: Union[str, None] = '009_partition_messages'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+# Archive records as of this revision: [id, role, content, token_count, status, created_at]
+ARCHIVED_COLUMNS = ('id', 'role', 'content', 'token_count', 'status', 'created_at')
+
+messages = sa.table(
+    'messages',
+    sa.column('id', sa.Integer()),
+    sa.column('session_id', sa.Integer()),
+    sa.column('role', sa.Enum('USER', 'ASSISTANT', name='messagerole')),
+    sa.column('content', sa.Text()),
+    sa.column('token_count', sa.Integer()),
+    sa.column('status', sa.String()),
+    sa.column('created_at', sa.DateTime(timezone=True)),
+)
+chat_sessions = sa.table(
+    'chat_sessions',
+    sa.column('id', sa.Integer()),
+    sa.column('archived_at', sa.DateTime(timezone=True)),
+)
+session_archives = sa.table(
+    'session_archives',
+    sa.column('session_id', sa.Integer()),
+    sa.column('data', sa.LargeBinary()),
+)
+
+
+def upgrade() -> None:
+    op.add_column('chat_sessions', sa.Column('archived_at', sa.DateTime(timezone=True), nullable=True))
+    # Archival candidates: live sessions by idle time
+    op.create_index(
+        'ix_chat_sessions_live_updated', 'chat_sessions', ['updated_at'], unique=False,
+        postgresql_where=sa.text('archived_at IS NULL'),
+        sqlite_where=sa.text('archived_at IS NULL')
+    )
+
+    op.create_table('session_archives',
+        sa.Column('session_id', sa.Integer(), nullable=False),
+        sa.Column('format_version', sa.Integer(), nullable=False),
+        sa.Column('message_count', sa.Integer(), nullable=False),
+        sa.Column('raw_bytes', sa.Integer(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['session_id'], ['chat_sessions.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('session_id')
+    )
+
+
+def downgrade() -> None:
+    # Archived sessions' messages exist only here: rehydrate them first
+    bind = op.get_bind()
+    decompressor = zstandard.ZstdDecompressor()
+    restored = 0
+    archives = bind.execute(sa.select(session_archives.c.session_id, session_archives.c.data)).all()
+    for archive in archives:
+        rows = []
+        for record in json.loads(decompressor.decompress(bytes(archive.data))):
+            row = dict(zip(ARCHIVED_COLUMNS, record))
+            row['session_id'] = archive.session_id
+            row['role'] = row['role'].upper()
+            if row['created_at'] is not None:
+                row['created_at'] = datetime.fromisoformat(row['created_at'])
+            rows.append(row)
+        if rows:
+            bind.execute(sa.insert(messages), rows)
+        bind.execute(
+            sa.update(chat_sessions)
+            .where(chat_sessions.c.id == archive.session_id)
+            .values(archived_at=None)
+        )
+        restored += 1
+    if restored:
+        logger.info(f'Rehydrated {restored} archived sessions')
+
+    op.drop_table('session_archives')
+    op.drop_index('ix_chat_sessions_live_updated', table_name='chat_sessions')
+    op.drop_column('chat_sessions', 'archived_at')
@@ -0,0 +1,167 @@
+"""Compressed storage for large message content
+
+Revision ID: 011_message_content_compression
+Revises: 010_session_archives
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+import logging
+import os
+
+from alembic import op
+import sqlalchemy as sa
+import zstandard
+
+
+# revision identifiers, used by Alembic.
+revision: str = '011_message_content_compression'
+down_revision: Union[str, None] = '010_session_archives'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+# Backfill parameters as of this revision (same environment variables as the app)
+ENABLED = os.environ.get('CONTENT_COMPRESSION_ENABLED', 'false').lower() in ('1', 'true', 'yes', 'on')
+MIN_BYTES = int(os.environ.get('CONTENT_COMPRESSION_MIN_BYTES', '1024'))
+LEVEL = int(os.environ.get('CONTENT_COMPRESSION_LEVEL', '6'))
+DICT_ID = 1
+DICT_SIZE = 64 * 1024
+MAX_SAMPLES = 20000
+MIN_SAMPLES = 200
+BATCH_SIZE = 1000
+
+messages = sa.table(
+    'messages',
+    sa.column('id', sa.Integer()),
+    sa.column('session_id', sa.Integer()),
+    sa.column('content', sa.Text()),
+    sa.column('content_zstd', sa.LargeBinary()),
+    sa.column('status', sa.String()),
+)
+content_dictionaries = sa.table(
+    'content_dictionaries',
+    sa.column('id', sa.Integer()),
+    sa.column('data', sa.LargeBinary()),
+    sa.column('sample_count', sa.Integer()),
+)
+
+
+def upgrade() -> None:
+    op.create_table('content_dictionaries',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('sample_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    op.add_column('messages', sa.Column('content_zstd', sa.LargeBinary(), nullable=True))
+    with op.batch_alter_table('messages') as batch_op:
+        batch_op.alter_column('content', existing_type=sa.Text(), nullable=True)
+        batch_op.create_check_constraint(
+            'ck_messages_content_stored_once', '(content IS NULL) <> (content_zstd IS NULL)'
+        )
+
+    # Backfill: train a dictionary on the existing messages, then compress
+    # those over the threshold (rerun later with scripts/compress_message_content.py)
+    if not ENABLED:
+        logger.info('CONTENT_COMPRESSION_ENABLED is false: existing messages left uncompressed')
+        return
+    bind = op.get_bind()
+    compressor = zstandard.ZstdCompressor(level=LEVEL, dict_data=_train_dictionary(bind))
+    update = (
+        sa.update(messages)
+        .where(messages.c.id == sa.bindparam('b_id'), messages.c.session_id == sa.bindparam('b_session_id'))
+        .values(content=None, content_zstd=sa.bindparam('b_content_zstd'))
+    )
+    compressed = 0
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(messages.c.id, messages.c.session_id, messages.c.content)
+            .where(
+                messages.c.id > last_id,
+                messages.c.status != 'streaming',
+                # Prefilter in characters (at most 4 bytes each)
+                sa.func.length(messages.c.content) * 4 >= MIN_BYTES
+            )
+            .order_by(messages.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        updates = []
+        for row in rows:
+            raw = row.content.encode('utf-8')
+            if len(raw) >= MIN_BYTES:
+                updates.append({
+                    'b_id': row.id, 'b_session_id': row.session_id, 'b_content_zstd': compressor.compress(raw)
+                })
+        if updates:
+            bind.execute(update, updates)
+            compressed += len(updates)
+    logger.info(f'Compressed {compressed} existing messages')
+
+
+def _train_dictionary(bind):
+    rows = bind.execute(
+        sa.select(messages.c.content)
+        .where(messages.c.status != 'streaming', sa.func.length(messages.c.content) >= MIN_BYTES)
+        .order_by(messages.c.id.desc())
+        .limit(MAX_SAMPLES)
+    ).all()
+    if len(rows) < MIN_SAMPLES:
+        logger.info(f'Not training a content dictionary: {len(rows)} of {MIN_SAMPLES} samples')
+        return None
+    try:
+        dictionary = zstandard.train_dictionary(
+            DICT_SIZE, [row.content.encode('utf-8') for row in rows], dict_id=DICT_ID, level=LEVEL
+        )
+    except zstandard.ZstdError as e:
+        logger.warning(f'Content dictionary training failed: {e}')
+        return None
+    bind.execute(sa.insert(content_dictionaries).values(
+        id=DICT_ID, data=dictionary.as_bytes(), sample_count=len(rows)
+    ))
+    return dictionary
+
+
+def downgrade() -> None:
+    # Decompress everything back into the text column first
+    bind = op.get_bind()
+    decompressors = {0: zstandard.ZstdDecompressor()}
+    for row in bind.execute(sa.select(content_dictionaries.c.id, content_dictionaries.c.data)):
+        decompressors[row.id] = zstandard.ZstdDecompressor(
+            dict_data=zstandard.ZstdCompressionDict(bytes(row.data))
+        )
+    restore = (
+        sa.update(messages)
+        .where(messages.c.id == sa.bindparam('b_id'), messages.c.session_id == sa.bindparam('b_session_id'))
+        .values(content=sa.bindparam('b_content'), content_zstd=None)
+    )
+    while True:
+        rows = bind.execute(
+            sa.select(messages.c.id, messages.c.session_id, messages.c.content_zstd)
+            .where(messages.c.content_zstd.is_not(None))
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        restored = []
+        for row in rows:
+            data = bytes(row.content_zstd)
+            decompressor = decompressors[zstandard.get_frame_parameters(data).dict_id]
+            restored.append({
+                'b_id': row.id, 'b_session_id': row.session_id,
+                'b_content': decompressor.decompress(data).decode('utf-8')
+            })
+        bind.execute(restore, restored)
+
+    with op.batch_alter_table('messages') as batch_op:
+        batch_op.drop_constraint('ck_messages_content_stored_once', type_='check')
+        batch_op.alter_column('content', existing_type=sa.Text(), nullable=False)
+    op.drop_column('messages', 'content_zstd')
+    op.drop_table('content_dictionaries')
@@ -1,9 +1,24 @@
 from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.session import get_db
 from app.models.user import User
 from app.dependencies import get_current_user
-from app.schemas.auth import UserResponse
+from app.schemas.auth import UserResponse, UserPreferencesUpdate
+from app.utils.logger import get_logger
 
 router = APIRouter(prefix="/api/users", tags=["Users"])
+logger = get_logger(__name__)
+
+
+def _user_response(user: User) -> UserResponse:
+    return UserResponse(
+        id=user.id,
+        username=user.username,
+        email=user.email,
+        is_active=user.is_active,
+        response_cache_opt_out=bool(user.response_cache_opt_out),
+        created_at=user.created_at.isoformat() if user.created_at else ""
+    )
 
 
 @router.get("/me", response_model=UserResponse, summary="Get Current User Profile")
@@ -13,10 +28,24 @@ async def get_user_profile(current_user: User = Depends(get_current_user)):
     
     Requires authentication via Bearer token.
     """
-    return UserResponse(
-        id=current_user.id,
-        username=current_user.username,
-        email=current_user.email,
-        is_active=current_user.is_active,
-        created_at=current_user.created_at.isoformat() if current_user.created_at else ""
-    )
+    return _user_response(current_user)
+
+
+@router.patch("/me/preferences", response_model=UserResponse, summary="Update Current User Preferences")
+async def update_user_preferences(
+    preferences: UserPreferencesUpdate,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Update current authenticated user's preferences.
+    
+    ## Request Body
+    - **response_cache_opt_out**: Opt out of the shared AI response cache
+    """
+    current_user.response_cache_opt_out = preferences.response_cache_opt_out
+    await db.commit()
+    await db.refresh(current_user)
+    
+    logger.info(f"Updated preferences for user {current_user.id}")
+    return _user_response(current_user)
@@ -0,0 +1 @@
+# Batch generation jobs module
@@ -0,0 +1,143 @@
+"""
+Batch generation job endpoints
+
+Upload a JSONL file of prompts, poll the job, and stream results back as
+JSONL while the job runs or after it finishes.
+"""
+
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.session import get_db
+from app.dependencies import get_current_user
+from app.models.user import User
+from app.schemas.batch import BatchJobResponse, BatchJobList
+from app.services import batch_service
+from app.services.batch_service import BatchInputError, get_batch_runner
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/batch", tags=["batch"])
+
+
+def _job_not_found() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail={
+            "message": "Batch job not found",
+            "code": "NOT_FOUND"
+        }
+    )
+
+
+@router.post("/jobs", response_model=BatchJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_job(
+    file: UploadFile = File(...),
+    use_cache: bool = True,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Create a batch job from a JSONL upload.
+    
+    Each line is an object with a required "message" and optional
+    "custom_id", "history" ([{"role", "content"}]) and "summary".
+    """
+    try:
+        job = await batch_service.create_batch_job(
+            db, current_user, file, use_cache=use_cache and not current_user.response_cache_opt_out
+        )
+    except BatchInputError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "message": str(e),
+                "code": "INVALID_BATCH_FILE"
+            }
+        )
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Failed to create batch job: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={
+                "message": "Failed to create batch job",
+                "code": "INTERNAL_ERROR"
+            }
+        )
+    
+    get_batch_runner().start(job.id)
+    return job
+
+
+@router.get("/jobs", response_model=BatchJobList)
+async def get_jobs(
+    limit: int = 20,
+    offset: int = 0,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get batch jobs for current user"""
+    jobs, total = await batch_service.get_user_jobs(db, current_user, limit, offset)
+    return BatchJobList(jobs=jobs, total=total, limit=limit, offset=offset)
+
+
+@router.get("/jobs/{job_id}", response_model=BatchJobResponse)
+async def get_job(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get batch job status and progress"""
+    job = await batch_service.get_job(db, job_id, current_user)
+    if not job:
+        raise _job_not_found()
+    return job
+
+
+@router.get("/jobs/{job_id}/results")
+async def get_job_results(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Stream job results as JSONL, in completion order.
+    
+    Each line has "index" (0-based input line), "custom_id", "status"
+    ("ok" or "error") and "response" or "error". Results written so far
+    are returned while the job is still running.
+    """
+    job = await batch_service.get_job(db, job_id, current_user)
+    if not job:
+        raise _job_not_found()
+    
+    return StreamingResponse(
+        batch_service.iter_results(job.id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="batch-{job.id}-results.jsonl"'}
+    )
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=BatchJobResponse)
+async def cancel_job(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Cancel a pending or running batch job; results so far are kept"""
+    job = await batch_service.get_job(db, job_id, current_user)
+    if not job:
+        raise _job_not_found()
+    
+    if not await get_batch_runner().cancel(db, job):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "message": f"Batch job is already {job.status.value}",
+                "code": "JOB_NOT_ACTIVE"
+            }
+        )
+    return job
@@ -0,0 +1,413 @@
+"""
+Chat session event bus
+
+Generations publish their frames ("user_message", "chunk", "done",
+"cancelled", "error") per chat session; any number of sockets can watch a
+session and receive them, without extra LLM calls or database polling.
+
+Delivery within a worker is direct. With a transport, events are also
+relayed to other workers:
+- PostgresTransport: LISTEN/NOTIFY on the application database
+- MemoryTransport: an in-memory broker shared by several buses, standing
+  in for the network when testing multi-worker fan-out in one process
+
+Relaying never blocks the publisher: events go into a bounded outbox that
+a sender task drains, packing everything queued into as few payloads as
+fit (so a fast generation costs one NOTIFY per round trip, not per token).
+Workers announce which sessions they watch, and events are only relayed
+for sessions some other worker is watching. A watcher on another worker
+receives events from the moment its announcement arrives.
+"""
+
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set
+import asyncio
+import json
+import uuid
+import logging
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY payloads must stay below 8000 bytes
+MAX_NOTIFY_BYTES = 7900
+
+
+class EventTransport:
+    """Relays encoded events between workers"""
+
+    async def start(
+        self,
+        on_message: Callable[[str], None],
+        on_connect: Optional[Callable[[], None]] = None
+    ) -> None:
+        """
+        Begin delivering payloads published by any worker to `on_message`;
+        `on_connect` is called after every (re)connection
+        """
+        raise NotImplementedError
+
+    async def send(self, payload: str) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryBroker:
+    """Shared in-memory "network" for MemoryTransport"""
+
+    def __init__(self):
+        self.transports: Set["MemoryTransport"] = set()
+
+
+class MemoryTransport(EventTransport):
+    """In-process stand-in for a network transport"""
+
+    def __init__(self, broker: MemoryBroker):
+        self.broker = broker
+        self._on_message: Optional[Callable[[str], None]] = None
+
+    async def start(
+        self,
+        on_message: Callable[[str], None],
+        on_connect: Optional[Callable[[], None]] = None
+    ) -> None:
+        self._on_message = on_message
+        self.broker.transports.add(self)
+        if on_connect is not None:
+            on_connect()
+
+    async def send(self, payload: str) -> None:
+        for transport in list(self.broker.transports):
+            # Deliver on a later loop iteration, like a real network would
+            asyncio.get_running_loop().call_soon(transport._on_message, payload)
+
+    async def close(self) -> None:
+        self.broker.transports.discard(self)
+
+
+class PostgresTransport(EventTransport):
+    """LISTEN/NOTIFY over a dedicated asyncpg connection"""
+
+    def __init__(self, dsn: str, channel: str, reconnect_seconds: float = 2.0):
+        self.dsn = dsn
+        self.channel = channel
+        self.reconnect_seconds = reconnect_seconds
+        self._connection = None
+        self._lock = asyncio.Lock()
+        self._on_message: Optional[Callable[[str], None]] = None
+        self._on_connect: Optional[Callable[[], None]] = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    async def start(
+        self,
+        on_message: Callable[[str], None],
+        on_connect: Optional[Callable[[], None]] = None
+    ) -> None:
+        self._on_message = on_message
+        self._on_connect = on_connect
+        await self._connect()
+
+    async def _connect(self) -> None:
+        import asyncpg
+
+        connection = await asyncpg.connect(self.dsn)
+        await connection.add_listener(self.channel, self._notified)
+        connection.add_termination_listener(self._terminated)
+        self._connection = connection
+        logger.info(f"Event bus listening on channel {self.channel}")
+        if self._on_connect is not None:
+            self._on_connect()
+
+    def _notified(self, connection, pid, channel, payload: str) -> None:
+        self._on_message(payload)
+
+    def _terminated(self, connection) -> None:
+        if self._closed or self._reconnect_task is not None:
+            return
+        logger.warning("Event bus connection lost; reconnecting")
+        self._connection = None
+        self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        try:
+            while not self._closed:
+                try:
+                    await self._connect()
+                    return
+                except Exception as e:
+                    logger.warning(f"Event bus reconnect failed: {e}")
+                    await asyncio.sleep(self.reconnect_seconds)
+        finally:
+            self._reconnect_task = None
+
+    async def send(self, payload: str) -> None:
+        if self._connection is None:
+            logger.debug("Event bus disconnected; event not relayed")
+            return
+        async with self._lock:
+            try:
+                await self._connection.execute("SELECT pg_notify($1, $2)", self.channel, payload)
+            except Exception as e:
+                logger.warning(f"Failed to relay event: {e}")
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+
+class EventsDroppedError(Exception):
+    """A watcher fell too far behind and its subscription was ended"""
+
+
+class _Subscription:
+    def __init__(self, maxsize: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = False
+
+
+class SessionEventBus:
+    """
+    Per-session fan-out of generation frames.
+
+    Events from this worker are delivered to local watchers directly and
+    relayed through the transport (if any) to workers watching the
+    session; events relayed back to their origin are ignored.
+    """
+
+    def __init__(
+        self,
+        transport: Optional[EventTransport] = None,
+        subscriber_buffer: int = 1000,
+        relay_buffer: int = 10000
+    ):
+        self.transport = transport
+        self.subscriber_buffer = subscriber_buffer
+        self.node_id = uuid.uuid4().hex
+        self._subscriptions: Dict[int, Set[_Subscription]] = {}
+        # Sessions watched on other workers, by node ID
+        self._remote_watchers: Dict[int, Set[str]] = {}
+        self._outbox: asyncio.Queue = asyncio.Queue(maxsize=relay_buffer)
+        self._sender: Optional[asyncio.Task] = None
+        self.published = 0
+        self.received = 0
+        self.dropped_subscriptions = 0
+        self.relayed = 0
+        self.relay_payloads = 0
+        self.relay_skipped = 0
+        self.relay_dropped = 0
+
+    async def start(self) -> None:
+        if self.transport is not None:
+            self._sender = asyncio.create_task(self._send_loop())
+            await self.transport.start(self._on_message, self._announce)
+
+    async def close(self) -> None:
+        if self.transport is None:
+            return
+        if self._sender is not None:
+            self._sender.cancel()
+            await asyncio.gather(self._sender, return_exceptions=True)
+            self._sender = None
+        # Flush what is queued, then tell the others we are gone
+        self._outbox_put({"bye": True})
+        await self._send_queued()
+        await self.transport.close()
+
+    async def publish(self, session_id: int, event: Dict[str, Any]) -> None:
+        """Deliver an event to every watcher of the session, on every worker"""
+        self.published += 1
+        self._deliver(session_id, event)
+        if self.transport is None:
+            return
+        if not self._remote_watchers.get(session_id):
+            self.relay_skipped += 1
+            return
+        self._outbox_put({"session_id": session_id, "event": event})
+
+    def subscribe(self, session_id: int) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Watch a session's events from now on.
+
+        The subscription is registered before this returns. The iterator
+        raises EventsDroppedError if the watcher falls `subscriber_buffer`
+        events behind.
+        """
+        subscription = _Subscription(self.subscriber_buffer)
+        if session_id not in self._subscriptions and self.transport is not None:
+            self._outbox_put({"watch": session_id})
+        self._subscriptions.setdefault(session_id, set()).add(subscription)
+        return self._drain(session_id, subscription)
+
+    async def _drain(self, session_id: int, subscription: _Subscription) -> AsyncIterator[Dict[str, Any]]:
+        try:
+            while True:
+                event = await subscription.queue.get()
+                if subscription.dropped:
+                    raise EventsDroppedError(f"Watcher of session {session_id} fell behind")
+                yield event
+        finally:
+            watchers = self._subscriptions.get(session_id)
+            if watchers is not None:
+                watchers.discard(subscription)
+                if not watchers:
+                    del self._subscriptions[session_id]
+                    if self.transport is not None:
+                        self._outbox_put({"unwatch": session_id})
+
+    def _deliver(self, session_id: int, event: Dict[str, Any]) -> None:
+        for subscription in list(self._subscriptions.get(session_id, ())):
+            if subscription.dropped:
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # The queue is full, so the watcher sees this on its next read
+                subscription.dropped = True
+                self.dropped_subscriptions += 1
+
+    def _announce(self) -> None:
+        """On (re)connect: ask the others what they watch, and say what we watch"""
+        self._outbox_put({"hello": True})
+        for session_id in self._subscriptions:
+            self._outbox_put({"watch": session_id})
+
+    def _outbox_put(self, item: Dict[str, Any]) -> None:
+        try:
+            self._outbox.put_nowait(item)
+        except asyncio.QueueFull:
+            # Remote watchers miss these chunks; "done" still carries the message
+            self.relay_dropped += 1
+
+    async def _send_loop(self) -> None:
+        while True:
+            # Wait for work, then send everything queued meanwhile together
+            item = await self._outbox.get()
+            await self._send_queued([item])
+
+    async def _send_queued(self, items: Optional[List[Dict[str, Any]]] = None) -> None:
+        items = items or []
+        while not self._outbox.empty():
+            items.append(self._outbox.get_nowait())
+        for payload in self._pack(items):
+            await self.transport.send(payload)
+            self.relay_payloads += 1
+
+    def _pack(self, items: List[Dict[str, Any]]) -> List[str]:
+        """Encode items into as few payloads under MAX_NOTIFY_BYTES as possible"""
+        prefix = '{"origin": %s, "items": [' % json.dumps(self.node_id)
+        budget = MAX_NOTIFY_BYTES - len(prefix) - 2
+        payloads, parts, size = [], [], 0
+        for item in items:
+            part = self._encode(item, budget)
+            part_size = len(part.encode("utf-8")) + 1
+            if parts and size + part_size > budget:
+                payloads.append(prefix + ",".join(parts) + "]}")
+                parts, size = [], 0
+            parts.append(part)
+            size += part_size
+            if "event" in item:
+                self.relayed += 1
+        if parts:
+            payloads.append(prefix + ",".join(parts) + "]}")
+        return payloads
+
+    def _encode(self, item: Dict[str, Any], budget: int) -> str:
+        part = json.dumps(item)
+        event = item.get("event")
+        if event is not None and len(part.encode("utf-8")) > budget and "message" in event:
+            # Too large to relay whole: watchers can load the saved message
+            event = {**event, "message": {**event["message"], "content": None}, "content_omitted": True}
+            part = json.dumps({**item, "event": event})
+        return part
+
+    def _on_message(self, payload: str) -> None:
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            logger.warning("Ignoring malformed event payload")
+            return
+        origin = message.get("origin")
+        if origin == self.node_id:
+            return
+        for item in message.get("items", ()):
+            if "event" in item:
+                self.received += 1
+                self._deliver(item["session_id"], item["event"])
+            elif "watch" in item:
+                self._remote_watchers.setdefault(item["watch"], set()).add(origin)
+            elif "unwatch" in item:
+                self._forget_watcher(item["unwatch"], origin)
+            elif "hello" in item:
+                # A worker (re)connected: tell it what we watch
+                for session_id in self._subscriptions:
+                    self._outbox_put({"watch": session_id})
+            elif "bye" in item:
+                for session_id in list(self._remote_watchers):
+                    self._forget_watcher(session_id, origin)
+
+    def _forget_watcher(self, session_id: int, origin: str) -> None:
+        nodes = self._remote_watchers.get(session_id)
+        if nodes is not None:
+            nodes.discard(origin)
+            if not nodes:
+                del self._remote_watchers[session_id]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "transport": type(self.transport).__name__ if self.transport else None,
+            "watched_sessions": len(self._subscriptions),
+            "watchers": sum(len(s) for s in self._subscriptions.values()),
+            "remotely_watched_sessions": len(self._remote_watchers),
+            "published": self.published,
+            "received": self.received,
+            "dropped_subscriptions": self.dropped_subscriptions,
+            "relayed": self.relayed,
+            "relay_payloads": self.relay_payloads,
+            "relay_skipped": self.relay_skipped,
+            "relay_dropped": self.relay_dropped,
+            "relay_queued": self._outbox.qsize(),
+        }
+
+
+def create_event_transport(backend: Optional[str] = None) -> Optional[EventTransport]:
+    """
+    Build the cross-worker transport for a backend.
+
+    Args:
+        backend: "local" (no transport) or "postgres" (defaults to
+            settings.event_bus_backend)
+
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    backend = (backend or settings.event_bus_backend).lower()
+    if backend == "local":
+        return None
+    if backend == "postgres":
+        url = settings.event_bus_database_url or settings.database_url
+        dsn = url.replace("postgresql+asyncpg://", "postgresql://", 1)
+        return PostgresTransport(dsn, settings.event_bus_channel)
+    raise ValueError(f"Unknown event bus backend: {backend}")
+
+
+# Singleton instance
+_event_bus = None
+
+
+def get_event_bus() -> SessionEventBus:
+    """Get or create singleton event bus instance"""
+    global _event_bus
+    if _event_bus is None:
+        _event_bus = SessionEventBus(
+            create_event_transport(),
+            subscriber_buffer=settings.event_bus_subscriber_buffer,
+            relay_buffer=settings.event_bus_relay_buffer
+        )
+    return _event_bus
@@ -0,0 +1,120 @@
+"""
+Write-through persistence of streaming assistant responses
+
+The assistant message row is created in the "streaming" state before the
+first token. Chunks are collected in a list (joined once at the end) and
+the new text is appended to the row every few KB or seconds, so a worker
+crash loses at most one checkpoint interval of the response.
+"""
+
+from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import time
+import logging
+
+from app.config import settings
+from app.models.message import Message, MessageStatus
+from app.services import chat_service
+
+logger = logging.getLogger(__name__)
+
+
+class StreamingMessageWriter:
+    """
+    Accumulates a streamed response and checkpoints it to its message row.
+
+    Checkpoints run in the background so they never delay chunk delivery;
+    at most one is in flight, and the database session is not used for
+    anything else until finish() or discard().
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        message: Message,
+        checkpoint_bytes: Optional[int] = None,
+        checkpoint_seconds: Optional[float] = None
+    ):
+        self.db = db
+        self.message = message
+        self.checkpoint_bytes = (
+            settings.message_checkpoint_bytes if checkpoint_bytes is None else checkpoint_bytes
+        )
+        self.checkpoint_seconds = (
+            settings.message_checkpoint_seconds if checkpoint_seconds is None else checkpoint_seconds
+        )
+        self._parts: List[str] = []
+        self._persisted = 0  # Parts already written to the row
+        self._pending_bytes = 0
+        self._last_checkpoint = time.monotonic()
+        self._checkpoint: Optional[asyncio.Task] = None
+        self.checkpoints = 0
+
+    @classmethod
+    async def start(cls, db: AsyncSession, session_id: int) -> "StreamingMessageWriter":
+        """Create the assistant message in the "streaming" state and commit it"""
+        message = await chat_service.save_message(
+            db, session_id, "assistant", "", status=MessageStatus.STREAMING.value
+        )
+        return cls(db, message)
+
+    @property
+    def has_content(self) -> bool:
+        return bool(self._parts)
+
+    def append(self, chunk: str) -> None:
+        """Add a chunk, starting a checkpoint if one is due"""
+        self._parts.append(chunk)
+        self._pending_bytes += len(chunk.encode("utf-8"))
+
+        if self._checkpoint is not None and not self._checkpoint.done():
+            return
+        due = (
+            (self.checkpoint_bytes and self._pending_bytes >= self.checkpoint_bytes)
+            or (self.checkpoint_seconds and time.monotonic() - self._last_checkpoint >= self.checkpoint_seconds)
+        )
+        if due:
+            self._checkpoint = asyncio.create_task(self._write_checkpoint())
+
+    async def _write_checkpoint(self) -> None:
+        end = len(self._parts)
+        delta = "".join(self._parts[self._persisted:end])
+        self._pending_bytes = 0
+        self._last_checkpoint = time.monotonic()
+        try:
+            await chat_service.save_message_content(self.db, self.message, delta)
+            self._persisted = end
+            self.checkpoints += 1
+        except Exception as e:
+            # The final write stores the full content anyway
+            logger.warning(f"Failed to checkpoint message {self.message.id}: {e}")
+            await self.db.rollback()
+
+    async def _settle(self) -> None:
+        """Wait for an in-flight checkpoint so the session is free"""
+        if self._checkpoint is not None:
+            # Shielded: a second cancel must not abort a commit half way
+            await asyncio.shield(self._checkpoint)
+            self._checkpoint = None
+
+    async def finish(self, status: str = MessageStatus.COMPLETE.value) -> Message:
+        """
+        Store the full content and final status, and bump the session's
+        updated_at.
+
+        Args:
+            status: "complete" or "truncated"
+
+        Returns:
+            The finished Message
+        """
+        await self._settle()
+        return await chat_service.save_finished_message(
+            self.db, self.message, "".join(self._parts), status
+        )
+
+    async def discard(self) -> None:
+        """Delete the message (nothing was generated)"""
+        await self._settle()
+        await chat_service.delete_message(self.db, self.message)
@@ -2,11 +2,13 @@
 Chat endpoints for session and message management
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 
-from app.database.session import get_db
+from app.config import settings
+from app.database.session import AsyncSessionLocal, get_db, set_session_user
 from app.dependencies import get_current_user
 from app.models.user import User
 from app.schemas.chat import (
@@ -15,12 +17,19 @@ from app.schemas.chat import (
     ChatSessionResponse,
     ChatSessionWithMessages,
     ChatSessionList,
+    MessagePage,
     MessageCreate,
     ChatMessagePair,
     MessageResponse
 )
-from app.services import chat_service
+from app.services import chat_service, chat_turn, summary_service
 from app.services.langchain_service import get_langchain_service
+from app.services.llm_pool import is_rate_limit_error
+from app.services.admission import (
+    AdmissionQueueFullError,
+    AdmissionTimeoutError,
+    get_admission_controller
+)
 import logging
 
 logger = logging.getLogger(__name__)
@@ -51,19 +60,36 @@ async def create_session(
 
 @router.get("/sessions", response_model=ChatSessionList)
 async def get_sessions(
-    limit: int = 20,
-    offset: int = 0,
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    offset: int = Query(default=0, ge=0),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get all chat sessions for current user"""
+    """
+    Get the current user's chat sessions, most recently updated first.
+    
+    Follow `next_cursor` for further pages; `offset` is still accepted
+    for older clients but slows down with depth.
+    """
     try:
-        sessions, total = await chat_service.get_user_sessions(db, current_user, limit, offset)
+        sessions, total, next_cursor = await chat_service.get_user_sessions(
+            db, current_user, limit, cursor=cursor, offset=offset
+        )
         return ChatSessionList(
             sessions=sessions,
             total=total,
             limit=limit,
-            offset=offset
+            offset=offset,
+            next_cursor=next_cursor
+        )
+    except chat_service.InvalidCursorError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "message": str(e),
+                "code": "INVALID_CURSOR"
+            }
         )
     except Exception as e:
         logger.error(f"Failed to get sessions: {e}")
@@ -82,7 +108,12 @@ async def get_session(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get a chat session with all messages"""
+    """
+    Get a chat session with all messages.
+    
+    Loads the whole history at once; for long sessions use the paginated
+    /messages or the NDJSON /messages/stream endpoints.
+    """
     try:
         session = await chat_service.get_session_with_messages(db, session_id, current_user)
         
@@ -110,6 +141,98 @@ async def get_session(
         )
 
 
+@router.get("/sessions/{session_id}/messages", response_model=MessagePage)
+async def get_messages(
+    session_id: int,
+    limit: int = Query(default=50, ge=1, le=200),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get a page of a session's messages, oldest first.
+    
+    Without cursors this is the newest page; follow `before_cursor` to
+    scroll back and `after_cursor` to catch up.
+    """
+    try:
+        session = await chat_service.get_session_by_id(db, session_id, current_user)
+        
+        if not session:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail={
+                    "message": "Chat session not found",
+                    "code": "NOT_FOUND"
+                }
+            )
+        
+        messages, has_more = await chat_service.get_message_page(
+            db, session_id, limit, before=before, after=after
+        )
+        return MessagePage(
+            messages=messages,
+            has_more=has_more,
+            before_cursor=chat_service.encode_cursor(messages[0].created_at, messages[0].id) if messages else None,
+            after_cursor=chat_service.encode_cursor(messages[-1].created_at, messages[-1].id) if messages else None
+        )
+    
+    except HTTPException:
+        raise
+    except chat_service.InvalidCursorError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "message": str(e),
+                "code": "INVALID_CURSOR"
+            }
+        )
+    except Exception as e:
+        logger.error(f"Failed to get messages: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={
+                "message": "Failed to retrieve messages",
+                "code": "INTERNAL_ERROR"
+            }
+        )
+
+
+@router.get("/sessions/{session_id}/messages/stream")
+async def stream_messages(
+    session_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Stream a session's full history as NDJSON (one message per line),
+    read from a server-side cursor so memory stays flat for any length.
+    """
+    session = await chat_service.get_session_by_id(db, session_id, current_user)
+    
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={
+                "message": "Chat session not found",
+                "code": "NOT_FOUND"
+            }
+        )
+    
+    async def lines():
+        # Own session: the request's is released before the body is sent
+        async with AsyncSessionLocal() as stream_db:
+            set_session_user(stream_db, current_user.id)
+            async for rows in chat_service.stream_session_messages(stream_db, session_id):
+                yield "".join(
+                    MessageResponse.model_validate(row).model_dump_json() + "\n"
+                    for row in rows
+                )
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
 @router.patch("/sessions/{session_id}", response_model=ChatSessionResponse)
 async def update_session(
     session_id: int,
@@ -188,12 +311,18 @@ async def send_message(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Send a message and get AI response"""
+    """
+    Send a message and get AI response.
+    
+    The database work is two statements: one checks ownership, stores the
+    user message and loads the history; one stores the response and bumps
+    the session. Neither holds a connection during generation.
+    """
     try:
-        # Verify session ownership
-        session = await chat_service.get_session_by_id(db, session_id, current_user)
+        # Ownership check + user message + history (committed)
+        turn = await chat_turn.begin_turn(db, current_user, session_id, message_data.content)
         
-        if not session:
+        if turn is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail={
@@ -202,59 +331,60 @@ async def send_message(
                 }
             )
         
-        # Save user message
-        user_message = await chat_service.create_message(
-            db, session_id, "user", message_data.content
-        )
+        conversation = turn.context
         
         try:
-            # Load conversation history (last 20 messages for context)
-            history_messages = await chat_service.get_session_messages(db, session_id, limit=20)
-            
-            # Format history for LangChain (exclude the just-added user message)
-            chat_history = [
-                {"role": msg.role, "content": msg.content}
-                for msg in history_messages
-                if msg.id != user_message.id
-            ]
-            
-            # Generate AI response
             langchain_service = get_langchain_service()
-            ai_response = await langchain_service.generate_response(
-                message_data.content,
-                chat_history
+            context = langchain_service.build_context(
+                message_data.content, conversation.history, conversation.summary
             )
             
-            # Save AI message
-            assistant_message = await chat_service.create_message(
-                db, session_id, "assistant", ai_response
-            )
+            # Generate AI response once admitted to an LLM slot
+            async with get_admission_controller().slot(
+                current_user.id, timeout=settings.llm_queue_timeout_seconds
+            ):
+                ai_response = await langchain_service.generate_response(
+                    message_data.content,
+                    context.history,
+                    use_cache=not current_user.response_cache_opt_out,
+                    summary=conversation.summary
+                )
             
-            # Update session timestamp
-            await chat_service.update_session_timestamp(db, session)
+            # Save AI message and update session timestamp (committed)
+            assistant_message = await chat_turn.finish_turn(db, session_id, ai_response)
             
-            # Commit all changes
-            await db.commit()
-            await db.refresh(user_message)
-            await db.refresh(assistant_message)
+            summary_service.schedule_summary_update(session_id)
             
             logger.info(f"Successfully processed message in session {session_id}")
             
             return ChatMessagePair(
-                user_message=user_message,
-                assistant_message=assistant_message
+                user_message=turn.user_message,
+                assistant_message=assistant_message,
+                context_tokens=context.total_tokens
             )
         
         except Exception as ai_error:
-            # Even if AI fails, keep the user message
-            await db.commit()
-            await db.refresh(user_message)
-            
+            # The user message is already committed
             logger.error(f"AI generation failed: {ai_error}", exc_info=True)
             
-            # Check for specific OpenAI errors
-            error_message = str(ai_error)
-            if "rate_limit" in error_message.lower():
+            # Check for admission queue and specific OpenAI errors
+            if isinstance(ai_error, AdmissionTimeoutError):
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail={
+                        "message": "The AI service is busy. Please try again shortly.",
+                        "code": "AI_QUEUE_TIMEOUT"
+                    }
+                )
+            elif isinstance(ai_error, AdmissionQueueFullError):
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail={
+                        "message": "The AI service is at capacity. Please try again shortly.",
+                        "code": "AI_QUEUE_FULL"
+                    }
+                )
+            elif is_rate_limit_error(ai_error):
                 raise HTTPException(
                     status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                     detail={
@@ -0,0 +1,115 @@
+"""
+Chunk batching for streamed AI responses
+
+Merges consecutive token-sized chunks so the WebSocket sends fewer,
+larger frames.
+"""
+
+from typing import AsyncIterator, List, Optional
+import asyncio
+
+
+class _ChunkBuffer:
+    """Chunks read from the source by one reader task, awaiting the next flush"""
+
+    def __init__(self, max_bytes: int, max_delay: float):
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.parts: List[str] = []
+        self.size = 0
+        self.first = True
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.ready = asyncio.Event()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def add(self, chunk: str) -> None:
+        if not self.parts and not self.first and self.max_delay > 0:
+            # The oldest buffered chunk starts the delay
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self.ready.set)
+        self.parts.append(chunk)
+        self.size += len(chunk.encode("utf-8"))
+        if self.first or (self.max_bytes > 0 and self.size >= self.max_bytes):
+            self.first = False
+            self.ready.set()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.finished = True
+        self.error = error
+        self.ready.set()
+
+    def take(self) -> str:
+        """Empty the buffer; returns its contents"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.ready.clear()
+        text = "".join(self.parts)
+        self.parts, self.size = [], 0
+        return text
+
+
+async def _read(iterator: AsyncIterator[str], buffer: _ChunkBuffer) -> None:
+    try:
+        async for chunk in iterator:
+            buffer.add(chunk)
+    except Exception as e:
+        buffer.finish(e)
+    else:
+        buffer.finish()
+    finally:
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+async def batch_chunks(
+    source: AsyncIterator[str],
+    max_bytes: int = 0,
+    max_delay: float = 0.0
+) -> AsyncIterator[str]:
+    """
+    Batch consecutive chunks from `source`.
+
+    The first chunk is always yielded immediately so time to first token
+    is unaffected. After that, chunks are buffered and flushed once the
+    buffer reaches `max_bytes` (UTF-8) or the oldest buffered chunk is
+    `max_delay` seconds old, whichever comes first. A limit of 0 disables
+    that trigger; with both disabled chunks pass through unchanged.
+
+    One reader task per stream pulls from `source`; the delay is a timer
+    on the event loop, so no task is created per chunk.
+
+    Args:
+        source: Async iterator of text chunks
+        max_bytes: Flush when the buffer reaches this many bytes
+        max_delay: Flush when the oldest buffered chunk is this many seconds old
+
+    Yields:
+        Batched text chunks
+    """
+    if max_bytes <= 0 and max_delay <= 0:
+        async for chunk in source:
+            yield chunk
+        return
+
+    buffer = _ChunkBuffer(max_bytes, max_delay)
+    reader = asyncio.create_task(_read(source.__aiter__(), buffer))
+    try:
+        while True:
+            await buffer.ready.wait()
+            finished = buffer.finished
+            text = buffer.take()
+            if text:
+                yield text
+            if finished:
+                break
+        if buffer.error is not None:
+            raise buffer.error
+    finally:
+        # Stops the upstream stream right away if we are closed early
+        reader.cancel()
+        try:
+            await reader
+        except (asyncio.CancelledError, Exception):
+            pass
@@ -0,0 +1,258 @@
+"""
+Resumable AI response streams
+
+Each in-flight generation publishes its frames to a ResumableStream that
+keeps a bounded ring buffer of recent chunks, keyed by UTF-8 byte offset.
+Sockets subscribe to streams instead of owning them, so a client that
+drops can reconnect with the stream ID and the last offset it saw and
+get the missing tail followed by live chunks, while the generation keeps
+running.
+
+Streams live in process memory: a resuming client must reach the same
+worker (sticky sessions).
+"""
+
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, Set, Tuple
+import asyncio
+import uuid
+import logging
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Frames that end a stream
+TERMINAL_FRAMES = {"done", "error", "cancelled"}
+
+
+class ResumeUnavailableError(Exception):
+    """The requested offset is not (or no longer) in the ring buffer"""
+
+
+class ResumableStream:
+    """Frames of one generation, with a ring buffer of its chunks"""
+
+    def __init__(
+        self,
+        registry: "StreamRegistry",
+        stream_id: str,
+        user_id: int,
+        session_id: int,
+        max_bytes: int
+    ):
+        self.registry = registry
+        self.stream_id = stream_id
+        self.user_id = user_id
+        self.session_id = session_id
+        self.max_bytes = max_bytes
+        # (chunk frame, size in bytes), oldest first
+        self._chunks: Deque[Tuple[Dict[str, Any], int]] = deque()
+        self._buffered_bytes = 0
+        self.offset = 0  # Bytes emitted so far
+        self.base_offset = 0  # Offset of the oldest buffered byte
+        self.user_frame: Optional[Dict[str, Any]] = None
+        self.terminal_frame: Optional[Dict[str, Any]] = None
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.terminal_frame is not None
+
+    async def publish(self, frame: Dict[str, Any]) -> Dict[str, Any]:
+        """Record a frame and fan it out to subscribers; returns the recorded frame"""
+        frame = {**frame, "stream_id": self.stream_id}
+
+        if frame["type"] == "chunk":
+            size = len(frame["content"].encode("utf-8"))
+            self.offset += size
+            frame["offset"] = self.offset
+            self._chunks.append((frame, size))
+            self._buffered_bytes += size
+            while self._buffered_bytes > self.max_bytes and len(self._chunks) > 1:
+                _, evicted = self._chunks.popleft()
+                self._buffered_bytes -= evicted
+                self.base_offset += evicted
+        elif frame["type"] == "user_message":
+            self.user_frame = frame
+        elif frame["type"] in TERMINAL_FRAMES:
+            self.terminal_frame = frame
+
+        for queue in self.subscribers:
+            queue.put_nowait(frame)
+        return frame
+
+    def subscribe(self, offset: int = 0) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Subscribe from `offset` on: buffered frames past it, then live frames
+        until the stream ends.
+
+        The subscription is registered before this returns, so no frame
+        published afterwards can be missed.
+
+        Args:
+            offset: Bytes of the response the client already has
+
+        Raises:
+            ResumeUnavailableError: If `offset` is older than the ring buffer
+        """
+        if offset < self.base_offset or offset > self.offset:
+            raise ResumeUnavailableError(
+                f"Offset {offset} is outside the buffered range "
+                f"{self.base_offset}-{self.offset}"
+            )
+
+        queue: asyncio.Queue = asyncio.Queue()
+        if self.user_frame is not None:
+            queue.put_nowait(self.user_frame)
+        for frame, size in self._chunks:
+            if frame["offset"] <= offset:
+                continue
+            start = frame["offset"] - size
+            if start < offset:
+                # Resume point falls inside this chunk; send only its tail
+                tail = frame["content"].encode("utf-8")[offset - start:]
+                frame = {**frame, "content": tail.decode("utf-8", errors="ignore")}
+            queue.put_nowait(frame)
+        if self.terminal_frame is not None:
+            queue.put_nowait(self.terminal_frame)
+
+        self.subscribers.add(queue)
+        self.registry.attached(self)
+        return self._drain(queue)
+
+    async def _drain(self, queue: asyncio.Queue) -> AsyncIterator[Dict[str, Any]]:
+        try:
+            while True:
+                frame = await queue.get()
+                yield frame
+                if frame["type"] in TERMINAL_FRAMES:
+                    return
+        finally:
+            self.subscribers.discard(queue)
+            self.registry.detached(self)
+
+
+class StreamRegistry:
+    """
+    In-process registry of resumable streams.
+
+    A generation with no subscribers is cancelled after `grace_seconds`
+    (saving what it produced so far) unless a client resumes it.
+    Finished streams stay resumable for `ttl_seconds`.
+    """
+
+    def __init__(self, max_bytes: int, grace_seconds: float, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.grace_seconds = grace_seconds
+        self.ttl_seconds = ttl_seconds
+        self._streams: Dict[str, ResumableStream] = {}
+        self._grace_timers: Dict[str, asyncio.TimerHandle] = {}
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+    def start(
+        self,
+        user_id: int,
+        session_id: int,
+        producer: Callable[[ResumableStream], Awaitable[None]]
+    ) -> ResumableStream:
+        """
+        Start a generation that publishes into a new stream.
+
+        Args:
+            user_id: Owner of the stream
+            session_id: Chat session the stream belongs to
+            producer: Called with the stream; publishes frames via stream.publish
+
+        Returns:
+            The new stream
+        """
+        stream = ResumableStream(self, uuid.uuid4().hex, user_id, session_id, self.max_bytes)
+        self._streams[stream.stream_id] = stream
+        stream.task = asyncio.create_task(producer(stream))
+        stream.task.add_done_callback(lambda _: self._finished(stream))
+        return stream
+
+    def get(self, stream_id: str, user_id: int) -> Optional[ResumableStream]:
+        """Get a stream if it exists and belongs to the user"""
+        stream = self._streams.get(stream_id)
+        if stream is None or stream.user_id != user_id:
+            return None
+        return stream
+
+    def detached(self, stream: ResumableStream) -> None:
+        """Called when a subscriber goes away"""
+        if stream.subscribers or stream.finished or stream.stream_id in self._grace_timers:
+            return
+        self._grace_timers[stream.stream_id] = asyncio.get_running_loop().call_later(
+            self.grace_seconds, self._expire_unattached, stream
+        )
+
+    def attached(self, stream: ResumableStream) -> None:
+        """Called when a client subscribes (or resubscribes) to a stream"""
+        timer = self._grace_timers.pop(stream.stream_id, None)
+        if timer is not None:
+            timer.cancel()
+
+    def _expire_unattached(self, stream: ResumableStream) -> None:
+        self._grace_timers.pop(stream.stream_id, None)
+        if not stream.subscribers and stream.task is not None and not stream.task.done():
+            logger.info(f"No client resumed stream {stream.stream_id}; cancelling generation")
+            stream.task.cancel()
+
+    def _finished(self, stream: ResumableStream) -> None:
+        timer = self._grace_timers.pop(stream.stream_id, None)
+        if timer is not None:
+            timer.cancel()
+        if not stream.finished:
+            # Producer was cancelled before it ran, or died without a
+            # terminal frame; don't leave subscribers hanging
+            if stream.task.cancelled():
+                stream.terminal_frame = {"type": "cancelled", "stream_id": stream.stream_id}
+            else:
+                stream.terminal_frame = {
+                    "type": "error",
+                    "message": "Failed to process message. Please try again.",
+                    "code": "PROCESSING_ERROR",
+                    "stream_id": stream.stream_id
+                }
+            for queue in stream.subscribers:
+                queue.put_nowait(stream.terminal_frame)
+        asyncio.get_running_loop().call_later(
+            self.ttl_seconds, self._streams.pop, stream.stream_id, None
+        )
+
+    async def shutdown(self) -> None:
+        """Cancel running generations and wait for them to save what they produced"""
+        tasks = [s.task for s in self._streams.values() if s.task is not None and not s.task.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+            logger.info(f"Cancelled {len(tasks)} generations on shutdown")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "streams": len(self._streams),
+            "generating": sum(1 for s in self._streams.values() if not s.finished),
+            "unattached": len(self._grace_timers),
+        }
+
+
+# Singleton instance
+_stream_registry = None
+
+
+def get_stream_registry() -> StreamRegistry:
+    """Get or create singleton stream registry instance"""
+    global _stream_registry
+    if _stream_registry is None:
+        _stream_registry = StreamRegistry(
+            max_bytes=settings.stream_buffer_max_bytes,
+            grace_seconds=settings.stream_resume_grace_seconds,
+            ttl_seconds=settings.stream_resume_ttl_seconds
+        )
+    return _stream_registry
@@ -1,17 +1,35 @@
 """
-WebSocket endpoint for real-time chat streaming
+WebSocket endpoints for real-time chat streaming
 """
 
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, status
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+from starlette.websockets import WebSocketState
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Dict, Any
+from typing import AsyncIterator, Awaitable, Callable, Dict, Any, Optional, Set, Tuple
+import asyncio
 import json
 import logging
 
-from app.database.session import get_db
+from app.config import settings
+from app.database.session import AsyncSessionLocal, set_session_user
 from app.models.user import User
-from app.services import chat_service
+from app.models.message import MessageStatus
+from app.services import chat_service, summary_service
+from app.chat.stream_batching import batch_chunks
+from app.chat.message_writer import StreamingMessageWriter
+from app.chat.event_bus import EventsDroppedError, get_event_bus
+from app.chat.stream_registry import (
+    ResumableStream,
+    ResumeUnavailableError,
+    get_stream_registry
+)
 from app.services.langchain_service import get_langchain_service
+from app.services.hedging import StreamMetrics
+from app.services.admission import (
+    AdmissionQueueFullError,
+    AdmissionTimeoutError,
+    get_admission_controller
+)
 from app.auth.jwt_handler import decode_access_token
 from jose import JWTError
 
@@ -19,6 +37,9 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/chat", tags=["websocket"])
 
+# Sends one server -> client frame
+SendFrame = Callable[[Dict[str, Any]], Awaitable[None]]
+
 
 async def get_current_user_ws(token: str, db: AsyncSession) -> User:
     """Validate WebSocket token and get current user"""
@@ -37,46 +58,371 @@ async def get_current_user_ws(token: str, db: AsyncSession) -> User:
         if user is None:
             raise ValueError("User not found")
         
+        set_session_user(db, user.id)
         return user
     except (JWTError, ValueError) as e:
         logger.error(f"WebSocket authentication failed: {e}")
         raise
 
 
-@router.websocket("/ws/{session_id}")
-async def websocket_endpoint(
-    websocket: WebSocket,
+def _frame_sender(websocket: WebSocket) -> SendFrame:
+    """Serialize sends: generation tasks and the receive loop share the socket"""
+    send_lock = asyncio.Lock()
+    
+    async def send(frame: Dict[str, Any]) -> None:
+        async with send_lock:
+            if websocket.client_state != WebSocketState.DISCONNECTED:
+                await websocket.send_json(frame)
+    
+    return send
+
+
+async def _receive_frame(websocket: WebSocket, send: SendFrame) -> Optional[Dict[str, Any]]:
+    """
+    Receive one client frame.
+    
+    A frame that is not a JSON object gets an error frame back and None is
+    returned, so one bad frame never closes the socket (and with it every
+    session multiplexed on it).
+    """
+    text = await websocket.receive_text()
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        await send({
+            "type": "error",
+            "message": "Frames must be JSON objects",
+            "code": "INVALID_MESSAGE"
+        })
+        return None
+    return data
+
+
+def _validate_message(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Return an error frame if a client "message" frame is invalid"""
+    content = data.get("content", "")
+    if not isinstance(content, str):
+        return {
+            "type": "error",
+            "message": "Message content must be a string",
+            "code": "INVALID_MESSAGE"
+        }
+    
+    content = content.strip()
+    if not content:
+        return {
+            "type": "error",
+            "message": "Message content is required",
+            "code": "EMPTY_MESSAGE"
+        }
+    
+    if len(content) > 10000:
+        return {
+            "type": "error",
+            "message": "Message exceeds maximum length of 10,000 characters",
+            "code": "MESSAGE_TOO_LONG"
+        }
+    return None
+
+
+async def _run_turn(
+    db: AsyncSession,
+    send: SendFrame,
+    current_user: User,
     session_id: int,
-    db: AsyncSession = Depends(get_db)
-):
+    content: str
+) -> None:
+    """
+    Generate, stream and persist one AI response.
+    
+    The assistant message is created in the "streaming" state when
+    generation starts and checkpointed as chunks arrive. Cancelling the
+    task stops the upstream stream right away; the partial response is
+    saved with status "truncated".
+    """
+    try:
+        # Save user message
+        user_message = await chat_service.save_message(
+            db, session_id, "user", content
+        )
+        
+        # Send user message confirmation
+        await send({
+            "type": "user_message",
+            "message": {
+                "id": user_message.id,
+                "role": "user",
+                "content": user_message.content,
+                "created_at": user_message.created_at.isoformat()
+            }
+        })
+        
+        # Load summary + recent history (served from the conversation cache)
+        conversation = await chat_service.get_conversation_context(
+            db, session_id, exclude_message_id=user_message.id
+        )
+        
+        # Stream AI response
+        langchain_service = get_langchain_service()
+        context = langchain_service.build_context(
+            content, conversation.history, conversation.summary
+        )
+        
+        async def send_queue_position(position: int) -> None:
+            await send({
+                "type": "queued",
+                "position": position
+            })
+        
+        writer: Optional[StreamingMessageWriter] = None
+        truncated = False
+        metrics = StreamMetrics()
+        try:
+            async with get_admission_controller().slot(
+                current_user.id,
+                on_position=send_queue_position,
+                timeout=settings.llm_ws_queue_timeout_seconds
+            ):
+                # Create the message up front; chunks are checkpointed into it
+                writer = await StreamingMessageWriter.start(db, session_id)
+                stream = batch_chunks(
+                    langchain_service.stream_response(
+                        content,
+                        context.history,
+                        use_cache=not current_user.response_cache_opt_out,
+                        summary=conversation.summary,
+                        metrics=metrics
+                    ),
+                    max_bytes=settings.ws_chunk_flush_bytes,
+                    max_delay=settings.ws_chunk_flush_ms / 1000
+                )
+                try:
+                    async for chunk in stream:
+                        writer.append(chunk)
+                        await send({
+                            "type": "chunk",
+                            "content": chunk
+                        })
+                finally:
+                    # Abort the upstream stream right away on cancel
+                    await stream.aclose()
+        except asyncio.CancelledError:
+            truncated = True
+            logger.info(f"Generation cancelled in session {session_id}")
+        except (AdmissionTimeoutError, AdmissionQueueFullError):
+            raise
+        except Exception:
+            # Keep what was streamed before the failure
+            if writer is not None:
+                if writer.has_content:
+                    await writer.finish(MessageStatus.TRUNCATED.value)
+                else:
+                    await writer.discard()
+            raise
+        
+        if writer is None or not writer.has_content:
+            if writer is not None:
+                await writer.discard()
+            await send({"type": "cancelled"})
+            return
+        
+        # Store the full response (partial if cancelled) and mark it finished
+        assistant_message = await writer.finish(
+            MessageStatus.TRUNCATED.value if truncated else MessageStatus.COMPLETE.value
+        )
+        
+        summary_service.schedule_summary_update(session_id)
+        
+        # Send completion signal
+        await send({
+            "type": "done",
+            "message_id": assistant_message.id,
+            "context_tokens": context.total_tokens,
+            "ttft_ms": metrics.as_dict()["ttft_ms"],
+            "hedged": metrics.hedged,
+            "truncated": truncated,
+            "message": {
+                "id": assistant_message.id,
+                "role": "assistant",
+                "content": assistant_message.content,
+                "status": assistant_message.status,
+                "created_at": assistant_message.created_at.isoformat()
+            }
+        })
+        
+        logger.info(f"Streamed response for session {session_id}")
+    
+    except (AdmissionTimeoutError, AdmissionQueueFullError) as e:
+        logger.warning(f"WebSocket message not admitted for session {session_id}: {e}")
+        await send({
+            "type": "error",
+            "message": "The AI service is busy. Please try again shortly.",
+            "code": "QUEUE_TIMEOUT" if isinstance(e, AdmissionTimeoutError) else "QUEUE_FULL"
+        })
+    
+    except Exception as e:
+        logger.error(f"Error processing WebSocket message: {e}", exc_info=True)
+        try:
+            await send({
+                "type": "error",
+                "message": "Failed to process message. Please try again.",
+                "code": "PROCESSING_ERROR"
+            })
+        except Exception:
+            pass
+
+
+def _turn_producer(current_user: User, session_id: int, content: str):
+    """
+    Run one turn into a resumable stream, on its own database session.
+    
+    Frames also go to the session event bus for other watchers, except
+    queue positions, which only concern the sender.
+    """
+    async def produce(stream: ResumableStream) -> None:
+        event_bus = get_event_bus()
+        
+        async def publish(frame: Dict[str, Any]) -> None:
+            frame = await stream.publish(frame)
+            if frame["type"] != "queued":
+                await event_bus.publish(session_id, frame)
+        
+        async with AsyncSessionLocal() as db:
+            set_session_user(db, current_user.id)
+            await _run_turn(db, publish, current_user, session_id, content)
+    return produce
+
+
+async def _forward(frames: AsyncIterator[Dict[str, Any]], send: SendFrame) -> None:
+    """Relay a stream subscription to the socket"""
+    try:
+        async for frame in frames:
+            await send(frame)
+    finally:
+        await frames.aclose()
+
+
+async def _watch(
+    events: AsyncIterator[Dict[str, Any]],
+    send: SendFrame,
+    own_streams: Set[str]
+) -> None:
+    """Relay a session's events, skipping streams the socket already follows"""
+    try:
+        async for event in events:
+            if event.get("stream_id") not in own_streams:
+                await send(event)
+    except EventsDroppedError as e:
+        logger.warning(str(e))
+        await send({
+            "type": "error",
+            "message": "Missed session updates; reload the session's messages",
+            "code": "EVENTS_DROPPED"
+        })
+    finally:
+        await events.aclose()
+
+
+def _resume_stream(
+    current_user: User,
+    stream_id: Any,
+    offset: Any,
+    session_id: Optional[int] = None
+) -> Tuple[ResumableStream, AsyncIterator[Dict[str, Any]]]:
+    """
+    Subscribe to one of the user's streams from a client-supplied offset.
+    
+    Raises:
+        ResumeUnavailableError: Unknown stream, bad offset, or tail evicted
+    """
+    stream = get_stream_registry().get(stream_id, current_user.id) if isinstance(stream_id, str) else None
+    if stream is None or (session_id is not None and stream.session_id != session_id):
+        raise ResumeUnavailableError(f"Unknown stream {stream_id!r}")
+    try:
+        offset = int(offset)
+    except (TypeError, ValueError):
+        raise ResumeUnavailableError(f"Invalid offset {offset!r}")
+    return stream, stream.subscribe(offset)
+
+
+def _resume_unavailable(stream_id: Any) -> Dict[str, Any]:
+    return {
+        "type": "error",
+        "message": "The response can no longer be resumed; reload the session's messages",
+        "code": "RESUME_UNAVAILABLE",
+        "stream_id": stream_id
+    }
+
+
+@router.websocket("/ws/{session_id}")
+async def websocket_endpoint(websocket: WebSocket, session_id: int):
     """
     WebSocket endpoint for streaming AI responses
     
     Query parameters:
     - token: JWT access token for authentication
+    - resume: stream_id of a response to resume after a reconnect (optional)
+    - offset: last "offset" received for that stream (default 0)
+    
+    Responses keep generating for a short grace period after the socket
+    drops. Reconnecting with resume/offset replays the chunks the client
+    missed, then continues live, without restarting the generation.
     
     Message format (client -> server):
     {
         "type": "message",
         "content": "user message text"
     }
+    or
+    {
+        "type": "cancel"
+    }
+    (stops the response being generated; the partial response is saved
+    with status "truncated")
     
     Message format (server -> client):
+    {
+        "type": "queued",
+        "position": 3
+    }
+    (sent while waiting for an LLM slot, whenever the position changes)
+    or
     {
         "type": "chunk",
-        "content": "partial AI response"
+        "content": "partial AI response",
+        "offset": 1024
     }
+    ("offset" is the UTF-8 byte length of the response so far)
     or
     {
         "type": "done",
-        "message_id": 123
+        "message_id": 123,
+        "context_tokens": 512,
+        "ttft_ms": 840,
+        "hedged": false,
+        "truncated": false
     }
     or
+    {
+        "type": "cancelled"
+    }
+    (cancelled before any text was generated; nothing is saved)
+    or
     {
         "type": "error",
         "message": "error description",
         "code": "ERROR_CODE"
     }
+    (code "RESUME_UNAVAILABLE" if the stream is gone or the offset is no
+    longer buffered; the saved message is then available over REST)
+    
+    Every frame belonging to a response carries its "stream_id".
+    
+    The socket also receives the frames of responses generated for this
+    session by other connections (other tabs, on any worker), from the
+    point it connected.
     """
     
     await websocket.accept()
@@ -96,11 +442,24 @@ async def websocket_endpoint(
             await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
             return
         
-        try:
-            current_user = await get_current_user_ws(token, db)
-            logger.info(f"WebSocket authenticated for user {current_user.id}")
-        except Exception as e:
-            logger.error(f"WebSocket authentication error: {e}")
+        # Borrow a database session only for the handshake: an idle socket
+        # must not pin a pooled connection (turns use their own sessions)
+        async with AsyncSessionLocal() as db:
+            try:
+                current_user = await get_current_user_ws(token, db)
+                logger.info(f"WebSocket authenticated for user {current_user.id}")
+            except Exception as e:
+                logger.error(f"WebSocket authentication error: {e}")
+                current_user = None
+            
+            if current_user is not None:
+                # Verify session ownership
+                session = await chat_service.get_session_by_id(db, session_id, current_user)
+                if session:
+                    # Warm the conversation cache so turns need no history queries
+                    await chat_service.get_conversation_context(db, session_id)
+        
+        if current_user is None:
             await websocket.send_json({
                 "type": "error",
                 "message": "Authentication failed",
@@ -109,8 +468,6 @@ async def websocket_endpoint(
             await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
             return
         
-        # Verify session ownership
-        session = await chat_service.get_session_by_id(db, session_id, current_user)
         if not session:
             await websocket.send_json({
                 "type": "error",
@@ -120,110 +477,309 @@ async def websocket_endpoint(
             await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
             return
         
-        # Message loop
-        while True:
-            # Receive message from client
-            data = await websocket.receive_json()
-            
-            if data.get("type") != "message":
-                await websocket.send_json({
-                    "type": "error",
-                    "message": "Invalid message type",
-                    "code": "INVALID_MESSAGE_TYPE"
-                })
-                continue
-            
-            content = data.get("content", "").strip()
-            if not content:
-                await websocket.send_json({
-                    "type": "error",
-                    "message": "Message content is required",
-                    "code": "EMPTY_MESSAGE"
-                })
-                continue
-            
-            if len(content) > 10000:
-                await websocket.send_json({
-                    "type": "error",
-                    "message": "Message exceeds maximum length of 10,000 characters",
-                    "code": "MESSAGE_TOO_LONG"
-                })
-                continue
+        send = _frame_sender(websocket)
+        registry = get_stream_registry()
+        
+        # Generations run detached from the socket, which only subscribes to
+        # them; "current" is the latest one started or resumed here
+        current: Optional[ResumableStream] = None
+        own_streams: Set[str] = set()
+        forwarders: Set[asyncio.Task] = set()
+        
+        def forward(stream: ResumableStream, frames: AsyncIterator[Dict[str, Any]]) -> None:
+            own_streams.add(stream.stream_id)
+            task = asyncio.create_task(_forward(frames, send))
+            forwarders.add(task)
+            task.add_done_callback(forwarders.discard)
+        
+        # Responses generated for this session by other connections
+        watcher = asyncio.create_task(
+            _watch(get_event_bus().subscribe(session_id), send, own_streams)
+        )
+        
+        try:
+            resume_id = query_params.get('resume')
+            if resume_id:
+                try:
+                    current, frames = _resume_stream(
+                        current_user, resume_id, query_params.get('offset', 0), session_id
+                    )
+                    forward(current, frames)
+                except ResumeUnavailableError as e:
+                    logger.info(f"Cannot resume stream in session {session_id}: {e}")
+                    await send(_resume_unavailable(resume_id))
             
-            try:
-                # Save user message
-                user_message = await chat_service.create_message(
-                    db, session_id, "user", content
-                )
-                await db.commit()
+            while True:
+                # Receive message from client
+                data = await _receive_frame(websocket, send)
+                if data is None:
+                    continue
                 
-                # Send user message confirmation
-                await websocket.send_json({
-                    "type": "user_message",
-                    "message": {
-                        "id": user_message.id,
-                        "role": "user",
-                        "content": user_message.content,
-                        "created_at": user_message.created_at.isoformat()
-                    }
-                })
+                if data.get("type") == "cancel":
+                    if current is not None and not current.task.done():
+                        current.task.cancel()
+                    continue
                 
-                # Load conversation history
-                history_messages = await chat_service.get_session_messages(
-                    db, session_id, limit=20
-                )
-                chat_history = [
-                    {"role": msg.role, "content": msg.content}
-                    for msg in history_messages
-                    if msg.id != user_message.id
-                ]
+                if data.get("type") != "message":
+                    await send({
+                        "type": "error",
+                        "message": "Invalid message type",
+                        "code": "INVALID_MESSAGE_TYPE"
+                    })
+                    continue
                 
-                # Stream AI response
-                langchain_service = get_langchain_service()
+                error = _validate_message(data)
+                if error is not None:
+                    await send(error)
+                    continue
                 
-                full_response = ""
-                async for chunk in langchain_service.stream_response(content, chat_history):
-                    full_response += chunk
-                    await websocket.send_json({
-                        "type": "chunk",
-                        "content": chunk
+                if current is not None and not current.task.done():
+                    await send({
+                        "type": "error",
+                        "message": "A response is already being generated",
+                        "code": "GENERATION_IN_PROGRESS"
                     })
+                    continue
                 
-                # Save AI message
-                assistant_message = await chat_service.create_message(
-                    db, session_id, "assistant", full_response
+                current = registry.start(
+                    current_user.id,
+                    session_id,
+                    _turn_producer(current_user, session_id, data["content"].strip())
+                )
+                forward(current, current.subscribe())
+        finally:
+            # Client went away: generations keep running for the resume grace
+            # period, then are cancelled with their partial responses saved
+            watcher.cancel()
+            for task in list(forwarders):
+                task.cancel()
+    
+    except WebSocketDisconnect:
+        logger.info(f"WebSocket disconnected for session {session_id}")
+    except Exception as e:
+        logger.error(f"WebSocket error: {e}", exc_info=True)
+        try:
+            await websocket.send_json({
+                "type": "error",
+                "message": "Internal server error",
+                "code": "INTERNAL_ERROR"
+            })
+        except:
+            pass
+    finally:
+        try:
+            await websocket.close()
+        except:
+            pass
+        logger.info(f"WebSocket connection closed for session {session_id}")
+
+
+@router.websocket("/ws")
+async def multiplexed_websocket_endpoint(websocket: WebSocket):
+    """
+    One WebSocket per user carrying any number of chat sessions
+    
+    Query parameters:
+    - token: JWT access token for authentication
+    - resume, offset: resume one stream on connect, as for /ws/{session_id}
+    
+    Same protocol as /ws/{session_id}, except every frame carries the
+    chat session it belongs to:
+    {
+        "type": "message",
+        "session_id": 42,
+        "content": "user message text"
+    }
+    {
+        "type": "cancel",
+        "session_id": 42
+    }
+    {
+        "type": "resume",
+        "stream_id": "9f1c...",
+        "offset": 1024
+    }
+    (resumes any of the user's streams after a reconnect)
+    {
+        "type": "watch" | "unwatch",
+        "session_id": 42
+    }
+    (receive frames of responses generated for the session by other
+    connections; sessions the client sends messages to are watched
+    automatically)
+    Server frames ("user_message", "queued", "chunk", "done", "cancelled",
+    "error") include "session_id" as well. Different sessions stream in
+    parallel; each session has at most one response generating at a time.
+    
+    No database session is held by the connection: each turn uses its own
+    short-lived one.
+    """
+    
+    await websocket.accept()
+    send = _frame_sender(websocket)
+    current_user: Optional[User] = None
+    
+    try:
+        token = websocket.query_params.get('token')
+        
+        try:
+            if not token:
+                raise ValueError("Authentication token is required")
+            async with AsyncSessionLocal() as db:
+                current_user = await get_current_user_ws(token, db)
+        except Exception as e:
+            logger.error(f"WebSocket authentication error: {e}")
+            await send({
+                "type": "error",
+                "message": "Authentication failed",
+                "code": "UNAUTHORIZED"
+            })
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+        
+        logger.info(f"Multiplexed WebSocket established for user {current_user.id}")
+        
+        registry = get_stream_registry()
+        
+        # Sessions already verified as owned by this user on this connection
+        owned_sessions: Set[int] = set()
+        # Latest generation per session started or resumed on this connection
+        generations: Dict[int, ResumableStream] = {}
+        own_streams: Set[str] = set()
+        forwarders: Set[asyncio.Task] = set()
+        watchers: Dict[int, asyncio.Task] = {}
+        
+        def session_sender(session_id: int) -> SendFrame:
+            async def send_for_session(frame: Dict[str, Any]) -> None:
+                await send({**frame, "session_id": session_id})
+            return send_for_session
+        
+        def track(stream: ResumableStream, frames: AsyncIterator[Dict[str, Any]]) -> None:
+            own_streams.add(stream.stream_id)
+            task = asyncio.create_task(_forward(frames, session_sender(stream.session_id)))
+            forwarders.add(task)
+            task.add_done_callback(forwarders.discard)
+            if not stream.task.done():
+                generations[stream.session_id] = stream
+                stream.task.add_done_callback(
+                    lambda _, sid=stream.session_id: generations.get(sid) is stream and generations.pop(sid)
                 )
-                await chat_service.update_session_timestamp(db, session)
-                await db.commit()
+        
+        async def resume(stream_id: Any, offset: Any) -> None:
+            try:
+                track(*_resume_stream(current_user, stream_id, offset))
+            except ResumeUnavailableError as e:
+                logger.info(f"Cannot resume stream for user {current_user.id}: {e}")
+                await send(_resume_unavailable(stream_id))
+        
+        def watch(session_id: int) -> None:
+            if session_id not in watchers:
+                watchers[session_id] = asyncio.create_task(_watch(
+                    get_event_bus().subscribe(session_id), session_sender(session_id), own_streams
+                ))
+        
+        async def owns_session(session_id: int) -> bool:
+            if session_id in owned_sessions:
+                return True
+            async with AsyncSessionLocal() as db:
+                set_session_user(db, current_user.id)
+                session = await chat_service.get_session_by_id(db, session_id, current_user)
+                if session is None:
+                    return False
+                # Warm the conversation cache so turns need no history queries
+                await chat_service.get_conversation_context(db, session_id)
+            owned_sessions.add(session_id)
+            watch(session_id)
+            return True
+        
+        try:
+            resume_id = websocket.query_params.get('resume')
+            if resume_id:
+                await resume(resume_id, websocket.query_params.get('offset', 0))
+            
+            while True:
+                data = await _receive_frame(websocket, send)
+                if data is None:
+                    continue
                 
-                # Send completion signal
-                await websocket.send_json({
-                    "type": "done",
-                    "message_id": assistant_message.id,
-                    "message": {
-                        "id": assistant_message.id,
-                        "role": "assistant",
-                        "content": assistant_message.content,
-                        "created_at": assistant_message.created_at.isoformat()
-                    }
-                })
+                if data.get("type") == "resume":
+                    await resume(data.get("stream_id"), data.get("offset", 0))
+                    continue
                 
-                logger.info(f"Streamed response for session {session_id}")
+                session_id = data.get("session_id")
+                if not isinstance(session_id, int) or isinstance(session_id, bool):
+                    await send({
+                        "type": "error",
+                        "message": "session_id is required",
+                        "code": "INVALID_SESSION_ID"
+                    })
+                    continue
+                session_send = session_sender(session_id)
                 
-            except Exception as e:
-                logger.error(f"Error processing WebSocket message: {e}", exc_info=True)
-                await websocket.send_json({
-                    "type": "error",
-                    "message": "Failed to process message. Please try again.",
-                    "code": "PROCESSING_ERROR"
-                })
+                if data.get("type") == "cancel":
+                    stream = generations.get(session_id)
+                    if stream is not None and not stream.task.done():
+                        stream.task.cancel()
+                    continue
+                
+                if data.get("type") == "unwatch":
+                    watcher = watchers.pop(session_id, None)
+                    if watcher is not None:
+                        watcher.cancel()
+                    continue
+                
+                if data.get("type") not in ("message", "watch"):
+                    await session_send({
+                        "type": "error",
+                        "message": "Invalid message type",
+                        "code": "INVALID_MESSAGE_TYPE"
+                    })
+                    continue
                 
+                error = _validate_message(data) if data["type"] == "message" else None
+                if error is not None:
+                    await session_send(error)
+                    continue
+                
+                if not await owns_session(session_id):
+                    await session_send({
+                        "type": "error",
+                        "message": "Session not found or access denied",
+                        "code": "NOT_FOUND"
+                    })
+                    continue
+                
+                if data["type"] == "watch":
+                    watch(session_id)
+                    continue
+                
+                stream = generations.get(session_id)
+                if stream is not None and not stream.task.done():
+                    await session_send({
+                        "type": "error",
+                        "message": "A response is already being generated",
+                        "code": "GENERATION_IN_PROGRESS"
+                    })
+                    continue
+                
+                stream = registry.start(
+                    current_user.id,
+                    session_id,
+                    _turn_producer(current_user, session_id, data["content"].strip())
+                )
+                track(stream, stream.subscribe())
+        finally:
+            # Client went away: generations keep running for the resume grace
+            # period, then are cancelled with their partial responses saved
+            for task in [*forwarders, *watchers.values()]:
+                task.cancel()
+    
     except WebSocketDisconnect:
-        logger.info(f"WebSocket disconnected for session {session_id}")
+        logger.info(f"Multiplexed WebSocket disconnected for user {current_user.id if current_user else None}")
     except Exception as e:
         logger.error(f"WebSocket error: {e}", exc_info=True)
         try:
-            await websocket.send_json({
+            await send({
                 "type": "error",
                 "message": "Internal server error",
                 "code": "INTERNAL_ERROR"
@@ -235,4 +791,3 @@ async def websocket_endpoint(
             await websocket.close()
         except:
             pass
-        logger.info(f"WebSocket connection closed for session {session_id}")
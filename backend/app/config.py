@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from pydantic import Field
+from pydantic import Field, model_validator
 
 
 class Settings(BaseSettings):
@@ -7,25 +7,175 @@ class Settings(BaseSettings):
     
     # Database
     database_url: str = Field(..., env="DATABASE_URL")
+    db_echo: bool = Field(default=False, env="DB_ECHO")  # Log every SQL statement
+    # Connection pool per worker; DB_POOL_SIZE=0 disables pooling (external pooler)
+    db_pool_size: int = Field(default=10, env="DB_POOL_SIZE")
+    db_max_overflow: int = Field(default=10, env="DB_MAX_OVERFLOW")
+    db_pool_timeout_seconds: float = Field(default=30.0, env="DB_POOL_TIMEOUT_SECONDS")
+    db_pool_recycle_seconds: int = Field(default=1800, env="DB_POOL_RECYCLE_SECONDS")  # -1 = never
+    db_pool_pre_ping: bool = Field(default=True, env="DB_POOL_PRE_PING")
+    db_statement_cache_size: int = Field(default=100, env="DB_STATEMENT_CACHE_SIZE")  # asyncpg
+    # Behind PgBouncer in transaction mode: no prepared statement caching
+    db_pgbouncer_transaction_mode: bool = Field(default=False, env="DB_PGBOUNCER_TRANSACTION_MODE")
+    # Read replicas (comma-separated URLs) for read-only queries; empty = primary only
+    database_replica_urls: str = Field(default="", env="DATABASE_REPLICA_URLS")
+    # Replicas further behind than this are skipped until they catch up
+    db_replica_max_lag_seconds: float = Field(default=5.0, env="DB_REPLICA_MAX_LAG_SECONDS")
+    db_replica_check_seconds: float = Field(default=2.0, env="DB_REPLICA_CHECK_SECONDS")
+    # A user's reads go to the primary this long after their last write (at least the replica lag)
+    db_read_your_writes_seconds: float = Field(default=5.0, env="DB_READ_YOUR_WRITES_SECONDS")
     
     # JWT Authentication
     secret_key: str = Field(..., env="SECRET_KEY")
     algorithm: str = Field(default="HS256", env="ALGORITHM")
     access_token_expire_minutes: int = Field(default=30, env="ACCESS_TOKEN_EXPIRE_MINUTES")
     
+    # LLM provider: "openai" or "fake" (deterministic local model for load testing)
+    llm_provider: str = Field(default="openai", env="LLM_PROVIDER")
+    
     # OpenAI
-    openai_api_key: str = Field(..., env="OPENAI_API_KEY")
+    openai_api_key: str = Field(default="", env="OPENAI_API_KEY")
     openai_model: str = Field(default="gpt-4", env="OPENAI_MODEL")
     openai_temperature: float = Field(default=0.7, env="OPENAI_TEMPERATURE")
     openai_max_tokens: int = Field(default=1000, env="OPENAI_MAX_TOKENS")
+    openai_embedding_model: str = Field(default="text-embedding-3-small", env="OPENAI_EMBEDDING_MODEL")
+    
+    # Upstream LLM pool: JSON list of {"name", "api_key", "model", "base_url", "rpm", "tpm"}
+    llm_pool_deployments: str = Field(default="", env="LLM_POOL_DEPLOYMENTS")
+    # Per worker process (divide the account limits by the worker count); 0 = unlimited
+    openai_rpm_limit: int = Field(default=0, env="OPENAI_RPM_LIMIT")
+    openai_tpm_limit: int = Field(default=0, env="OPENAI_TPM_LIMIT")
+    llm_pool_acquire_timeout_seconds: float = Field(default=30.0, env="LLM_POOL_ACQUIRE_TIMEOUT_SECONDS")
+    llm_pool_cooldown_seconds: float = Field(default=10.0, env="LLM_POOL_COOLDOWN_SECONDS")
+    
+    # Hedged LLM streams: if no first token arrives by the given percentile of
+    # recent TTFTs (clamped to min/max), a second request goes to another pool entry.
+    # Each hedge is a second paid request; pools with a single entry never hedge
+    llm_hedging_enabled: bool = Field(default=False, env="LLM_HEDGING_ENABLED")
+    llm_hedge_percentile: float = Field(default=95.0, env="LLM_HEDGE_PERCENTILE")
+    llm_hedge_min_delay_ms: float = Field(default=1000.0, env="LLM_HEDGE_MIN_DELAY_MS")
+    llm_hedge_max_delay_ms: float = Field(default=10000.0, env="LLM_HEDGE_MAX_DELAY_MS")
+    llm_hedge_initial_delay_ms: float = Field(default=5000.0, env="LLM_HEDGE_INITIAL_DELAY_MS")
+    llm_hedge_window: int = Field(default=500, env="LLM_HEDGE_WINDOW")
+    llm_hedge_min_samples: int = Field(default=20, env="LLM_HEDGE_MIN_SAMPLES")
+    
+    # LLM admission control (global concurrency with per-user fair queueing)
+    llm_max_concurrency: int = Field(default=50, env="LLM_MAX_CONCURRENCY")
+    llm_max_queue: int = Field(default=1000, env="LLM_MAX_QUEUE")
+    # Max seconds a request waits for a slot; 0 rejects immediately when busy
+    llm_queue_timeout_seconds: float = Field(default=30.0, env="LLM_QUEUE_TIMEOUT_SECONDS")
+    llm_ws_queue_timeout_seconds: float = Field(default=120.0, env="LLM_WS_QUEUE_TIMEOUT_SECONDS")
+    
+    # WebSocket chunk batching: flush by size and/or delay (0 disables a trigger)
+    ws_chunk_flush_bytes: int = Field(default=256, env="WS_CHUNK_FLUSH_BYTES")
+    ws_chunk_flush_ms: float = Field(default=30.0, env="WS_CHUNK_FLUSH_MS")
+    
+    # Streaming responses are checkpointed to their message row every N bytes or seconds
+    message_checkpoint_bytes: int = Field(default=4096, env="MESSAGE_CHECKPOINT_BYTES")
+    message_checkpoint_seconds: float = Field(default=2.0, env="MESSAGE_CHECKPOINT_SECONDS")
+    # "streaming" messages older than this were left by a dead worker; marked truncated on startup
+    message_streaming_recovery_seconds: float = Field(default=900.0, env="MESSAGE_STREAMING_RECOVERY_SECONDS")
+    
+    # Write-behind persistence: batch chat turn writes across sessions
+    write_behind_enabled: bool = Field(default=False, env="WRITE_BEHIND_ENABLED")
+    write_behind_flush_ms: float = Field(default=5.0, env="WRITE_BEHIND_FLUSH_MS")
+    write_behind_max_batch: int = Field(default=500, env="WRITE_BEHIND_MAX_BATCH")
+    # Queued + in-flight writes before writers wait
+    write_behind_max_pending: int = Field(default=10000, env="WRITE_BEHIND_MAX_PENDING")
+    
+    # Resumable streams: chunks buffered per generation for reconnecting clients
+    stream_buffer_max_bytes: int = Field(default=65536, env="STREAM_BUFFER_MAX_BYTES")
+    # Seconds a generation keeps running with no client attached
+    stream_resume_grace_seconds: float = Field(default=15.0, env="STREAM_RESUME_GRACE_SECONDS")
+    # Seconds a finished stream stays resumable
+    stream_resume_ttl_seconds: float = Field(default=60.0, env="STREAM_RESUME_TTL_SECONDS")
+    
+    # Session event bus: "local" (single worker) or "postgres" (LISTEN/NOTIFY across workers)
+    event_bus_backend: str = Field(default="local", env="EVENT_BUS_BACKEND")
+    # LISTEN needs a session-level connection: set a direct URL when DATABASE_URL is PgBouncer
+    event_bus_database_url: str = Field(default="", env="EVENT_BUS_DATABASE_URL")
+    event_bus_channel: str = Field(default="chat_session_events", env="EVENT_BUS_CHANNEL")
+    # Events a watcher may fall behind before it is dropped
+    event_bus_subscriber_buffer: int = Field(default=1000, env="EVENT_BUS_SUBSCRIBER_BUFFER")
+    # Events waiting to be relayed to other workers before new ones are dropped
+    event_bus_relay_buffer: int = Field(default=10000, env="EVENT_BUS_RELAY_BUFFER")
+    
+    # Cold-session archival: messages of sessions idle this long are moved to
+    # zstd-compressed archives and restored when the session is opened
+    archive_enabled: bool = Field(default=False, env="ARCHIVE_ENABLED")
+    archive_idle_days: float = Field(default=90.0, env="ARCHIVE_IDLE_DAYS")
+    archive_interval_seconds: float = Field(default=3600.0, env="ARCHIVE_INTERVAL_SECONDS")
+    archive_batch_size: int = Field(default=100, env="ARCHIVE_BATCH_SIZE")  # Sessions per run
+    archive_zstd_level: int = Field(default=10, env="ARCHIVE_ZSTD_LEVEL")
+    
+    # Message content compression: finished messages at least this large are
+    # stored zstd-compressed, with the newest trained dictionary
+    content_compression_enabled: bool = Field(default=False, env="CONTENT_COMPRESSION_ENABLED")
+    content_compression_min_bytes: int = Field(default=1024, env="CONTENT_COMPRESSION_MIN_BYTES")
+    content_compression_level: int = Field(default=6, env="CONTENT_COMPRESSION_LEVEL")
+    
+    # Batch generation jobs
+    batch_storage_dir: str = Field(default="./data/batch_jobs", env="BATCH_STORAGE_DIR")
+    batch_max_concurrency: int = Field(default=8, env="BATCH_MAX_CONCURRENCY")  # Per job
+    batch_max_items: int = Field(default=50000, env="BATCH_MAX_ITEMS")
+    batch_max_upload_bytes: int = Field(default=100 * 1024 * 1024, env="BATCH_MAX_UPLOAD_BYTES")
+    batch_max_retries: int = Field(default=5, env="BATCH_MAX_RETRIES")  # Per item, on rate limits
+    batch_queue_timeout_seconds: float = Field(default=300.0, env="BATCH_QUEUE_TIMEOUT_SECONDS")
+    batch_heartbeat_seconds: float = Field(default=15.0, env="BATCH_HEARTBEAT_SECONDS")
+    batch_stale_seconds: float = Field(default=90.0, env="BATCH_STALE_SECONDS")
+    
+    # Fake LLM provider
+    fake_llm_ttft_ms: float = Field(default=300.0, env="FAKE_LLM_TTFT_MS")
+    fake_llm_inter_token_ms: float = Field(default=20.0, env="FAKE_LLM_INTER_TOKEN_MS")
+    fake_llm_response_tokens_mean: int = Field(default=150, env="FAKE_LLM_RESPONSE_TOKENS_MEAN")
+    fake_llm_response_tokens_stddev: int = Field(default=50, env="FAKE_LLM_RESPONSE_TOKENS_STDDEV")
+    fake_llm_rate_limit_error_rate: float = Field(default=0.0, env="FAKE_LLM_RATE_LIMIT_ERROR_RATE")
+    fake_llm_timeout_error_rate: float = Field(default=0.0, env="FAKE_LLM_TIMEOUT_ERROR_RATE")
+    fake_llm_mid_stream_error_rate: float = Field(default=0.0, env="FAKE_LLM_MID_STREAM_ERROR_RATE")
+    fake_llm_seed: int = Field(default=0, env="FAKE_LLM_SEED")
+    
+    # Context window
+    context_token_budget: int = Field(default=3000, env="CONTEXT_TOKEN_BUDGET")
+    context_max_messages: int = Field(default=200, env="CONTEXT_MAX_MESSAGES")
+    
+    # Per-session hot conversation cache
+    conversation_cache_enabled: bool = Field(default=True, env="CONVERSATION_CACHE_ENABLED")
+    conversation_cache_max_bytes: int = Field(default=64 * 1024 * 1024, env="CONVERSATION_CACHE_MAX_BYTES")
+    conversation_cache_ttl_seconds: int = Field(default=300, env="CONVERSATION_CACHE_TTL_SECONDS")
+    
+    # Rolling conversation summaries
+    summary_enabled: bool = Field(default=True, env="SUMMARY_ENABLED")
+    summary_interval_messages: int = Field(default=20, env="SUMMARY_INTERVAL_MESSAGES")
+    summary_keep_recent_messages: int = Field(default=10, env="SUMMARY_KEEP_RECENT_MESSAGES")
+    
+    # LLM request coalescing
+    llm_coalescing_enabled: bool = Field(default=True, env="LLM_COALESCING_ENABLED")
+    
+    # Response cache
+    response_cache_enabled: bool = Field(default=True, env="RESPONSE_CACHE_ENABLED")
+    response_cache_max_entries: int = Field(default=1000, env="RESPONSE_CACHE_MAX_ENTRIES")
+    response_cache_ttl_seconds: int = Field(default=3600, env="RESPONSE_CACHE_TTL_SECONDS")
+    response_cache_semantic_enabled: bool = Field(default=False, env="RESPONSE_CACHE_SEMANTIC_ENABLED")
+    response_cache_similarity_threshold: float = Field(default=0.95, env="RESPONSE_CACHE_SIMILARITY_THRESHOLD")
+    response_cache_replay_chunk_size: int = Field(default=24, env="RESPONSE_CACHE_REPLAY_CHUNK_SIZE")
     
     # CORS
     allowed_origins: str = Field(default="http://localhost:3000,http://localhost", env="ALLOWED_ORIGINS")
     
+    # Internal operational endpoints (/api/internal/*); disabled when empty
+    internal_api_token: str = Field(default="", env="INTERNAL_API_TOKEN")
+    
     # Application
     debug: bool = Field(default=True, env="DEBUG")
     log_level: str = Field(default="INFO", env="LOG_LEVEL")
     
+    @model_validator(mode="after")
+    def check_openai_api_key(self) -> "Settings":
+        """Fail at startup when the OpenAI provider has no key to call it with"""
+        if self.llm_provider.lower() == "openai" and not self.llm_pool_deployments and not self.openai_api_key:
+            raise ValueError("OPENAI_API_KEY is required when LLM_PROVIDER=openai and LLM_POOL_DEPLOYMENTS is empty")
+        return self
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -0,0 +1,141 @@
+"""
+zstd-compressed text columns
+
+CompressedText is a column type holding text as a zstd frame: values are
+compressed on the way in and come back as str, in ORM and Core queries
+alike. Frames are compressed with the active dictionary (the newest one
+registered) and carry its ID, so rows written with older dictionaries stay
+readable as long as those dictionaries remain registered.
+
+Dictionaries are trained from real messages and stored in the
+content_dictionaries table (see app.services.content_compression). Every
+process registers them at startup, and a frame naming a dictionary it has
+not seen (one trained since) has it fetched through the dictionary loader
+and registered, which also makes it the active one.
+"""
+
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from sqlalchemy.types import LargeBinary, TypeDecorator
+from sqlalchemy.util.concurrency import await_only, in_greenlet
+import asyncio
+import threading
+import zstandard
+
+from app.config import settings
+
+
+class UnknownDictionaryError(LookupError):
+    """A frame was compressed with a dictionary this process has not registered"""
+
+
+_dictionaries: Dict[int, zstandard.ZstdCompressionDict] = {}
+_active_id: Optional[int] = None
+# Fetches a dictionary's bytes by ID (None if there is no such dictionary)
+_loader: Optional[Callable[[int], Awaitable[Optional[bytes]]]] = None
+_load_lock: Optional[asyncio.Lock] = None
+# zstd (de)compressors are not thread-safe; keep one per thread and dictionary
+_local = threading.local()
+
+
+def register_dictionary(dict_id: int, data: bytes) -> None:
+    """Make a dictionary available for decompression, and use it for
+    compression if it is the newest"""
+    global _active_id
+    dictionary = zstandard.ZstdCompressionDict(data)
+    if dictionary.dict_id() != dict_id:
+        raise ValueError(f"Dictionary {dict_id} is stored with ID {dictionary.dict_id()}")
+    dictionary.precompute_compress(level=settings.content_compression_level)
+    _dictionaries[dict_id] = dictionary
+    if _active_id is None or dict_id > _active_id:
+        _active_id = dict_id
+    _local.__dict__.clear()
+
+
+def active_dictionary_id() -> Optional[int]:
+    return _active_id
+
+
+def set_dictionary_loader(loader: Callable[[int], Awaitable[Optional[bytes]]]) -> None:
+    """Set how dictionaries missing from this process are fetched"""
+    global _loader
+    _loader = loader
+
+
+async def _load_dictionary(dict_id: int) -> None:
+    global _load_lock
+    if _load_lock is None:
+        _load_lock = asyncio.Lock()
+    async with _load_lock:
+        # Another reader may have loaded it while we waited
+        if dict_id not in _dictionaries:
+            data = await _loader(dict_id)
+            if data is not None:
+                register_dictionary(dict_id, data)
+
+
+def _cached(kind: str, dict_id: int):
+    cache = _local.__dict__.setdefault(kind, {})
+    if dict_id not in cache:
+        options = {}
+        if dict_id:
+            options["dict_data"] = _dictionaries[dict_id]
+        if kind == "compressor":
+            cache[dict_id] = zstandard.ZstdCompressor(level=settings.content_compression_level, **options)
+        else:
+            cache[dict_id] = zstandard.ZstdDecompressor(**options)
+    return cache[dict_id]
+
+
+def compress_text(text: str) -> bytes:
+    """Compress text with the active dictionary (or none)"""
+    return _cached("compressor", _active_id or 0).compress(text.encode("utf-8"))
+
+
+def decompress_text(data: bytes) -> str:
+    """
+    Decompress a frame written by compress_text.
+
+    Raises:
+        UnknownDictionaryError: If the frame's dictionary is not registered
+            and cannot be loaded
+    """
+    dict_id = zstandard.get_frame_parameters(data).dict_id
+    if dict_id and dict_id not in _dictionaries:
+        # Result rows are processed inside SQLAlchemy's async bridge, so the
+        # loader can be awaited from here
+        if _loader is not None and in_greenlet():
+            await_only(_load_dictionary(dict_id))
+        if dict_id not in _dictionaries:
+            raise UnknownDictionaryError(f"zstd dictionary {dict_id} is not in content_dictionaries")
+    return _cached("decompressor", dict_id).decompress(data).decode("utf-8")
+
+
+def split_content(text: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Decide how to store message content.
+
+    Returns:
+        (plain, compressed): exactly one is set. Text at least
+        settings.content_compression_min_bytes long goes in `compressed`
+        (a CompressedText column) when compression is enabled.
+    """
+    if (
+        settings.content_compression_enabled
+        and len(text) * 4 >= settings.content_compression_min_bytes  # Cheap upper bound first
+        and len(text.encode("utf-8")) >= settings.content_compression_min_bytes
+    ):
+        return None, text
+    return text, None
+
+
+class CompressedText(TypeDecorator):
+    """Text stored as a zstd frame (bytea / BLOB)"""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else decompress_text(bytes(value))
@@ -0,0 +1,125 @@
+"""
+Instrumented connection pool
+
+A QueuePool that records, per engine, how long callers wait for a
+connection, how many are waiting, how long connections stay checked out,
+and how often checkout times out. Used to size pools per worker.
+"""
+
+from bisect import bisect_left
+from typing import Dict, List, Type
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+import time
+import threading
+
+# Histogram bucket upper bounds in milliseconds (plus an overflow bucket)
+DEFAULT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram"""
+
+    def __init__(self, buckets_ms=DEFAULT_BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self.counts: List[int] = [0] * (len(self.buckets_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, seconds: float) -> None:
+        ms = seconds * 1000
+        self.counts[bisect_left(self.buckets_ms, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def snapshot(self) -> Dict:
+        labels = [f"le_{b}ms" for b in self.buckets_ms] + ["inf"]
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 2),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class PoolMetrics:
+    """Counters for one engine's pool"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.waiting = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait = Histogram()
+        self.checkout_duration = Histogram()
+        # Pool methods may run on the greenlet bridge; keep updates atomic
+        self._lock = threading.Lock()
+
+
+def instrumented_pool_class(metrics: PoolMetrics) -> Type[AsyncAdaptedQueuePool]:
+    """
+    Build a pool class bound to `metrics`.
+
+    A class (rather than an instance) is needed because the engine
+    creates and recreates its pool itself; recreated pools keep reporting
+    to the same metrics.
+    """
+
+    class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+        _metrics = metrics
+
+        def _do_get(self):
+            with metrics._lock:
+                metrics.waiting += 1
+            started = time.perf_counter()
+            try:
+                record = super()._do_get()
+            except exc.TimeoutError:
+                with metrics._lock:
+                    metrics.timeouts += 1
+                raise
+            finally:
+                waited = time.perf_counter() - started
+                with metrics._lock:
+                    metrics.waiting -= 1
+                    metrics.wait.observe(waited)
+            with metrics._lock:
+                metrics.checkouts += 1
+            record.info["checked_out_at"] = time.perf_counter()
+            return record
+
+        def _do_return_conn(self, record):
+            checked_out_at = record.info.pop("checked_out_at", None)
+            if checked_out_at is not None:
+                with metrics._lock:
+                    metrics.checkout_duration.observe(time.perf_counter() - checked_out_at)
+            super()._do_return_conn(record)
+
+    return InstrumentedQueuePool
+
+
+def pool_stats(engine) -> Dict:
+    """Live pool state plus recorded metrics for an AsyncEngine"""
+    pool = engine.sync_engine.pool
+    stats = {"pool_class": type(pool).__name__}
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        stats.update({
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+        })
+    metrics = getattr(pool, "_metrics", None)
+    if metrics is not None:
+        with metrics._lock:
+            stats.update({
+                "waiting": metrics.waiting,
+                "checkouts": metrics.checkouts,
+                "timeouts": metrics.timeouts,
+                "wait": metrics.wait.snapshot(),
+                "checkout_duration": metrics.checkout_duration.snapshot(),
+            })
+    return stats
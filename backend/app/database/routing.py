@@ -0,0 +1,237 @@
+"""
+Read-replica routing
+
+Sessions route each statement to an engine in get_bind(): writes, flushes
+and SELECT ... FOR UPDATE always go to the primary. Reads go to a replica
+only inside replica_reads() (or a @replica_read service function), and only
+if:
+
+- a replica is healthy and its measured lag is under the limit, and
+- the session's user has not written within the read-your-writes window
+  (the window is at least the replica's current lag).
+
+Everything else, including every read when no replica is configured,
+uses the primary. Write times are tracked per worker; a read served by
+another worker within the window relies on the lag limit instead.
+"""
+
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, Iterator, List, Optional, Type
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+import asyncio
+import itertools
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Session.info keys
+USER_KEY = "user_id"
+_REPLICA_READS_KEY = "replica_reads"
+_WROTE_KEY = "wrote"
+
+_PG_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class Replica:
+    """A replica engine and its last health check"""
+
+    def __init__(self, name: str, engine: AsyncEngine):
+        self.name = name
+        self.engine = engine
+        self.healthy = False  # Until the first check succeeds
+        self.lag_seconds: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.reads = 0
+
+
+class ReplicaRouter:
+    """
+    Picks the engine for each read and monitors replica lag.
+
+    Args:
+        primary: Engine for writes and fallback reads
+        replicas: Replica engines by name
+        max_lag_seconds: Replicas lagging more than this are skipped
+        read_your_writes_seconds: Reads by a user this soon after their
+            last write go to the primary
+        check_interval: Seconds between lag checks
+    """
+
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replicas: Dict[str, AsyncEngine],
+        max_lag_seconds: float = 5.0,
+        read_your_writes_seconds: float = 5.0,
+        check_interval: float = 2.0
+    ):
+        self.primary = primary
+        self.replicas: List[Replica] = [Replica(name, e) for name, e in replicas.items()]
+        self.max_lag_seconds = max_lag_seconds
+        self.read_your_writes_seconds = read_your_writes_seconds
+        self.check_interval = check_interval
+        self._last_write: Dict[int, float] = {}
+        self._round_robin = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+        self.primary_reads = 0
+        self.fallbacks = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def note_write(self, user_id: Optional[int]) -> None:
+        """Record that a user's write was committed (or queued)"""
+        if user_id is not None and self.enabled:
+            self._last_write[user_id] = time.monotonic()
+
+    def read_engine(self, user_id: Optional[int]) -> AsyncEngine:
+        """Engine for a replica-eligible read by `user_id`"""
+        if not self.enabled:
+            return self.primary
+
+        healthy = [
+            r for r in self.replicas
+            if r.healthy and r.lag_seconds is not None and r.lag_seconds <= self.max_lag_seconds
+        ]
+        if not healthy:
+            self.fallbacks += 1
+            return self.primary
+
+        replica = healthy[next(self._round_robin) % len(healthy)]
+        if user_id is not None:
+            wrote_at = self._last_write.get(user_id)
+            window = max(self.read_your_writes_seconds, replica.lag_seconds)
+            if wrote_at is not None:
+                if time.monotonic() - wrote_at < window:
+                    self.primary_reads += 1
+                    return self.primary
+                del self._last_write[user_id]
+
+        replica.reads += 1
+        return replica.engine
+
+    def start(self) -> None:
+        """Start monitoring replica lag"""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._monitor())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    async def check(self) -> None:
+        """Measure every replica's lag once"""
+        await asyncio.gather(*(self._check(r) for r in self.replicas))
+        # Forget writes older than any window that could still apply
+        horizon = time.monotonic() - max(self.read_your_writes_seconds, self.max_lag_seconds)
+        self._last_write = {u: t for u, t in self._last_write.items() if t > horizon}
+
+    async def _check(self, replica: Replica) -> None:
+        try:
+            async with replica.engine.connect() as connection:
+                if connection.dialect.name == "postgresql":
+                    lag = float((await connection.execute(_PG_LAG_QUERY)).scalar_one())
+                else:
+                    await connection.execute(text("SELECT 1"))
+                    lag = 0.0
+        except Exception as e:
+            if replica.healthy:
+                logger.warning(f"Replica {replica.name} unavailable, reading from primary: {e}")
+            replica.healthy = False
+            replica.last_error = str(e)
+        else:
+            if lag > self.max_lag_seconds and (replica.lag_seconds or 0) <= self.max_lag_seconds:
+                logger.warning(f"Replica {replica.name} is {lag:.1f}s behind, reading from primary")
+            replica.healthy = True
+            replica.lag_seconds = lag
+            replica.last_error = None
+        replica.checked_at = time.monotonic()
+
+    async def _monitor(self) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(self.check_interval)
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        return {
+            "primary_reads_after_write": self.primary_reads,
+            "fallbacks": self.fallbacks,
+            "recent_writers": len(self._last_write),
+            "replicas": {
+                r.name: {
+                    "healthy": r.healthy,
+                    "lag_seconds": r.lag_seconds,
+                    "checked_seconds_ago": round(now - r.checked_at, 1) if r.checked_at else None,
+                    "last_error": r.last_error,
+                    "reads": r.reads,
+                }
+                for r in self.replicas
+            },
+        }
+
+
+def routing_session_class(router: ReplicaRouter) -> Type[Session]:
+    """Build a sync Session class (for async_sessionmaker) routed by `router`"""
+
+    class RoutingSession(Session):
+
+        def get_bind(self, mapper=None, clause=None, **kw):
+            if self.bind is not None and self.bind is not router.primary.sync_engine:
+                # Explicitly bound elsewhere (e.g. AsyncSessionLocal(bind=...))
+                return super().get_bind(mapper=mapper, clause=clause, **kw)
+            if (
+                self.info.get(_REPLICA_READS_KEY)
+                and not self._flushing
+                and not isinstance(clause, UpdateBase)
+                and getattr(clause, "_for_update_arg", None) is None
+            ):
+                return router.read_engine(self.info.get(USER_KEY)).sync_engine
+            if self._flushing or isinstance(clause, UpdateBase):
+                self.info[_WROTE_KEY] = True
+            return router.primary.sync_engine
+
+    @event.listens_for(RoutingSession, "after_commit")
+    def _after_commit(session):
+        if session.info.pop(_WROTE_KEY, False):
+            router.note_write(session.info.get(USER_KEY))
+
+    @event.listens_for(RoutingSession, "after_rollback")
+    def _after_rollback(session):
+        session.info.pop(_WROTE_KEY, None)
+
+    return RoutingSession
+
+
+@contextmanager
+def replica_reads(db: AsyncSession) -> Iterator[None]:
+    """Let reads on `db` use a replica within this block"""
+    info = db.sync_session.info
+    info[_REPLICA_READS_KEY] = info.get(_REPLICA_READS_KEY, 0) + 1
+    try:
+        yield
+    finally:
+        info[_REPLICA_READS_KEY] -= 1
+
+
+def replica_read(func):
+    """Mark an async service function `(db, ...)` as read-only: its queries may use a replica"""
+
+    @wraps(func)
+    async def wrapper(db: AsyncSession, *args, **kwargs):
+        with replica_reads(db):
+            return await func(db, *args, **kwargs)
+    return wrapper
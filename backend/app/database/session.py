@@ -1,21 +1,96 @@
+from typing import Any, Dict, Optional
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.pool import NullPool
+import uuid
+
 from app.config import settings
+from app.database.pool import PoolMetrics, instrumented_pool_class
+from app.database.routing import USER_KEY, ReplicaRouter, routing_session_class
+
+
+def _engine_options(url: str, metrics: PoolMetrics) -> Dict[str, Any]:
+    """Pool and driver options for an engine, from settings"""
+    options: Dict[str, Any] = {"echo": settings.db_echo, "future": True}
+
+    if url.startswith("sqlite") and ":memory:" in url:
+        # In-memory SQLite needs its single static connection
+        return options
+
+    if settings.db_pool_size <= 0:
+        # External pooler (e.g. PgBouncer) does all pooling
+        options["poolclass"] = NullPool
+    else:
+        options.update(
+            poolclass=instrumented_pool_class(metrics),
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout_seconds,
+            pool_recycle=settings.db_pool_recycle_seconds,
+            pool_pre_ping=settings.db_pool_pre_ping,
+        )
+
+    if url.startswith("postgresql+asyncpg"):
+        connect_args: Dict[str, Any] = {
+            # SQLAlchemy's prepared statement cache and asyncpg's own
+            "prepared_statement_cache_size": settings.db_statement_cache_size,
+            "statement_cache_size": settings.db_statement_cache_size,
+        }
+        if settings.db_pgbouncer_transaction_mode:
+            # Prepared statements don't survive PgBouncer transaction pooling:
+            # disable both statement caches and use unique statement names
+            connect_args.update(
+                prepared_statement_cache_size=0,
+                statement_cache_size=0,
+                prepared_statement_name_func=lambda: f"__asyncpg_{uuid.uuid4()}__",
+            )
+        options["connect_args"] = connect_args
+
+    return options
+
+
+# Pool metrics, exposed via /api/internal/db/pool
+pool_metrics = PoolMetrics("primary")
 
 # Create async engine
 engine = create_async_engine(
     settings.database_url,
-    echo=settings.debug,
-    future=True
+    **_engine_options(settings.database_url, pool_metrics)
+)
+
+# Read replicas, each with its own pool
+replica_engines = {}
+for index, url in enumerate(u.strip() for u in settings.database_replica_urls.split(",") if u.strip()):
+    name = f"replica_{index}"
+    replica_engines[name] = create_async_engine(url, **_engine_options(url, PoolMetrics(name)))
+
+# Routes replica-eligible reads (see app.database.routing)
+replica_router = ReplicaRouter(
+    engine,
+    replica_engines,
+    max_lag_seconds=settings.db_replica_max_lag_seconds,
+    read_your_writes_seconds=settings.db_read_your_writes_seconds,
+    check_interval=settings.db_replica_check_seconds
 )
 
 # Create async session factory
 AsyncSessionLocal = async_sessionmaker(
     engine,
     class_=AsyncSession,
+    sync_session_class=routing_session_class(replica_router),
     expire_on_commit=False
 )
 
 
+def set_session_user(db: AsyncSession, user_id: Optional[int]) -> None:
+    """Tie a session to a user, for read-your-writes replica routing"""
+    db.info[USER_KEY] = user_id
+
+
+def note_write(db: AsyncSession) -> None:
+    """Start the read-your-writes window for a write that bypassed `db` (write-behind)"""
+    replica_router.note_write(db.info.get(USER_KEY))
+
+
 async def get_db():
     """Dependency for getting async database session"""
     async with AsyncSessionLocal() as session:
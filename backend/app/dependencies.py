@@ -1,8 +1,11 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from app.database.session import get_db
+from typing import Optional
+import secrets
+from app.config import settings
+from app.database.session import get_db, set_session_user
 from app.models.user import User
 from app.auth.jwt_handler import decode_access_token
 from app.utils.logger import get_logger
@@ -61,6 +64,9 @@ async def get_current_user(
             detail="Inactive user"
         )
     
+    # The request's reads honour this user's read-your-writes window
+    set_session_user(db, user.id)
+    
     logger.debug(f"User authenticated: {user.username} (ID: {user.id})")
     return user
 
@@ -78,3 +84,24 @@ async def get_current_active_user(
             detail="Inactive user"
         )
     return current_user
+
+
+async def require_internal_token(
+    x_internal_token: Optional[str] = Header(default=None)
+) -> None:
+    """
+    Dependency guarding internal operational endpoints.
+    
+    Raises:
+        HTTPException: 404 if internal endpoints are disabled,
+            403 if the token does not match
+    """
+    if not settings.internal_api_token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    
+    if not x_internal_token or not secrets.compare_digest(x_internal_token, settings.internal_api_token):
+        logger.warning("Rejected internal endpoint request with invalid token")
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid internal token"
+        )
@@ -0,0 +1 @@
+# Internal operations module
@@ -0,0 +1,114 @@
+"""
+Internal operational endpoints (not for end users)
+
+All routes require the X-Internal-Token header to match INTERNAL_API_TOKEN
+and are disabled when that setting is empty.
+"""
+
+from fastapi import APIRouter, Depends
+
+from app.chat.event_bus import get_event_bus
+from app.chat.stream_registry import get_stream_registry
+from app.database.pool import pool_stats
+from app.database.session import engine, replica_engines, replica_router
+from app.dependencies import require_internal_token
+from app.services.admission import get_admission_controller
+from app.services.archive_service import get_session_archiver
+from app.services.conversation_cache import get_conversation_cache
+from app.services.langchain_service import get_langchain_service
+from app.services.write_behind import get_write_behind
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/internal",
+    tags=["internal"],
+    dependencies=[Depends(require_internal_token)],
+    include_in_schema=False
+)
+
+
+@router.get("/llm/pool")
+async def get_llm_pool_stats():
+    """Live per-entry utilization of the upstream LLM pool"""
+    service = get_langchain_service()
+    return {"entries": service.pool_stats()}
+
+
+@router.get("/llm/cache")
+async def get_response_cache_stats():
+    """Response cache hit/miss counters"""
+    service = get_langchain_service()
+    if service.response_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **service.response_cache.get_stats()}
+
+
+@router.get("/llm/hedging")
+async def get_hedging_stats():
+    """TTFT hedge deadline and how often hedges fired and won"""
+    stats = get_langchain_service().hedging_stats()
+    if stats is None:
+        return {"enabled": False}
+    return {"enabled": True, **stats}
+
+
+@router.get("/llm/admission")
+async def get_admission_stats():
+    """LLM concurrency slots in use and queue depth"""
+    return get_admission_controller().stats()
+
+
+@router.get("/streams")
+async def get_stream_stats():
+    """Resumable streams held in memory and generations with no client attached"""
+    return get_stream_registry().stats()
+
+
+@router.get("/events")
+async def get_event_bus_stats():
+    """Session event bus watchers and relayed event counts"""
+    return get_event_bus().stats()
+
+
+@router.get("/archive")
+async def get_archive_stats():
+    """Cold-session archiver runs and sessions archived by this worker"""
+    archiver = get_session_archiver()
+    if archiver is None:
+        return {"enabled": False}
+    return {"enabled": True, **archiver.stats()}
+
+
+@router.get("/write-behind")
+async def get_write_behind_stats():
+    """Queued chat writes and batch flush counters"""
+    write_behind = get_write_behind()
+    if write_behind is None:
+        return {"enabled": False}
+    return {"enabled": True, **write_behind.stats()}
+
+
+@router.get("/db/pool")
+async def get_db_pool_stats():
+    """Connection pool saturation: checked out, waiters, wait and hold times"""
+    pools = {"primary": pool_stats(engine)}
+    for name, replica_engine in replica_engines.items():
+        pools[name] = pool_stats(replica_engine)
+    return pools
+
+
+@router.get("/db/replicas")
+async def get_db_replica_stats():
+    """Replica health and lag, and how reads were routed"""
+    return replica_router.stats()
+
+
+@router.get("/conversation-cache")
+async def get_conversation_cache_stats():
+    """Per-session conversation cache footprint and hit rate"""
+    cache = get_conversation_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
@@ -47,6 +47,10 @@ from app.chat.router import router as chat_router
 app.include_router(chat_router, prefix="/api")
 from app.chat.websocket import router as websocket_router
 app.include_router(websocket_router, prefix="/api")
+from app.batch.router import router as batch_router
+app.include_router(batch_router, prefix="/api")
+from app.internal.router import router as internal_router
+app.include_router(internal_router, prefix="/api")
 
 
 # Logging middleware
@@ -84,12 +88,66 @@ async def startup_event():
     logger.info("Starting LangChain Chatbot API...")
     logger.info(f"Debug mode: {settings.debug}")
     logger.info(f"Log level: {settings.log_level}")
+    
+    # Dictionaries for compressed message content, before anything reads messages
+    from app.services.content_compression import load_content_dictionaries
+    await load_content_dictionaries()
+    
+    # Responses left mid-stream by a worker that died keep their last checkpoint
+    from app.database.session import AsyncSessionLocal
+    from app.services.chat_service import recover_streaming_messages
+    async with AsyncSessionLocal() as db:
+        await recover_streaming_messages(db, settings.message_streaming_recovery_seconds)
+    
+    # Relay session events between workers
+    from app.chat.event_bus import get_event_bus
+    await get_event_bus().start()
+    
+    # Measure replica lag before routing reads to replicas
+    from app.database.session import replica_router
+    if replica_router.enabled:
+        await replica_router.check()
+        replica_router.start()
+    
+    # Pick up batch jobs that are pending or whose worker died
+    from app.services.batch_service import get_batch_runner
+    get_batch_runner().start_sweeper()
+    
+    # Move idle sessions to compressed archives
+    from app.services.archive_service import get_session_archiver
+    archiver = get_session_archiver()
+    if archiver is not None:
+        archiver.start()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Application shutdown event"""
     logger.info("Shutting down LangChain Chatbot API...")
+    
+    from app.services.batch_service import get_batch_runner
+    await get_batch_runner().shutdown()
+    
+    from app.services.archive_service import get_session_archiver
+    archiver = get_session_archiver()
+    if archiver is not None:
+        await archiver.shutdown()
+    
+    # Stop generations first: they queue their final message writes
+    from app.chat.stream_registry import get_stream_registry
+    await get_stream_registry().shutdown()
+    
+    # Don't lose queued chat writes
+    from app.services.write_behind import get_write_behind
+    write_behind = get_write_behind()
+    if write_behind is not None:
+        await write_behind.close()
+    
+    from app.chat.event_bus import get_event_bus
+    await get_event_bus().close()
+    
+    from app.database.session import replica_router
+    await replica_router.close()
 
 
 @app.get("/")
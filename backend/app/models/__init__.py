@@ -2,5 +2,8 @@
 from app.models.user import User
 from app.models.chat_session import ChatSession
 from app.models.message import Message
+from app.models.batch_job import BatchJob
+from app.models.session_archive import SessionArchive
+from app.models.content_dictionary import ContentDictionary
 
-__all__ = ["User", "ChatSession", "Message"]
+__all__ = ["User", "ChatSession", "Message", "BatchJob", "SessionArchive", "ContentDictionary"]
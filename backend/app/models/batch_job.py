@@ -0,0 +1,35 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime, Boolean, Enum
+from sqlalchemy.sql import func
+from app.database.base import Base
+import enum
+
+
+class BatchJobStatus(str, enum.Enum):
+    """Enum for batch job states"""
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class BatchJob(Base):
+    """Batch generation job; items and results live in JSONL files on disk"""
+    __tablename__ = "batch_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    status = Column(Enum(BatchJobStatus), nullable=False, default=BatchJobStatus.PENDING, index=True)
+    use_cache = Column(Boolean, nullable=False, default=True, server_default="true")
+    total_items = Column(Integer, nullable=False, default=0)
+    completed_items = Column(Integer, nullable=False, default=0, server_default="0")
+    failed_items = Column(Integer, nullable=False, default=0, server_default="0")
+    error = Column(Text, nullable=True)
+    
+    # Worker currently processing the job; a stale heartbeat means it died
+    claimed_by = Column(String(64), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database.base import Base
@@ -7,12 +7,29 @@ from app.database.base import Base
 class ChatSession(Base):
     """Chat session model for managing conversation sessions"""
     __tablename__ = "chat_sessions"
+    __table_args__ = (
+        # Session list: keyset pagination by (updated_at, id) per user
+        Index("ix_chat_sessions_user_updated", "user_id", "updated_at", "id"),
+        # Archival candidates: live sessions by idle time
+        Index(
+            "ix_chat_sessions_live_updated", "updated_at",
+            postgresql_where=text("archived_at IS NULL"),
+            sqlite_where=text("archived_at IS NULL")
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     title = Column(String(255), default="New Conversation")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
+    # Rolling summary of every message up to and including summary_message_id
+    summary = Column(Text, nullable=True)
+    summary_message_id = Column(Integer, nullable=True)
+    
+    # Set while the messages are held compressed in session_archives
+    archived_at = Column(DateTime(timezone=True), nullable=True)
+    
     # Relationships
     messages = relationship("Message", back_populates="session", cascade="all, delete-orphan", lazy="select")
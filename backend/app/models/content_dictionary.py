@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, DateTime, LargeBinary
+from sqlalchemy.sql import func
+from app.database.base import Base
+
+
+class ContentDictionary(Base):
+    """zstd dictionary trained on message content; id is the zstd dictionary ID"""
+    __tablename__ = "content_dictionaries"
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    data = Column(LargeBinary, nullable=False)
+    sample_count = Column(Integer, nullable=False)  # Messages it was trained on
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
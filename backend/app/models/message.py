@@ -1,7 +1,10 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime, Enum
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime, Enum, Index, CheckConstraint
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database.base import Base
+from app.database.compression import CompressedText, split_content
+from typing import Any, Dict
 import enum
 
 
@@ -11,15 +14,61 @@ class MessageRole(str, enum.Enum):
     ASSISTANT = "assistant"
 
 
+class MessageStatus(str, enum.Enum):
+    """Enum for message completion states"""
+    COMPLETE = "complete"
+    TRUNCATED = "truncated"  # Generation was cancelled part way through
+    STREAMING = "streaming"  # Generation in progress; content is the last checkpoint
+
+
 class Message(Base):
     """Message model for storing chat messages"""
+    # On PostgreSQL: hash-partitioned by session_id, primary key (id, session_id) (migration 009)
     __tablename__ = "messages"
+    __table_args__ = (
+        # History pages and context loads: keyset on (created_at, id) per session
+        Index("ix_messages_session_created", "session_id", "created_at", "id"),
+        CheckConstraint(
+            "(content IS NULL) <> (content_zstd IS NULL)", name="ck_messages_content_stored_once"
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    session_id = Column(Integer, ForeignKey("chat_sessions.id", ondelete="CASCADE"), nullable=False, index=True)
+    session_id = Column(Integer, ForeignKey("chat_sessions.id", ondelete="CASCADE"), nullable=False)
     role = Column(Enum(MessageRole), nullable=False)
-    content = Column(Text, nullable=False)
+    # Content is stored in exactly one of these (see split_content); use .content
+    content_plain = Column("content", Text, nullable=True)
+    content_zstd = Column(CompressedText, nullable=True)
+    token_count = Column(Integer, nullable=True)  # Tokenized once on insert
+    status = Column(String(20), nullable=False, default=MessageStatus.COMPLETE.value, server_default="complete")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationship
     session = relationship("ChatSession", back_populates="messages")
+    
+    @hybrid_property
+    def content(self) -> str:
+        """Message text, decompressed if it is stored compressed"""
+        return self.content_plain if self.content_plain is not None else self.content_zstd
+    
+    @content.inplace.setter
+    def _content_setter(self, value: str) -> None:
+        self.content_plain, self.content_zstd = split_content(value)
+    
+    @content.inplace.expression
+    @classmethod
+    def _content_expression(cls):
+        # In SQL only the uncompressed column is visible (e.g. for appending
+        # to a streaming response, which is never compressed)
+        return cls.content_plain
+
+
+def content_values(content: str) -> Dict[str, Any]:
+    """Column values storing `content`, for Core inserts and updates"""
+    plain, compressed = split_content(content)
+    return {"content": plain, "content_zstd": compressed}
+
+
+def message_content(row) -> str:
+    """Text of a Core row that selected both messages.content and content_zstd"""
+    return row.content if row.content is not None else row.content_zstd
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, LargeBinary
+from sqlalchemy.sql import func
+from app.database.base import Base
+
+
+class SessionArchive(Base):
+    """Messages of an idle chat session, compressed into one blob"""
+    __tablename__ = "session_archives"
+    
+    session_id = Column(Integer, ForeignKey("chat_sessions.id", ondelete="CASCADE"), primary_key=True)
+    format_version = Column(Integer, nullable=False)
+    message_count = Column(Integer, nullable=False)
+    raw_bytes = Column(Integer, nullable=False)  # Size before compression
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -12,5 +12,8 @@ class User(Base):
     email = Column(String(255), unique=True, nullable=False, index=True)
     hashed_password = Column(String(255), nullable=False)
     is_active = Column(Boolean, default=True)
+    response_cache_opt_out = Column(Boolean, nullable=False, default=False, server_default="false")
+    # Maintained by chat_service on session create/delete (no count(*) per page)
+    session_count = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -56,6 +56,7 @@ class UserResponse(BaseModel):
     username: str
     email: str
     is_active: bool
+    response_cache_opt_out: bool = False
     created_at: str
     
     class Config:
@@ -66,11 +67,24 @@ class UserResponse(BaseModel):
                 "username": "johndoe",
                 "email": "john@example.com",
                 "is_active": True,
+                "response_cache_opt_out": False,
                 "created_at": "2025-12-02T10:00:00"
             }
         }
 
 
+class UserPreferencesUpdate(BaseModel):
+    """Schema for updating user preferences"""
+    response_cache_opt_out: bool = Field(..., description="Never serve or store cached AI responses for this user")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "response_cache_opt_out": True
+            }
+        }
+
+
 class Token(BaseModel):
     """Schema for JWT token response"""
     access_token: str
@@ -0,0 +1,46 @@
+"""
+Batch job schemas for request/response validation
+"""
+
+from pydantic import BaseModel
+from typing import Optional, List
+from datetime import datetime
+from enum import Enum
+
+
+class BatchJobStatus(str, Enum):
+    """Batch job status enum"""
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class BatchJobResponse(BaseModel):
+    """Schema for batch job response"""
+    id: int
+    user_id: int
+    status: BatchJobStatus
+    use_cache: bool
+    total_items: int
+    completed_items: int
+    failed_items: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+        json_encoders = {
+            datetime: lambda v: v.isoformat()
+        }
+
+
+class BatchJobList(BaseModel):
+    """Schema for paginated list of batch jobs"""
+    jobs: List[BatchJobResponse]
+    total: int
+    limit: int
+    offset: int
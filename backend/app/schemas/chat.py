@@ -2,7 +2,7 @@
 Chat schemas for request/response validation
 """
 
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, model_validator, validator
 from typing import Optional, List
 from datetime import datetime
 from enum import Enum
@@ -74,8 +74,18 @@ class MessageResponse(BaseModel):
     session_id: int
     role: MessageRole
     content: str
+    token_count: Optional[int] = None
+    status: str = "complete"  # "truncated" if cancelled, "streaming" while generating
     created_at: datetime
     
+    @model_validator(mode="before")
+    @classmethod
+    def decompressed_content(cls, data):
+        """Core rows carry compressed content in content_zstd (ORM objects decompress themselves)"""
+        if hasattr(data, "_mapping") and data.content is None:
+            return {**data._mapping, "content": data.content_zstd}
+        return data
+    
     class Config:
         from_attributes = True
         json_encoders = {
@@ -87,6 +97,7 @@ class ChatMessagePair(BaseModel):
     """Schema for user message + AI response pair"""
     user_message: MessageResponse
     assistant_message: MessageResponse
+    context_tokens: Optional[int] = None  # Prompt tokens used for this turn
 
 
 class ChatSessionWithMessages(BaseModel):
@@ -105,9 +116,18 @@ class ChatSessionWithMessages(BaseModel):
         }
 
 
+class MessagePage(BaseModel):
+    """Schema for one page of a session's message history"""
+    messages: List[MessageResponse]  # Oldest first
+    has_more: bool  # More messages beyond this page in the direction read
+    before_cursor: Optional[str] = None  # Pass as ?before= for older messages
+    after_cursor: Optional[str] = None  # Pass as ?after= for newer messages
+
+
 class ChatSessionList(BaseModel):
     """Schema for paginated list of chat sessions"""
     sessions: List[ChatSessionResponse]
     total: int
     limit: int
     offset: int
+    next_cursor: Optional[str] = None  # Pass as ?cursor= for the next page; None on the last page
@@ -0,0 +1,238 @@
+"""
+Admission control for LLM calls
+
+A global concurrency limit in front of LangChainService with weighted
+fair queueing between users, so one heavy user cannot starve the rest.
+"""
+
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import itertools
+import time
+import logging
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Called with the 1-based queue position whenever it changes
+PositionCallback = Callable[[int], Awaitable[None]]
+
+
+class AdmissionTimeoutError(Exception):
+    """A request waited longer than the queue timeout for an LLM slot"""
+
+
+class AdmissionQueueFullError(Exception):
+    """The admission queue is at capacity"""
+
+
+@dataclass(eq=False)
+class _Waiter:
+    user_id: int
+    finish_tag: float
+    sequence: int
+    future: asyncio.Future
+    on_position: Optional[PositionCallback] = None
+    last_position: int = 0
+
+
+@dataclass
+class _UserState:
+    weight: float = 1.0
+    last_finish_tag: float = 0.0
+    active: int = 0
+    waiting: List[_Waiter] = field(default_factory=list)
+
+
+class AdmissionController:
+    """
+    Global concurrency limiter with weighted fair queueing per user.
+
+    Queued requests are ordered by virtual finish time (start-time fair
+    queueing): each request from a user advances that user's finish tag
+    by 1/weight, so users with equal weight alternate instead of being
+    served first come first served.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_queue: int = 1000,
+        queue_timeout: float = 30.0
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._active = 0
+        self._virtual_time = 0.0
+        self._sequence = itertools.count()
+        self._queue: List[_Waiter] = []
+        self._users: Dict[int, _UserState] = {}
+        self.admitted = 0
+        self.timed_out = 0
+        self.rejected = 0
+
+    def set_weight(self, user_id: int, weight: float) -> None:
+        """Give a user a larger (or smaller) share of the LLM slots"""
+        self._user(user_id).weight = max(weight, 0.01)
+
+    def _user(self, user_id: int) -> _UserState:
+        state = self._users.get(user_id)
+        if state is None:
+            state = self._users[user_id] = _UserState()
+        return state
+
+    def _release_user(self, user_id: int) -> None:
+        state = self._users.get(user_id)
+        if state is not None and state.active == 0 and not state.waiting and state.weight == 1.0:
+            del self._users[user_id]
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        user_id: int,
+        on_position: Optional[PositionCallback] = None,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[None]:
+        """
+        Hold one LLM concurrency slot for the duration of the block.
+
+        Args:
+            user_id: User the request belongs to
+            on_position: Awaited with the queue position while queued
+            timeout: Max seconds to wait in the queue (defaults to queue_timeout)
+
+        Raises:
+            AdmissionTimeoutError: If no slot freed up in time
+            AdmissionQueueFullError: If the queue is at capacity
+        """
+        await self._acquire(user_id, on_position, self.queue_timeout if timeout is None else timeout)
+        try:
+            yield
+        finally:
+            self._release(user_id)
+
+    async def _acquire(
+        self,
+        user_id: int,
+        on_position: Optional[PositionCallback],
+        timeout: float
+    ) -> None:
+        state = self._user(user_id)
+
+        if self._active < self.max_concurrency and not self._queue:
+            state.last_finish_tag = max(self._virtual_time, state.last_finish_tag) + 1 / state.weight
+            self._admit(state)
+            return
+
+        if len(self._queue) >= self.max_queue:
+            self.rejected += 1
+            self._release_user(user_id)
+            raise AdmissionQueueFullError("LLM admission queue is full")
+
+        state.last_finish_tag = max(self._virtual_time, state.last_finish_tag) + 1 / state.weight
+        waiter = _Waiter(
+            user_id=user_id,
+            finish_tag=state.last_finish_tag,
+            sequence=next(self._sequence),
+            future=asyncio.get_running_loop().create_future(),
+            on_position=on_position
+        )
+        self._queue.append(waiter)
+        self._queue.sort(key=lambda w: (w.finish_tag, w.sequence))
+        state.waiting.append(waiter)
+        self._schedule_position_updates()
+
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            if waiter.future.done():
+                # Admitted at the last moment; keep the slot
+                return
+            self._remove(waiter)
+            self.timed_out += 1
+            raise AdmissionTimeoutError(f"Waited {timeout:g}s for an LLM slot")
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._release(user_id)
+            else:
+                self._remove(waiter)
+            raise
+
+        logger.debug(f"User {user_id} admitted after {time.monotonic() - started:.2f}s in queue")
+
+    def _admit(self, state: _UserState) -> None:
+        self._active += 1
+        state.active += 1
+        self.admitted += 1
+
+    def _remove(self, waiter: _Waiter) -> None:
+        if waiter in self._queue:
+            self._queue.remove(waiter)
+        state = self._users.get(waiter.user_id)
+        if state is not None and waiter in state.waiting:
+            state.waiting.remove(waiter)
+        self._release_user(waiter.user_id)
+        self._schedule_position_updates()
+
+    def _release(self, user_id: int) -> None:
+        self._active -= 1
+        state = self._users.get(user_id)
+        if state is not None:
+            state.active -= 1
+        self._release_user(user_id)
+
+        while self._queue and self._active < self.max_concurrency:
+            waiter = self._queue.pop(0)
+            waiter_state = self._user(waiter.user_id)
+            waiter_state.waiting.remove(waiter)
+            self._virtual_time = max(self._virtual_time, waiter.finish_tag - 1 / waiter_state.weight)
+            self._admit(waiter_state)
+            waiter.future.set_result(None)
+
+        self._schedule_position_updates()
+
+    def _schedule_position_updates(self) -> None:
+        if any(waiter.on_position for waiter in self._queue):
+            asyncio.get_running_loop().create_task(self._notify_positions())
+
+    async def _notify_positions(self) -> None:
+        for position, waiter in enumerate(list(self._queue), start=1):
+            if waiter.on_position is None or waiter.last_position == position:
+                continue
+            waiter.last_position = position
+            try:
+                await waiter.on_position(position)
+            except Exception as e:
+                logger.debug(f"Failed to send queue position to user {waiter.user_id}: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        """Current load and lifetime counters"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self._active,
+            "queued": len(self._queue),
+            "admitted": self.admitted,
+            "timed_out": self.timed_out,
+            "rejected": self.rejected,
+        }
+
+
+# Singleton instance
+_admission_controller = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """Get or create singleton admission controller instance"""
+    global _admission_controller
+    if _admission_controller is None:
+        _admission_controller = AdmissionController(
+            max_concurrency=settings.llm_max_concurrency,
+            max_queue=settings.llm_max_queue,
+            queue_timeout=settings.llm_queue_timeout_seconds
+        )
+    return _admission_controller
@@ -0,0 +1,275 @@
+"""
+Cold-session archival
+
+Sessions idle for settings.archive_idle_days have their messages moved
+out of the messages table into one zstd-compressed blob in
+session_archives, and chat_sessions.archived_at is set. Opening an
+archived session (chat_service.get_session_by_id and friends) rehydrates
+it: the messages are restored with their original ids and timestamps.
+
+Each session is archived or rehydrated in its own transaction, with the
+chat_sessions row locked, so workers can run the archiver concurrently
+(SKIP LOCKED) and a session being opened is never archived half way.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from sqlalchemy import delete, exists, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+import asyncio
+import json
+import logging
+import zstandard
+
+from app.config import settings
+from app.database.session import AsyncSessionLocal
+from app.models.chat_session import ChatSession
+from app.models.message import Message, MessageRole, MessageStatus, content_values, message_content
+from app.models.session_archive import SessionArchive
+from app.services.conversation_cache import get_conversation_cache
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+_messages = Message.__table__
+_sessions = ChatSession.__table__
+_ARCHIVED_COLUMNS = ("id", "role", "content", "token_count", "status", "created_at")
+
+
+def encode_messages(rows: List[Any], level: int) -> tuple[bytes, int]:
+    """Compress message rows; returns (blob, uncompressed size)"""
+    raw = json.dumps([
+        [
+            row.id,
+            MessageRole(row.role).value,
+            message_content(row),
+            row.token_count,
+            row.status,
+            row.created_at.isoformat() if row.created_at else None
+        ]
+        for row in rows
+    ], separators=(",", ":")).encode("utf-8")
+    return zstandard.ZstdCompressor(level=level).compress(raw), len(raw)
+
+
+def decode_messages(session_id: int, data: bytes) -> List[Dict[str, Any]]:
+    """Inverse of encode_messages, as rows ready to insert into messages"""
+    records = json.loads(zstandard.ZstdDecompressor().decompress(data))
+    messages = []
+    for record in records:
+        message = dict(zip(_ARCHIVED_COLUMNS, record))
+        message["session_id"] = session_id
+        message["role"] = MessageRole(message["role"])
+        message.update(content_values(message["content"]))
+        if message["created_at"] is not None:
+            message["created_at"] = datetime.fromisoformat(message["created_at"])
+        messages.append(message)
+    return messages
+
+
+async def archive_session(db: AsyncSession, session_id: int, idle_before: datetime) -> bool:
+    """
+    Archive one session if it is still idle, live and not locked, and commit.
+
+    Args:
+        db: Database session
+        session_id: ID of the chat session
+        idle_before: Only archive if the session was last updated before this
+
+    Returns:
+        True if the session was archived
+    """
+    locked = (await db.execute(
+        select(_sessions.c.id)
+        .where(
+            _sessions.c.id == session_id,
+            _sessions.c.archived_at.is_(None),
+            _sessions.c.updated_at < idle_before
+        )
+        .with_for_update(skip_locked=True)
+    )).scalar_one_or_none()
+    if locked is None:
+        await db.rollback()
+        return False
+
+    rows = (await db.execute(
+        select(*(_messages.c[name] for name in _ARCHIVED_COLUMNS), _messages.c.content_zstd)
+        .where(_messages.c.session_id == session_id)
+        .order_by(_messages.c.created_at, _messages.c.id)
+    )).all()
+    if not rows or any(row.status == MessageStatus.STREAMING.value for row in rows):
+        # Nothing to archive, or a generation was left mid-stream
+        await db.rollback()
+        return False
+
+    data, raw_bytes = encode_messages(rows, settings.archive_zstd_level)
+    db.add(SessionArchive(
+        session_id=session_id,
+        format_version=FORMAT_VERSION,
+        message_count=len(rows),
+        raw_bytes=raw_bytes,
+        data=data
+    ))
+    await db.execute(delete(_messages).where(_messages.c.session_id == session_id))
+    await db.execute(
+        update(_sessions)
+        .where(_sessions.c.id == session_id)
+        # Keep updated_at: archival is not activity
+        .values(archived_at=datetime.now(timezone.utc), updated_at=_sessions.c.updated_at)
+    )
+    await db.commit()
+
+    _invalidate(session_id)
+    logger.info(
+        f"Archived session {session_id}: {len(rows)} messages, {raw_bytes} -> {len(data)} bytes"
+    )
+    return True
+
+
+async def rehydrate_session(db: AsyncSession, session: ChatSession) -> None:
+    """
+    Restore an archived session's messages and commit (no-op if another
+    request already did).
+
+    Args:
+        db: Database session
+        session: Session with archived_at set
+    """
+    archived_at = (await db.execute(
+        select(_sessions.c.archived_at)
+        .where(_sessions.c.id == session.id)
+        .with_for_update()
+    )).scalar_one_or_none()
+
+    if archived_at is not None:
+        archive = (await db.execute(
+            select(SessionArchive)
+            .where(SessionArchive.session_id == session.id)
+            .with_for_update()
+        )).scalar_one()
+        messages = decode_messages(session.id, archive.data)
+        if messages:
+            await db.execute(insert(_messages), messages)
+        await db.delete(archive)
+        await db.execute(
+            update(_sessions)
+            .where(_sessions.c.id == session.id)
+            .values(archived_at=None, updated_at=_sessions.c.updated_at)
+        )
+        await db.commit()
+        logger.info(f"Rehydrated session {session.id}: {len(messages)} messages")
+    else:
+        # Release the lock; commit (unlike rollback) keeps loaded objects usable
+        await db.commit()
+
+    set_committed_value(session, "archived_at", None)
+    _invalidate(session.id)
+
+
+def _invalidate(session_id: int) -> None:
+    cache = get_conversation_cache()
+    if cache is not None:
+        cache.invalidate(session_id)
+
+
+class SessionArchiver:
+    """Periodically archives idle sessions in batches"""
+
+    def __init__(
+        self,
+        idle_days: float,
+        interval_seconds: float,
+        batch_size: int,
+        session_factory=AsyncSessionLocal
+    ):
+        self.idle_days = idle_days
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.session_factory = session_factory
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.archived = 0
+        self.last_run_at: Optional[datetime] = None
+
+    async def run_once(self) -> int:
+        """
+        Archive up to batch_size idle sessions.
+
+        Returns:
+            Number of sessions archived
+        """
+        idle_before = datetime.now(timezone.utc) - timedelta(days=self.idle_days)
+        async with self.session_factory() as db:
+            candidates = (await db.execute(
+                select(_sessions.c.id)
+                .where(
+                    _sessions.c.archived_at.is_(None),
+                    _sessions.c.updated_at < idle_before,
+                    exists().where(_messages.c.session_id == _sessions.c.id)
+                )
+                .order_by(_sessions.c.updated_at)
+                .limit(self.batch_size)
+            )).scalars().all()
+            await db.rollback()
+
+            archived = 0
+            for session_id in candidates:
+                try:
+                    archived += await archive_session(db, session_id, idle_before)
+                except Exception as e:
+                    await db.rollback()
+                    logger.error(f"Failed to archive session {session_id}: {e}")
+
+        self.runs += 1
+        self.archived += archived
+        self.last_run_at = datetime.now(timezone.utc)
+        return archived
+
+    def start(self) -> None:
+        """Start archiving in the background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                # Drain the backlog a batch at a time, then wait
+                while await self.run_once() >= self.batch_size:
+                    pass
+            except Exception as e:
+                logger.error(f"Session archival failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def shutdown(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "idle_days": self.idle_days,
+            "runs": self.runs,
+            "archived": self.archived,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+        }
+
+
+# Singleton instance
+_archiver = None
+
+
+def get_session_archiver() -> Optional[SessionArchiver]:
+    """Get the session archiver, or None if archival is disabled"""
+    global _archiver
+    if not settings.archive_enabled:
+        return None
+    if _archiver is None:
+        _archiver = SessionArchiver(
+            idle_days=settings.archive_idle_days,
+            interval_seconds=settings.archive_interval_seconds,
+            batch_size=settings.archive_batch_size
+        )
+    return _archiver
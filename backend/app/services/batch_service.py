@@ -0,0 +1,675 @@
+"""
+Batch generation jobs
+
+Runs JSONL files of prompts through the same pipeline as chat messages.
+Inputs and results are JSONL files under settings.batch_storage_dir; the
+results file doubles as the checkpoint, so a job resumes after a crash
+by skipping the items it already has results for.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, func, and_, or_
+from fastapi import UploadFile
+import asyncio
+import json
+import os
+import uuid
+import logging
+
+from app.config import settings
+from app.database.session import AsyncSessionLocal
+from app.models.batch_job import BatchJob, BatchJobStatus
+from app.models.user import User
+from app.services.admission import (
+    AdmissionQueueFullError,
+    AdmissionTimeoutError,
+    get_admission_controller
+)
+from app.services.langchain_service import get_langchain_service
+from app.services.llm_pool import is_rate_limit_error
+
+logger = logging.getLogger(__name__)
+
+INPUT_FILE = "input.jsonl"
+RESULTS_FILE = "results.jsonl"
+UPLOAD_CHUNK_BYTES = 64 * 1024
+INPUT_READ_BYTES = 64 * 1024
+MAX_CONTENT_LENGTH = 10000
+
+ACTIVE_STATUSES = (BatchJobStatus.PENDING, BatchJobStatus.RUNNING)
+
+
+class BatchInputError(ValueError):
+    """An uploaded batch file is malformed"""
+
+    def __init__(self, message: str, line: Optional[int] = None):
+        super().__init__(f"Line {line}: {message}" if line is not None else message)
+        self.line = line
+
+
+def job_dir(job_id: int) -> Path:
+    return Path(settings.batch_storage_dir) / str(job_id)
+
+
+def parse_item(line: str, line_number: int) -> Dict[str, Any]:
+    """
+    Validate one input line.
+
+    Each line is a JSON object with a required "message" and optional
+    "custom_id", "history" (list of {"role", "content"}) and "summary".
+
+    Raises:
+        BatchInputError: If the line is not a valid item
+    """
+    try:
+        item = json.loads(line)
+    except ValueError:
+        raise BatchInputError("invalid JSON", line_number)
+    if not isinstance(item, dict):
+        raise BatchInputError("expected a JSON object", line_number)
+
+    message = item.get("message")
+    if not isinstance(message, str) or not message.strip():
+        raise BatchInputError('"message" must be a non-empty string', line_number)
+    if len(message) > MAX_CONTENT_LENGTH:
+        raise BatchInputError('"message" exceeds 10,000 characters', line_number)
+
+    history = item.get("history", [])
+    if not isinstance(history, list) or not all(
+        isinstance(msg, dict)
+        and msg.get("role") in ("user", "assistant")
+        and isinstance(msg.get("content"), str)
+        for msg in history
+    ):
+        raise BatchInputError('"history" must be a list of {"role", "content"} objects', line_number)
+
+    if not isinstance(item.get("summary", ""), str):
+        raise BatchInputError('"summary" must be a string', line_number)
+    return item
+
+
+async def _save_upload(upload: UploadFile, path: Path) -> int:
+    """
+    Validate an upload line by line while copying it to `path`.
+
+    Parsing and file writes run in a worker thread, chunk by chunk.
+    """
+    total = 0
+    size = 0
+    buffer = b""
+
+    def write_lines(lines: List[bytes], out) -> None:
+        nonlocal total
+        for raw in lines:
+            line = raw.decode("utf-8", errors="strict").strip()
+            if not line:
+                continue
+            parse_item(line, total + 1)
+            total += 1
+            if total > settings.batch_max_items:
+                raise BatchInputError(f"more than {settings.batch_max_items} items")
+            out.write(line + "\n")
+
+    out = await asyncio.to_thread(open, path, "w", encoding="utf-8")
+    try:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > settings.batch_max_upload_bytes:
+                raise BatchInputError(f"file exceeds {settings.batch_max_upload_bytes} bytes")
+            lines = (buffer + chunk).split(b"\n")
+            buffer = lines.pop()
+            try:
+                await asyncio.to_thread(write_lines, lines, out)
+            except UnicodeDecodeError:
+                raise BatchInputError("file is not valid UTF-8", total + 1)
+        try:
+            await asyncio.to_thread(write_lines, [buffer], out)
+        except UnicodeDecodeError:
+            raise BatchInputError("file is not valid UTF-8", total + 1)
+    finally:
+        await asyncio.to_thread(out.close)
+
+    if total == 0:
+        raise BatchInputError("file contains no items")
+    return total
+
+
+async def create_batch_job(
+    db: AsyncSession,
+    user: User,
+    upload: UploadFile,
+    use_cache: bool = True
+) -> BatchJob:
+    """
+    Store an uploaded JSONL file and create a pending job for it.
+
+    The upload is staged outside any job directory; the job's directory is
+    created and the file moved in only once the job row is committed.
+
+    Args:
+        db: Database session
+        user: Owner of the job
+        upload: JSONL file, one item per line
+        use_cache: Whether the response cache may be used
+
+    Returns:
+        Created BatchJob
+
+    Raises:
+        BatchInputError: If the file is malformed or too large
+    """
+    storage = Path(settings.batch_storage_dir)
+    await asyncio.to_thread(storage.mkdir, parents=True, exist_ok=True)
+    upload_path = storage / f"upload-{uuid.uuid4().hex}.jsonl"
+
+    try:
+        total = await _save_upload(upload, upload_path)
+
+        job = BatchJob(
+            user_id=user.id,
+            status=BatchJobStatus.PENDING,
+            use_cache=use_cache,
+            total_items=total
+        )
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+    except BaseException:
+        upload_path.unlink(missing_ok=True)
+        raise
+
+    try:
+        await asyncio.to_thread(_move_input, upload_path, job.id)
+    except Exception:
+        upload_path.unlink(missing_ok=True)
+        await db.delete(job)
+        await db.commit()
+        raise
+
+    logger.info(f"Created batch job {job.id} with {total} items for user {user.id}")
+    return job
+
+
+def _move_input(upload_path: Path, job_id: int) -> None:
+    job_dir(job_id).mkdir(parents=True, exist_ok=True)
+    os.replace(upload_path, job_dir(job_id) / INPUT_FILE)
+
+
+async def get_user_jobs(
+    db: AsyncSession,
+    user: User,
+    limit: int = 20,
+    offset: int = 0
+) -> Tuple[List[BatchJob], int]:
+    """Get a user's batch jobs, newest first, with the total count"""
+    count_result = await db.execute(
+        select(func.count()).select_from(BatchJob).where(BatchJob.user_id == user.id)
+    )
+    total = count_result.scalar()
+
+    result = await db.execute(
+        select(BatchJob)
+        .where(BatchJob.user_id == user.id)
+        .order_by(BatchJob.created_at.desc(), BatchJob.id.desc())
+        .limit(limit)
+        .offset(offset)
+    )
+    return list(result.scalars().all()), total
+
+
+async def get_job(db: AsyncSession, job_id: int, user: User) -> Optional[BatchJob]:
+    """Get a batch job if it belongs to the user"""
+    result = await db.execute(
+        select(BatchJob).where(BatchJob.id == job_id, BatchJob.user_id == user.id)
+    )
+    return result.scalar_one_or_none()
+
+
+def iter_results(job_id: int) -> Iterator[bytes]:
+    """
+    Yield result lines of a job as they are on disk (complete lines only).
+
+    Synchronous so StreamingResponse runs it in a worker thread; the file
+    is never loaded into memory as a whole.
+    """
+    path = job_dir(job_id) / RESULTS_FILE
+    if not path.exists():
+        return
+    with open(path, "rb") as results:
+        for line in results:
+            if line.endswith(b"\n"):
+                yield line
+
+
+def _load_checkpoint(path: Path) -> Tuple[Set[int], int, int]:
+    """
+    Read the indexes already present in a results file.
+
+    A partially written last line (from a crash mid-write) is truncated.
+
+    Returns:
+        (done indexes, completed count, failed count)
+    """
+    done: Set[int] = set()
+    completed = failed = 0
+    if not path.exists():
+        return done, completed, failed
+
+    valid_bytes = 0
+    with open(path, "rb") as results:
+        for line in results:
+            try:
+                result = json.loads(line)
+                index = result["index"]
+            except (ValueError, KeyError, TypeError):
+                break
+            if not line.endswith(b"\n"):
+                break
+            valid_bytes += len(line)
+            if index in done:
+                continue
+            done.add(index)
+            if result.get("status") == "ok":
+                completed += 1
+            else:
+                failed += 1
+
+    if valid_bytes < path.stat().st_size:
+        logger.warning(f"Truncating partial checkpoint tail in {path}")
+        with open(path, "r+b") as results:
+            results.truncate(valid_bytes)
+    return done, completed, failed
+
+
+class _FileThread:
+    """Runs a job's file operations, in order, on one dedicated thread"""
+
+    def __init__(self, name: str):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+
+    def run(self, fn: Callable[..., Any], *args, **kwargs) -> Awaitable[Any]:
+        return asyncio.get_running_loop().run_in_executor(self._executor, partial(fn, *args, **kwargs))
+
+    def close(self) -> None:
+        """Stop the thread once the operations already queued have run"""
+        self._executor.shutdown(wait=False)
+
+
+def _append_line(file, line: str) -> None:
+    # Whole lines only, flushed immediately: the file is the checkpoint
+    file.write(line)
+    file.flush()
+
+
+def _sync(file) -> None:
+    file.flush()
+    os.fsync(file.fileno())
+
+
+class BatchRunner:
+    """
+    Runs batch jobs in the background of this worker process.
+
+    Each job gets a bounded pool of `concurrency` tasks. Every item goes
+    through the admission controller (as the job owner, so batch work is
+    fair-queued against interactive traffic) and the LLM pool (RPM/TPM
+    limits); rate limited items are retried with exponential backoff.
+
+    Jobs are claimed in the database with a heartbeat. A job whose
+    heartbeat went stale (its worker died) can be claimed and resumed by
+    any worker.
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        max_retries: int,
+        queue_timeout: float,
+        heartbeat_seconds: float,
+        stale_seconds: float
+    ):
+        self.concurrency = max(concurrency, 1)
+        self.max_retries = max_retries
+        self.queue_timeout = queue_timeout
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stale_seconds = stale_seconds
+        self.worker_id = uuid.uuid4().hex
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def start(self, job_id: int) -> None:
+        """Start processing a job in the background (no-op if already running here)"""
+        if job_id in self._tasks:
+            return
+        task = asyncio.create_task(self._run(job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def cancel(self, db: AsyncSession, job: BatchJob) -> bool:
+        """
+        Cancel a pending or running job. Workers on other processes notice
+        on their next heartbeat.
+
+        Returns:
+            True if the job was active and is now cancelled
+        """
+        result = await db.execute(
+            update(BatchJob)
+            .where(BatchJob.id == job.id, BatchJob.status.in_(ACTIVE_STATUSES))
+            .values(status=BatchJobStatus.CANCELLED, finished_at=func.now())
+        )
+        await db.commit()
+
+        task = self._tasks.get(job.id)
+        if task is not None:
+            task.cancel()
+
+        await db.refresh(job)
+        return result.rowcount > 0
+
+    async def resume_jobs(self) -> None:
+        """Start pending jobs and jobs whose worker stopped heartbeating"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(BatchJob.id)
+                .where(self._claimable())
+                .order_by(BatchJob.id)
+            )
+            job_ids = list(result.scalars().all())
+
+        for job_id in job_ids:
+            self.start(job_id)
+        if job_ids:
+            logger.info(f"Resuming {len(job_ids)} batch jobs")
+
+    def start_sweeper(self) -> None:
+        """Periodically resume jobs abandoned by dead workers"""
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep())
+
+    async def _sweep(self) -> None:
+        while True:
+            try:
+                await self.resume_jobs()
+            except Exception as e:
+                logger.error(f"Failed to resume batch jobs: {e}")
+            await asyncio.sleep(self.stale_seconds)
+
+    async def shutdown(self) -> None:
+        """Stop local jobs; they are resumed once their heartbeat goes stale"""
+        tasks = list(self._tasks.values())
+        if self._sweeper is not None:
+            tasks.append(self._sweeper)
+            self._sweeper = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"worker_id": self.worker_id, "running_jobs": sorted(self._tasks)}
+
+    def _claimable(self):
+        stale = datetime.now(timezone.utc) - timedelta(seconds=self.stale_seconds)
+        return or_(
+            BatchJob.status == BatchJobStatus.PENDING,
+            and_(
+                BatchJob.status == BatchJobStatus.RUNNING,
+                or_(BatchJob.heartbeat_at.is_(None), BatchJob.heartbeat_at < stale)
+            )
+        )
+
+    async def _claim(self, job_id: int) -> Optional[BatchJob]:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(BatchJob)
+                .where(BatchJob.id == job_id, self._claimable())
+                .values(
+                    status=BatchJobStatus.RUNNING,
+                    claimed_by=self.worker_id,
+                    heartbeat_at=func.now()
+                )
+            )
+            await db.commit()
+            if result.rowcount == 0:
+                return None
+            return await db.get(BatchJob, job_id)
+
+    async def _checkpoint(self, job_id: int, completed: int, failed: int) -> bool:
+        """
+        Record progress and renew the claim.
+
+        Returns:
+            False if the job was cancelled or claimed by another worker
+        """
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(BatchJob)
+                .where(
+                    BatchJob.id == job_id,
+                    BatchJob.claimed_by == self.worker_id,
+                    BatchJob.status == BatchJobStatus.RUNNING
+                )
+                .values(completed_items=completed, failed_items=failed, heartbeat_at=func.now())
+            )
+            await db.commit()
+            return result.rowcount > 0
+
+    async def _release(self, job_id: int) -> bool:
+        """
+        Hand a just-created job back to pending: the worker that created
+        it moves its input file in right after committing it.
+
+        Returns:
+            False if the job is too old for that (its input is missing)
+        """
+        recent = datetime.now(timezone.utc) - timedelta(seconds=self.stale_seconds)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(BatchJob)
+                .where(
+                    BatchJob.id == job_id,
+                    BatchJob.claimed_by == self.worker_id,
+                    BatchJob.status == BatchJobStatus.RUNNING,
+                    BatchJob.created_at > recent
+                )
+                .values(status=BatchJobStatus.PENDING, claimed_by=None, heartbeat_at=None)
+            )
+            await db.commit()
+            return result.rowcount > 0
+
+    async def _finish(
+        self,
+        job_id: int,
+        status: BatchJobStatus,
+        completed: int,
+        failed: int,
+        error: Optional[str] = None
+    ) -> None:
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(BatchJob)
+                .where(
+                    BatchJob.id == job_id,
+                    BatchJob.claimed_by == self.worker_id,
+                    BatchJob.status == BatchJobStatus.RUNNING
+                )
+                .values(
+                    status=status,
+                    completed_items=completed,
+                    failed_items=failed,
+                    error=error,
+                    heartbeat_at=func.now(),
+                    finished_at=func.now()
+                )
+            )
+            await db.commit()
+
+    async def _run(self, job_id: int) -> None:
+        try:
+            job = await self._claim(job_id)
+        except Exception as e:
+            logger.error(f"Failed to claim batch job {job_id}: {e}", exc_info=True)
+            return
+        if job is None:
+            return
+
+        files = _FileThread(f"batch-job-{job_id}")
+        try:
+            await self._run_claimed(job, files)
+        finally:
+            files.close()
+
+    async def _run_claimed(self, job: BatchJob, files: _FileThread) -> None:
+        job_id = job.id
+        input_path = job_dir(job_id) / INPUT_FILE
+        results_path = job_dir(job_id) / RESULTS_FILE
+        if not await files.run(input_path.exists) and await self._release(job_id):
+            logger.info(f"Batch job {job_id} input not in place yet; released")
+            return
+        done, completed, failed = await files.run(_load_checkpoint, results_path)
+        if done:
+            logger.info(f"Resuming batch job {job_id} at {len(done)}/{job.total_items} items")
+
+        try:
+            inputs = await files.run(open, input_path, "r", encoding="utf-8")
+            try:
+                results = await files.run(open, results_path, "a", encoding="utf-8")
+                try:
+                    counts = await self._process(job, files, inputs, results, done, completed, failed)
+                finally:
+                    # Queued behind any write still running on the file thread
+                    files.run(results.close)
+            finally:
+                files.run(inputs.close)
+        except asyncio.CancelledError:
+            logger.info(f"Batch job {job_id} stopped on worker {self.worker_id}")
+            raise
+        except Exception as e:
+            logger.error(f"Batch job {job_id} failed: {e}", exc_info=True)
+            await self._finish(job_id, BatchJobStatus.FAILED, completed, failed, error=str(e))
+            return
+
+        if counts is not None:
+            await self._finish(job_id, BatchJobStatus.COMPLETED, *counts)
+            logger.info(f"Batch job {job_id} completed: {counts[0]} ok, {counts[1]} failed")
+
+    async def _process(
+        self,
+        job: BatchJob,
+        files: _FileThread,
+        inputs,
+        results,
+        done: Set[int],
+        completed: int,
+        failed: int
+    ) -> Optional[Tuple[int, int]]:
+        """
+        Feed items to the worker pool and append results as they finish.
+
+        Reads, writes and fsyncs run on the job's file thread.
+
+        Returns:
+            (completed, failed) counts, or None if the job was cancelled or
+            taken over while running
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        counts = {"ok": completed, "error": failed}
+
+        async def produce() -> None:
+            index = 0
+            while True:
+                lines = await files.run(inputs.readlines, INPUT_READ_BYTES)
+                if not lines:
+                    break
+                for line in lines:
+                    if index not in done:
+                        await queue.put((index, json.loads(line)))
+                    index += 1
+            for _ in range(self.concurrency):
+                await queue.put(None)
+
+        async def work() -> None:
+            while True:
+                entry = await queue.get()
+                if entry is None:
+                    return
+                index, item = entry
+                result = await self._generate(job, index, item)
+                await files.run(_append_line, results, json.dumps(result, ensure_ascii=False) + "\n")
+                counts[result["status"]] += 1
+
+        async def heartbeat() -> None:
+            while True:
+                await asyncio.sleep(self.heartbeat_seconds)
+                await files.run(_sync, results)
+                if not await self._checkpoint(job.id, counts["ok"], counts["error"]):
+                    return
+
+        pipeline = asyncio.gather(produce(), *(work() for _ in range(self.concurrency)))
+        monitor = asyncio.create_task(heartbeat())
+        try:
+            await asyncio.wait({pipeline, monitor}, return_when=asyncio.FIRST_COMPLETED)
+            if not pipeline.done():
+                logger.info(f"Batch job {job.id} was cancelled or claimed elsewhere; stopping")
+                return None
+            pipeline.result()
+        finally:
+            for task in (pipeline, monitor):
+                task.cancel()
+            await asyncio.gather(pipeline, monitor, return_exceptions=True)
+            await files.run(_sync, results)
+
+        return counts["ok"], counts["error"]
+
+    async def _generate(self, job: BatchJob, index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate the response for one item, retrying rate limits with backoff"""
+        result = {"index": index, "custom_id": item.get("custom_id")}
+        langchain_service = get_langchain_service()
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with get_admission_controller().slot(job.user_id, timeout=self.queue_timeout):
+                    response = await langchain_service.generate_response(
+                        item["message"],
+                        item.get("history") or [],
+                        use_cache=job.use_cache,
+                        summary=item.get("summary")
+                    )
+                return {**result, "status": "ok", "response": response}
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                retryable = (
+                    isinstance(e, (AdmissionTimeoutError, AdmissionQueueFullError))
+                    or is_rate_limit_error(e)
+                )
+                if not retryable or attempt == self.max_retries:
+                    logger.warning(f"Batch job {job.id} item {index} failed: {e}")
+                    return {**result, "status": "error", "error": str(e)}
+                await asyncio.sleep(min(2 ** attempt, 60))
+
+
+# Singleton instance
+_batch_runner = None
+
+
+def get_batch_runner() -> BatchRunner:
+    """Get or create singleton batch runner instance"""
+    global _batch_runner
+    if _batch_runner is None:
+        _batch_runner = BatchRunner(
+            concurrency=settings.batch_max_concurrency,
+            max_retries=settings.batch_max_retries,
+            queue_timeout=settings.batch_queue_timeout_seconds,
+            heartbeat_seconds=settings.batch_heartbeat_seconds,
+            stale_seconds=settings.batch_stale_seconds
+        )
+    return _batch_runner
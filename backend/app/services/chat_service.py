@@ -2,16 +2,25 @@
 Chat service for managing chat sessions and messages
 """
 
-from typing import List, Optional
+from typing import AsyncIterator, Dict, List, Optional, Set
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc
-from sqlalchemy.orm import selectinload
-from datetime import datetime
+from sqlalchemy import Row, Select, select, update, delete, func, desc, tuple_
+from datetime import datetime, timedelta
 
+from app.config import settings
+from app.database.routing import replica_read, replica_reads
+from app.database.session import AsyncSessionLocal, note_write
 from app.models.chat_session import ChatSession
-from app.models.message import Message
+from app.models.message import Message, MessageRole, MessageStatus, content_values, message_content
 from app.models.user import User
 from app.schemas.chat import ChatSessionCreate, ChatSessionUpdate, MessageCreate
+from app.services.archive_service import rehydrate_session
+from app.services.context_builder import CHARS_PER_TOKEN, MESSAGE_TOKEN_OVERHEAD, count_tokens
+from app.services.conversation_cache import ConversationContext, get_conversation_cache
+from app.services.write_behind import WriteBehindClosedError, get_write_behind
+import asyncio
+import base64
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -39,6 +48,7 @@ async def create_chat_session(
             title=session_data.title
         )
         db.add(new_session)
+        await _adjust_session_count(db, user.id, 1)
         await db.commit()
         await db.refresh(new_session)
         
@@ -51,49 +61,93 @@ async def create_chat_session(
         raise
 
 
+@replica_read
 async def get_user_sessions(
     db: AsyncSession,
     user: User,
     limit: int = 20,
+    cursor: Optional[str] = None,
     offset: int = 0
-) -> tuple[List[ChatSession], int]:
+) -> tuple[List[ChatSession], int, Optional[str]]:
     """
-    Get all chat sessions for a user with pagination.
+    Get a page of a user's chat sessions, most recently updated first.
+    
+    Pages are read by keyset on (updated_at, id) using the
+    ix_chat_sessions_user_updated index, so every page costs the same.
+    The total comes from users.session_count rather than count(*).
     
     Args:
         db: Database session
         user: Current authenticated user
         limit: Maximum number of sessions to return
-        offset: Number of sessions to skip
+        cursor: next_cursor of the previous page (None for the first page)
+        offset: Sessions to skip when no cursor is given (deprecated;
+            cost grows with the offset)
     
     Returns:
-        Tuple of (list of ChatSessions, total count)
+        Tuple of (list of ChatSessions, total count, next page cursor or
+        None on the last page)
+    
+    Raises:
+        InvalidCursorError: If the cursor cannot be decoded
     """
-    try:
-        # Get total count
-        count_query = select(func.count(ChatSession.id)).where(
-            ChatSession.user_id == user.id
+    query = (
+        select(ChatSession)
+        .where(ChatSession.user_id == user.id)
+        .order_by(desc(ChatSession.updated_at), desc(ChatSession.id))
+        .limit(limit + 1)
+    )
+    if cursor is not None:
+        updated_at, session_id = decode_cursor(cursor)
+        query = query.where(
+            tuple_(ChatSession.updated_at, ChatSession.id) < tuple_(updated_at, session_id)
         )
-        total_result = await db.execute(count_query)
-        total = total_result.scalar_one()
-        
-        # Get sessions
-        query = (
-            select(ChatSession)
-            .where(ChatSession.user_id == user.id)
-            .order_by(desc(ChatSession.updated_at))
-            .limit(limit)
-            .offset(offset)
-        )
-        result = await db.execute(query)
-        sessions = result.scalars().all()
-        
-        logger.info(f"Retrieved {len(sessions)} sessions for user {user.id}")
-        return list(sessions), total
+    elif offset:
+        query = query.offset(offset)
     
+    try:
+        result = await db.execute(query)
+        sessions = list(result.scalars().all())
     except Exception as e:
         logger.error(f"Failed to get user sessions: {e}")
         raise
+    
+    next_cursor = None
+    if len(sessions) > limit:
+        sessions = sessions[:limit]
+        next_cursor = encode_cursor(sessions[-1].updated_at, sessions[-1].id)
+    
+    logger.info(f"Retrieved {len(sessions)} sessions for user {user.id}")
+    return sessions, user.session_count, next_cursor
+
+
+class InvalidCursorError(ValueError):
+    """A pagination cursor that was not issued by this API"""
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """Opaque keyset cursor for a row ordered by (timestamp, id)"""
+    raw = json.dumps([timestamp.isoformat(), row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Inverse of encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        updated_at, session_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(updated_at), int(session_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError("Invalid pagination cursor") from e
+
+
+async def _adjust_session_count(db: AsyncSession, user_id: int, delta: int) -> None:
+    """Change a user's session_count in the current transaction"""
+    await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(session_count=User.session_count + delta)
+    )
 
 
 async def get_session_by_id(
@@ -102,7 +156,7 @@ async def get_session_by_id(
     user: User
 ) -> Optional[ChatSession]:
     """
-    Get a chat session by ID if user owns it.
+    Get a chat session by ID if user owns it, rehydrating it if archived.
     
     Args:
         db: Database session
@@ -120,6 +174,9 @@ async def get_session_by_id(
         result = await db.execute(query)
         session = result.scalar_one_or_none()
         
+        if session is not None and session.archived_at is not None:
+            await rehydrate_session(db, session)
+        
         return session
     
     except Exception as e:
@@ -133,7 +190,12 @@ async def get_session_with_messages(
     user: User
 ) -> Optional[ChatSession]:
     """
-    Get a chat session with all its messages.
+    Get a chat session with all its messages, rehydrating it if archived.
+    
+    The session row (and any rehydration) comes from the primary, since a
+    replica may still show the session archived; only the messages may be
+    read from a replica. A rehydrating user's reads then stay on the
+    primary for the read-your-writes window.
     
     Args:
         db: Database session
@@ -143,17 +205,13 @@ async def get_session_with_messages(
     Returns:
         ChatSession with messages if found and owned by user
     """
+    await wait_for_writes(session_id)
+    session = await get_session_by_id(db, session_id, user)
+    if session is None:
+        return None
     try:
-        query = (
-            select(ChatSession)
-            .options(selectinload(ChatSession.messages))
-            .where(
-                ChatSession.id == session_id,
-                ChatSession.user_id == user.id
-            )
-        )
-        result = await db.execute(query)
-        session = result.scalar_one_or_none()
+        with replica_reads(db):
+            await db.refresh(session, attribute_names=["messages"])
         
         return session
     
@@ -184,6 +242,7 @@ async def update_chat_session(
         
         await db.commit()
         await db.refresh(session)
+        _invalidate_conversation_cache(session.id)
         
         logger.info(f"Updated chat session {session.id}")
         return session
@@ -208,7 +267,9 @@ async def delete_chat_session(
     try:
         session_id = session.id
         await db.delete(session)
+        await _adjust_session_count(db, session.user_id, -1)
         await db.commit()
+        _invalidate_conversation_cache(session_id)
         
         logger.info(f"Deleted chat session {session_id}")
     
@@ -222,7 +283,8 @@ async def create_message(
     db: AsyncSession,
     session_id: int,
     role: str,
-    content: str
+    content: str,
+    status: str = MessageStatus.COMPLETE.value
 ) -> Message:
     """
     Create a new message in a chat session.
@@ -232,6 +294,9 @@ async def create_message(
         session_id: ID of the chat session
         role: Message role ("user" or "assistant")
         content: Message content
+        status: "complete", "truncated" for a cancelled generation, or
+            "streaming" for a response that is still being generated
+            (not added to the conversation cache until finished)
     
     Returns:
         Created Message
@@ -240,11 +305,16 @@ async def create_message(
         new_message = Message(
             session_id=session_id,
             role=role,
-            content=content
+            content=content,
+            token_count=count_tokens(content),
+            status=status
         )
         db.add(new_message)
         await db.flush()  # Flush to get ID but don't commit yet
         
+        if status != MessageStatus.STREAMING.value:
+            cache_message(new_message)
+        
         return new_message
     
     except Exception as e:
@@ -252,6 +322,281 @@ async def create_message(
         raise
 
 
+async def append_message_content(
+    db: AsyncSession,
+    message_id: int,
+    content: str
+) -> None:
+    """
+    Append text to a message by ID, e.g. to checkpoint a streaming response.
+    
+    Only the new text is sent to the database. Does not commit.
+    
+    Args:
+        db: Database session
+        message_id: ID of the message
+        content: Text to append
+    """
+    await db.execute(
+        update(Message)
+        .where(Message.id == message_id)
+        # Streaming responses are stored uncompressed until finished
+        .values(content_plain=Message.content_plain + content)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def finish_message(
+    db: AsyncSession,
+    message: Message,
+    content: str,
+    status: str = MessageStatus.COMPLETE.value
+) -> Message:
+    """
+    Store the final content and status of a streaming message.
+    
+    Does not commit.
+    
+    Args:
+        db: Database session
+        message: Message created with status "streaming"
+        content: Full response text
+        status: "complete" or "truncated"
+    
+    Returns:
+        The updated Message
+    """
+    message.content = content
+    message.token_count = count_tokens(content)
+    message.status = status
+    await db.flush()
+    
+    cache_message(message)
+    return message
+
+
+async def recover_streaming_messages(
+    db: AsyncSession,
+    older_than_seconds: float
+) -> int:
+    """
+    Mark responses left "streaming" by a dead worker as truncated.
+    
+    Their content is the last checkpoint written before the worker died.
+    
+    Args:
+        db: Database session
+        older_than_seconds: Only touch messages created this long ago, so
+            generations still running on other workers are left alone
+    
+    Returns:
+        Number of messages recovered
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=older_than_seconds)
+    result = await db.execute(
+        update(Message)
+        .where(
+            Message.status == MessageStatus.STREAMING.value,
+            Message.created_at < cutoff
+        )
+        .values(status=MessageStatus.TRUNCATED.value)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    
+    if result.rowcount:
+        logger.warning(f"Recovered {result.rowcount} interrupted streaming messages")
+    return result.rowcount
+
+
+async def save_message(
+    db: AsyncSession,
+    session_id: int,
+    role: str,
+    content: str,
+    status: str = MessageStatus.COMPLETE.value
+) -> Message:
+    """
+    Create a message and commit it.
+    
+    With write-behind enabled the insert is batched with other sessions'
+    writes instead of going through `db`, and the returned Message is
+    detached.
+    
+    Args:
+        db: Database session
+        session_id: ID of the chat session
+        role: Message role ("user" or "assistant")
+        content: Message content
+        status: As for create_message
+    
+    Returns:
+        Created Message (ID and created_at set)
+    """
+    queue = get_write_behind()
+    if queue is None:
+        message = await create_message(db, session_id, role, content, status)
+        await db.commit()
+        return message
+    
+    message = await queue.insert_message(
+        session_id, role, content, count_tokens(content), status
+    )
+    note_write(db)
+    if status != MessageStatus.STREAMING.value:
+        cache_message(message)
+    return message
+
+
+async def save_message_content(
+    db: AsyncSession,
+    message: Message,
+    content: str
+) -> None:
+    """
+    Append text to a message and commit it (a streaming checkpoint).
+    
+    Args:
+        db: Database session
+        message: Message to append to
+        content: Text to append
+    """
+    queue = get_write_behind()
+    if queue is None:
+        await append_message_content(db, message.id, content)
+        await db.commit()
+        return
+    
+    await (await queue.append_content(message.session_id, message.id, content))
+    note_write(db)
+
+
+async def save_finished_message(
+    db: AsyncSession,
+    message: Message,
+    content: str,
+    status: str = MessageStatus.COMPLETE.value
+) -> Message:
+    """
+    Store a streaming message's final content and status, bump the
+    session's updated_at, and commit.
+    
+    With write-behind enabled this returns once the writes are queued;
+    reads of the session wait for them. If the queue has closed, or the
+    queued write fails, the final content is written directly instead.
+    
+    Args:
+        db: Database session
+        message: Message created with status "streaming"
+        content: Full response text
+        status: "complete" or "truncated"
+    
+    Returns:
+        The updated Message
+    """
+    queue = get_write_behind()
+    if queue is None:
+        await finish_message(db, message, content, status)
+        await touch_session(db, message.session_id)
+        await db.commit()
+        return message
+    
+    message.content = content
+    message.token_count = count_tokens(content)
+    message.status = status
+    try:
+        finished = await queue.finish_message(
+            message.session_id, message.id, content, message.token_count, status
+        )
+        await queue.touch_session(message.session_id)
+    except WriteBehindClosedError:
+        # Shutting down: write it ourselves rather than leave it "streaming"
+        await _write_finished_message(message.session_id, message.id, content, message.token_count, status)
+    else:
+        def fall_back(future: asyncio.Future) -> None:
+            if not future.cancelled() and future.exception() is not None:
+                _schedule_finish_fallback(
+                    message.session_id, message.id, content, message.token_count, status
+                )
+        finished.add_done_callback(fall_back)
+    note_write(db)
+    cache_message(message)
+    return message
+
+
+# Fallback writes of final messages whose write-behind batch failed
+_finish_fallbacks: Set[asyncio.Task] = set()
+
+
+def _schedule_finish_fallback(
+    session_id: int,
+    message_id: int,
+    content: str,
+    token_count: Optional[int],
+    status: str
+) -> None:
+    logger.warning(f"Write-behind finish of message {message_id} failed; writing it directly")
+    task = asyncio.create_task(
+        _write_finished_message(session_id, message_id, content, token_count, status)
+    )
+    _finish_fallbacks.add(task)
+    task.add_done_callback(_finish_fallbacks.discard)
+
+
+async def _write_finished_message(
+    session_id: int,
+    message_id: int,
+    content: str,
+    token_count: Optional[int],
+    status: str
+) -> None:
+    """Store a message's final content and status on a session of its own"""
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(Message.__table__)
+                .where(Message.__table__.c.id == message_id)
+                .values(**content_values(content), token_count=token_count, status=status)
+            )
+            await touch_session(db, session_id)
+            await db.commit()
+    except Exception as e:
+        # Left to recover_streaming_messages
+        logger.error(f"Failed to store final content of message {message_id}: {e}")
+
+
+async def delete_message(db: AsyncSession, message: Message) -> None:
+    """
+    Delete a message and commit.
+    
+    Args:
+        db: Database session
+        message: Message to delete
+    """
+    await wait_for_writes(message.session_id)
+    await db.execute(delete(Message).where(Message.id == message.id))
+    await db.commit()
+
+
+async def wait_for_writes(session_id: int) -> None:
+    """Wait for the session's queued write-behind writes (read-your-writes)"""
+    queue = get_write_behind()
+    if queue is not None:
+        await queue.wait_for(session_id)
+
+
+def cache_message(message: Message) -> None:
+    cache = get_conversation_cache()
+    if cache is not None:
+        cache.append(message.session_id, {
+            "id": message.id,
+            "role": MessageRole(message.role).value,
+            "content": message.content,
+            "token_count": message.token_count
+        })
+
+
+@replica_read
 async def get_session_messages(
     db: AsyncSession,
     session_id: int,
@@ -268,6 +613,7 @@ async def get_session_messages(
     Returns:
         List of Messages ordered by created_at
     """
+    await wait_for_writes(session_id)
     try:
         query = (
             select(Message)
@@ -302,6 +648,307 @@ async def get_session_messages(
         raise
 
 
+@replica_read
+async def get_message_page(
+    db: AsyncSession,
+    session_id: int,
+    limit: int = 50,
+    before: Optional[str] = None,
+    after: Optional[str] = None
+) -> tuple[List[Message], bool]:
+    """
+    Get one page of a session's messages by keyset on (created_at, id).
+    
+    Uses the ix_messages_session_created index; every page costs the same
+    however long the session is.
+    
+    Args:
+        db: Database session
+        session_id: ID of the chat session
+        limit: Maximum number of messages to return
+        before: Cursor; return the messages just older than it
+        after: Cursor; return the messages just newer than it
+            (with neither, the newest messages are returned)
+    
+    Returns:
+        Tuple of (messages ordered by created_at, whether more messages
+        exist beyond the page in the direction read)
+    
+    Raises:
+        InvalidCursorError: If a cursor cannot be decoded, or both are given
+    """
+    if before is not None and after is not None:
+        raise InvalidCursorError("Pass either before or after, not both")
+    
+    key = tuple_(Message.created_at, Message.id)
+    query = select(Message).where(Message.session_id == session_id).limit(limit + 1)
+    if after is not None:
+        query = query.where(key > tuple_(*decode_cursor(after))).order_by(Message.created_at, Message.id)
+    else:
+        if before is not None:
+            query = query.where(key < tuple_(*decode_cursor(before)))
+        query = query.order_by(desc(Message.created_at), desc(Message.id))
+    
+    await wait_for_writes(session_id)
+    try:
+        result = await db.execute(query)
+        messages = list(result.scalars().all())
+    except Exception as e:
+        logger.error(f"Failed to get message page for session {session_id}: {e}")
+        raise
+    
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    if after is None:
+        messages.reverse()
+    return messages, has_more
+
+
+async def stream_session_messages(
+    db: AsyncSession,
+    session_id: int,
+    batch_size: int = 500
+) -> AsyncIterator[List[Row]]:
+    """
+    Yield all of a session's messages in batches from a server-side cursor.
+    
+    Rows are plain column tuples (no ORM objects), and only one batch is
+    held in memory at a time. May be served from a read replica.
+    
+    Args:
+        db: Database session, used for nothing else while iterating
+        session_id: ID of the chat session
+        batch_size: Rows fetched per round trip
+    
+    Yields:
+        Lists of rows (id, session_id, role, content, content_zstd,
+        token_count, status, created_at) ordered by created_at; content
+        is None for compressed rows (see message_content)
+    """
+    await wait_for_writes(session_id)
+    query = (
+        select(
+            Message.id,
+            Message.session_id,
+            Message.role,
+            Message.content_plain.label("content"),
+            Message.content_zstd,
+            Message.token_count,
+            Message.status,
+            Message.created_at
+        )
+        .where(Message.session_id == session_id)
+        .order_by(Message.created_at, Message.id)
+        .execution_options(yield_per=batch_size)
+    )
+    with replica_reads(db):
+        result = await db.stream(query)
+    async for partition in result.partitions():
+        yield partition
+
+
+def context_window_query(
+    session_id: int,
+    token_budget: int,
+    exclude_message_id: Optional[int] = None,
+    max_messages: Optional[int] = None,
+    after_message_id=None
+) -> Select:
+    """
+    Build the query for the most recent messages that fit a token budget.
+    
+    A running token total is computed newest-first in the database, so only
+    rows that can fit the budget are returned. Rows without a stored token
+    count are estimated from their length.
+    
+    Args:
+        session_id: ID of the chat session
+        token_budget: Maximum tokens the returned history may use
+        exclude_message_id: Message to leave out (e.g. the message being answered)
+        max_messages: Hard cap on rows considered (defaults to settings.context_max_messages)
+        after_message_id: Only return messages newer than this one (a value
+            or a SQL expression, e.g. the last message folded into the
+            session summary)
+    
+    Returns:
+        Select of (id, role, content, content_zstd, token_count,
+        created_at) ordered by created_at
+    """
+    recent = (
+        select(
+            Message.id,
+            Message.role,
+            Message.content_plain.label("content"),
+            Message.content_zstd,
+            Message.token_count,
+            Message.created_at
+        )
+        .where(
+            Message.session_id == session_id,
+            Message.status != MessageStatus.STREAMING.value
+        )
+        .order_by(desc(Message.created_at), desc(Message.id))
+        .limit(max_messages or settings.context_max_messages)
+    )
+    if exclude_message_id is not None:
+        recent = recent.where(Message.id != exclude_message_id)
+    if after_message_id is not None:
+        recent = recent.where(Message.id > after_message_id)
+    recent = recent.subquery()
+    
+    tokens = func.coalesce(
+        recent.c.token_count,
+        func.length(recent.c.content) / CHARS_PER_TOKEN + 1,
+        # Compressed chat text is roughly a quarter of its original size
+        func.length(recent.c.content_zstd) * 4 / CHARS_PER_TOKEN + 1
+    ) + MESSAGE_TOKEN_OVERHEAD
+    running = func.sum(tokens).over(
+        order_by=(desc(recent.c.created_at), desc(recent.c.id))
+    ).label("running_tokens")
+    
+    windowed = select(recent, running).subquery()
+    return (
+        select(
+            windowed.c.id,
+            windowed.c.role,
+            windowed.c.content,
+            windowed.c.content_zstd,
+            windowed.c.token_count,
+            windowed.c.created_at
+        )
+        .where(windowed.c.running_tokens <= token_budget)
+        .order_by(windowed.c.created_at, windowed.c.id)
+    )
+
+
+def newest_message_id(session_id):
+    """
+    ID of a session's newest finished message, as a scalar subquery (the
+    version conversation cache entries are checked against).
+    
+    Args:
+        session_id: ID of the chat session (a value or a SQL expression)
+    """
+    return (
+        select(Message.id)
+        .where(
+            Message.session_id == session_id,
+            Message.status != MessageStatus.STREAMING.value
+        )
+        .order_by(desc(Message.created_at), desc(Message.id))
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+def context_message(row) -> Dict:
+    """Message dict (id, role, content, token_count) as used in prompt history"""
+    return {
+        "id": row.id,
+        "role": MessageRole(row.role).value,
+        "content": message_content(row),
+        "token_count": row.token_count
+    }
+
+
+async def get_context_messages(
+    db: AsyncSession,
+    session_id: int,
+    token_budget: int,
+    exclude_message_id: Optional[int] = None,
+    max_messages: Optional[int] = None,
+    after_message_id: Optional[int] = None
+) -> List[Dict]:
+    """
+    Get the most recent messages that fit a token budget.
+    
+    Args:
+        db: Database session
+        session_id: ID of the chat session
+        token_budget: Maximum tokens the returned history may use
+        exclude_message_id: Message to leave out (e.g. the message being answered)
+        max_messages: Hard cap on rows considered (defaults to settings.context_max_messages)
+        after_message_id: Only return messages newer than this one
+            (e.g. the last message folded into the session summary)
+    
+    Returns:
+        List of message dicts (id, role, content, token_count) ordered by created_at
+    """
+    try:
+        result = await db.execute(context_window_query(
+            session_id, token_budget, exclude_message_id, max_messages, after_message_id
+        ))
+        return [context_message(row) for row in result]
+    
+    except Exception as e:
+        logger.error(f"Failed to get context messages: {e}")
+        raise
+
+
+async def get_conversation_context(
+    db: AsyncSession,
+    session_id: int,
+    exclude_message_id: Optional[int] = None
+) -> ConversationContext:
+    """
+    Get the rolling summary and recent history used to build a prompt.
+    
+    Served from the per-session conversation cache when the cached entry
+    is still current (checked with a one-row query); otherwise the session
+    is loaded from the database and cached.
+    
+    Args:
+        db: Database session
+        session_id: ID of the chat session
+        exclude_message_id: Message to leave out (e.g. the message being answered)
+    
+    Returns:
+        ConversationContext with history newer than the summary boundary
+    """
+    cache = get_conversation_cache()
+    cached = cache.get(session_id, exclude_message_id) if cache is not None else None
+    
+    await wait_for_writes(session_id)
+    try:
+        result = await db.execute(
+            select(
+                ChatSession.summary,
+                ChatSession.summary_message_id,
+                newest_message_id(ChatSession.id).label("last_message_id")
+            )
+            .where(ChatSession.id == session_id)
+        )
+        row = result.one()
+        if cached is not None and cache.is_current(
+            session_id, row.last_message_id, row.summary_message_id
+        ):
+            return cached
+        history = await get_context_messages(
+            db, session_id, settings.context_token_budget,
+            after_message_id=row.summary_message_id
+        )
+    except Exception as e:
+        logger.error(f"Failed to load conversation context for session {session_id}: {e}")
+        raise
+    
+    if cache is not None:
+        cache.populate(
+            session_id, history, row.summary, row.summary_message_id, row.last_message_id
+        )
+    
+    return ConversationContext(
+        history=[msg for msg in history if msg["id"] != exclude_message_id],
+        summary=row.summary,
+        summary_message_id=row.summary_message_id
+    )
+
+
+def _invalidate_conversation_cache(session_id: int) -> None:
+    cache = get_conversation_cache()
+    if cache is not None:
+        cache.invalidate(session_id)
+
+
 async def update_session_timestamp(
     db: AsyncSession,
     session: ChatSession
@@ -320,3 +967,23 @@ async def update_session_timestamp(
     except Exception as e:
         logger.error(f"Failed to update session timestamp: {e}")
         raise
+
+
+async def touch_session(
+    db: AsyncSession,
+    session_id: int
+) -> None:
+    """
+    Bump updated_at of a session by ID, without loading it.
+    
+    Does not commit.
+    
+    Args:
+        db: Database session
+        session_id: ID of the session
+    """
+    await db.execute(
+        update(ChatSession)
+        .where(ChatSession.id == session_id)
+        .values(updated_at=datetime.utcnow())
+    )
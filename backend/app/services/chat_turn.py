@@ -0,0 +1,273 @@
+"""
+Chat turn data access in two statements
+
+A request/response chat turn needs, around the LLM call:
+
+- begin_turn: one statement (CTEs + RETURNING) that checks session
+  ownership, inserts the user message and returns the summary and history
+  window. The history is read from the statement's snapshot, so it never
+  includes the message being inserted. When the conversation cache holds
+  the session the history part is left out; the statement still returns
+  the session's newest message to check the cached entry against.
+- finish_turn: one statement that inserts the assistant message and bumps
+  the session's updated_at.
+
+Each is committed on its own, so no connection is held during generation.
+Data-modifying CTEs are PostgreSQL-only; other databases get the same
+results from the regular chat_service calls.
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+from sqlalchemy import cast, func, insert, literal, select, true, update
+from sqlalchemy.ext.asyncio import AsyncSession
+import logging
+
+from app.config import settings
+from app.database.session import note_write
+from app.models.chat_session import ChatSession
+from app.models.message import Message, MessageRole, MessageStatus, content_values
+from app.models.user import User
+from app.services import chat_service
+from app.services.context_builder import count_tokens
+from app.services.conversation_cache import ConversationContext, get_conversation_cache
+
+logger = logging.getLogger(__name__)
+
+_messages = Message.__table__
+_sessions = ChatSession.__table__
+
+
+@dataclass
+class TurnStart:
+    """The committed user message and the context to answer it with"""
+    user_message: Message
+    context: ConversationContext
+
+
+def _fused(db: AsyncSession) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+async def begin_turn(
+    db: AsyncSession,
+    user: User,
+    session_id: int,
+    content: str
+) -> Optional[TurnStart]:
+    """
+    Check ownership, store the user message and load the prompt context.
+
+    Commits the user message.
+
+    Args:
+        db: Database session
+        user: Current authenticated user
+        session_id: ID of the chat session
+        content: User message content
+
+    Returns:
+        TurnStart, or None if the session does not exist or is not the user's
+    """
+    await chat_service.wait_for_writes(session_id)
+    if not _fused(db):
+        return await _begin_turn_unfused(db, user, session_id, content)
+
+    cache = get_conversation_cache()
+    cached = cache.get(session_id) if cache is not None else None
+    token_count = count_tokens(content)
+    stored = content_values(content)
+
+    owned = (
+        select(
+            _sessions.c.id,
+            _sessions.c.summary,
+            _sessions.c.summary_message_id,
+            _sessions.c.archived_at,
+            chat_service.newest_message_id(_sessions.c.id).label("last_message_id")
+        )
+        .where(_sessions.c.id == session_id, _sessions.c.user_id == user.id)
+        # FOR NO KEY UPDATE: waits for an archiver holding the row, then sees archived_at
+        .with_for_update(key_share=True)
+        .cte("owned")
+    )
+    inserted = (
+        insert(_messages)
+        .from_select(
+            ["session_id", "role", "content", "content_zstd", "token_count", "status"],
+            select(
+                owned.c.id,
+                cast(literal(MessageRole.USER, _messages.c.role.type), _messages.c.role.type),
+                cast(literal(stored["content"], _messages.c.content.type), _messages.c.content.type),
+                cast(literal(stored["content_zstd"], _messages.c.content_zstd.type), _messages.c.content_zstd.type),
+                cast(literal(token_count), _messages.c.token_count.type),
+                cast(literal(MessageStatus.COMPLETE.value), _messages.c.status.type)
+            )
+        )
+        .returning(_messages.c.id, _messages.c.created_at)
+        .cte("inserted")
+    )
+    columns = [
+        inserted.c.id.label("user_message_id"),
+        inserted.c.created_at.label("user_message_created_at"),
+        owned.c.summary,
+        owned.c.summary_message_id,
+        owned.c.archived_at,
+        owned.c.last_message_id,
+    ]
+    query = select(*columns).select_from(owned.join(inserted, true()))
+
+    if cached is None:
+        history = chat_service.context_window_query(
+            session_id,
+            settings.context_token_budget,
+            after_message_id=func.coalesce(select(owned.c.summary_message_id).scalar_subquery(), 0)
+        ).subquery("history")
+        query = (
+            select(
+                *columns,
+                history.c.id,
+                history.c.role,
+                history.c.content,
+                history.c.content_zstd,
+                history.c.token_count
+            )
+            .select_from(owned.join(inserted, true()).outerjoin(history, true()))
+            .order_by(history.c.created_at, history.c.id)
+        )
+
+    try:
+        rows = (await db.execute(query)).all()
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Failed to begin turn in session {session_id}: {e}")
+        raise
+
+    if not rows:
+        return None
+    note_write(db)
+
+    first = rows[0]
+    user_message = Message(
+        id=first.user_message_id,
+        session_id=session_id,
+        role=MessageRole.USER,
+        content=content,
+        token_count=token_count,
+        status=MessageStatus.COMPLETE.value,
+        created_at=first.user_message_created_at
+    )
+
+    stale = cached is not None and not cache.is_current(
+        session_id, first.last_message_id, first.summary_message_id
+    )
+    if first.archived_at is not None or stale:
+        if first.archived_at is not None:
+            # The history is in the archive: restore it first
+            await chat_service.get_session_by_id(db, session_id, user)
+        # Load (and cache) the history, including other workers' messages
+        context = await chat_service.get_conversation_context(
+            db, session_id, exclude_message_id=user_message.id
+        )
+        return TurnStart(user_message=user_message, context=context)
+
+    if cached is not None:
+        context = cached
+    else:
+        context = ConversationContext(
+            history=[chat_service.context_message(row) for row in rows if row.id is not None],
+            summary=first.summary,
+            summary_message_id=first.summary_message_id
+        )
+        if cache is not None:
+            cache.populate(
+                session_id, context.history, context.summary, context.summary_message_id,
+                first.last_message_id
+            )
+    chat_service.cache_message(user_message)
+
+    return TurnStart(user_message=user_message, context=context)
+
+
+async def finish_turn(
+    db: AsyncSession,
+    session_id: int,
+    content: str
+) -> Message:
+    """
+    Store the assistant response and bump the session's updated_at, then
+    commit.
+
+    Args:
+        db: Database session
+        session_id: ID of the chat session
+        content: Assistant response
+
+    Returns:
+        The created assistant Message
+    """
+    if not _fused(db):
+        message = await chat_service.create_message(db, session_id, "assistant", content)
+        await chat_service.touch_session(db, session_id)
+        await db.commit()
+        return message
+
+    token_count = count_tokens(content)
+    touched = (
+        update(_sessions)
+        .where(_sessions.c.id == session_id)
+        .values(updated_at=func.now())
+        .returning(_sessions.c.id)
+        .cte("touched")
+    )
+    statement = (
+        insert(_messages)
+        .values(
+            session_id=session_id,
+            role=MessageRole.ASSISTANT,
+            token_count=token_count,
+            status=MessageStatus.COMPLETE.value,
+            **content_values(content)
+        )
+        .returning(_messages.c.id, _messages.c.created_at)
+        .add_cte(touched)
+    )
+
+    try:
+        row = (await db.execute(statement)).one()
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Failed to finish turn in session {session_id}: {e}")
+        raise
+
+    note_write(db)
+    message = Message(
+        id=row.id,
+        session_id=session_id,
+        role=MessageRole.ASSISTANT,
+        content=content,
+        token_count=token_count,
+        status=MessageStatus.COMPLETE.value,
+        created_at=row.created_at
+    )
+    chat_service.cache_message(message)
+    return message
+
+
+async def _begin_turn_unfused(
+    db: AsyncSession,
+    user: User,
+    session_id: int,
+    content: str
+) -> Optional[TurnStart]:
+    session = await chat_service.get_session_by_id(db, session_id, user)
+    if session is None:
+        return None
+    user_message = await chat_service.create_message(db, session_id, "user", content)
+    await db.commit()
+    context = await chat_service.get_conversation_context(
+        db, session_id, exclude_message_id=user_message.id
+    )
+    return TurnStart(user_message=user_message, context=context)
@@ -0,0 +1,175 @@
+"""
+Dictionary training and backfill for compressed message content
+
+Messages at least settings.content_compression_min_bytes long are stored
+zstd-compressed in messages.content_zstd (see app.database.compression).
+Chat text is short and repetitive across messages, so a dictionary trained
+on real messages compresses it far better than zstd alone.
+
+These functions take a synchronous Connection so that migrations, the
+maintenance script (scripts/compress_message_content.py) and app startup
+(through AsyncConnection.run_sync) share them.
+"""
+
+from typing import Optional
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.engine import Connection
+import logging
+import zstandard
+
+from app.config import settings
+from app.database.compression import (
+    active_dictionary_id,
+    register_dictionary,
+    set_dictionary_loader,
+    split_content
+)
+from app.database.session import engine
+from app.models.content_dictionary import ContentDictionary
+from app.models.message import Message, MessageStatus, message_content
+
+logger = logging.getLogger(__name__)
+
+_messages = Message.__table__
+_dictionaries = ContentDictionary.__table__
+
+_BACKFILL_STATEMENT = (
+    update(_messages)
+    .where(_messages.c.id == bindparam("b_id"), _messages.c.session_id == bindparam("b_session_id"))
+    .values(content=None, content_zstd=bindparam("b_content_zstd"))
+)
+
+
+def load_dictionaries(connection: Connection) -> int:
+    """
+    Register every stored dictionary with this process.
+
+    Returns:
+        Number of dictionaries loaded
+    """
+    rows = connection.execute(
+        select(_dictionaries.c.id, _dictionaries.c.data).order_by(_dictionaries.c.id)
+    ).all()
+    for row in rows:
+        register_dictionary(row.id, bytes(row.data))
+    return len(rows)
+
+
+async def fetch_dictionary(dict_id: int) -> Optional[bytes]:
+    """A stored dictionary's bytes, or None if there is no such dictionary"""
+    async with engine.connect() as connection:
+        data = (await connection.execute(
+            select(_dictionaries.c.data).where(_dictionaries.c.id == dict_id)
+        )).scalar_one_or_none()
+    return None if data is None else bytes(data)
+
+
+async def load_content_dictionaries() -> None:
+    """Register the stored dictionaries at startup, and fetch newer ones on first use"""
+    set_dictionary_loader(fetch_dictionary)
+    try:
+        async with engine.connect() as connection:
+            count = await connection.run_sync(load_dictionaries)
+        logger.info(f"Loaded {count} message content dictionaries (active: {active_dictionary_id()})")
+    except Exception as e:
+        logger.error(f"Failed to load message content dictionaries: {e}")
+
+
+def train_dictionary(
+    connection: Connection,
+    dict_size: int = 64 * 1024,
+    max_samples: int = 20000,
+    min_samples: int = 200
+) -> Optional[int]:
+    """
+    Train a dictionary on the newest compressible messages, store it and
+    make it the active one. Does not commit.
+
+    Other processes load it when they first read a row compressed with
+    it, and from then on compress with it too.
+
+    Args:
+        connection: Database connection
+        dict_size: Dictionary size in bytes
+        max_samples: Most messages to train on
+        min_samples: Train only if at least this many messages qualify
+
+    Returns:
+        The new dictionary's ID, or None if there was too little data
+    """
+    rows = connection.execute(
+        select(_messages.c.content, _messages.c.content_zstd)
+        .where(
+            _messages.c.status != MessageStatus.STREAMING.value,
+            (func.length(_messages.c.content) >= settings.content_compression_min_bytes)
+            | _messages.c.content_zstd.is_not(None)
+        )
+        .order_by(_messages.c.id.desc())
+        .limit(max_samples)
+    ).all()
+    samples = [message_content(row).encode("utf-8") for row in rows]
+    if len(samples) < min_samples:
+        logger.info(f"Not training a content dictionary: {len(samples)} of {min_samples} samples")
+        return None
+
+    dict_id = (connection.execute(select(func.max(_dictionaries.c.id))).scalar() or 0) + 1
+    try:
+        dictionary = zstandard.train_dictionary(
+            dict_size, samples, dict_id=dict_id, level=settings.content_compression_level
+        )
+    except zstandard.ZstdError as e:
+        logger.warning(f"Content dictionary training failed: {e}")
+        return None
+
+    connection.execute(insert(_dictionaries).values(
+        id=dict_id, data=dictionary.as_bytes(), sample_count=len(samples)
+    ))
+    register_dictionary(dict_id, dictionary.as_bytes())
+    logger.info(f"Trained content dictionary {dict_id} on {len(samples)} messages")
+    return dict_id
+
+
+def backfill(connection: Connection, batch_size: int = 1000, commit: bool = False) -> int:
+    """
+    Compress stored messages that are over the size threshold.
+
+    Streaming messages are left alone (checkpoints append to plain content).
+
+    Args:
+        connection: Database connection
+        batch_size: Messages read and updated per round trip
+        commit: Commit after each batch (otherwise the caller commits)
+
+    Returns:
+        Number of messages compressed
+    """
+    compressed = 0
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            select(_messages.c.id, _messages.c.session_id, _messages.c.content)
+            .where(
+                _messages.c.id > last_id,
+                _messages.c.status != MessageStatus.STREAMING.value,
+                # Prefilter in characters (at most 4 bytes each); split_content
+                # applies the exact byte threshold
+                func.length(_messages.c.content) * 4 >= settings.content_compression_min_bytes
+            )
+            .order_by(_messages.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return compressed
+        last_id = rows[-1].id
+
+        updates = []
+        for row in rows:
+            _, text = split_content(row.content)
+            if text is not None:
+                updates.append({"b_id": row.id, "b_session_id": row.session_id, "b_content_zstd": text})
+        if updates:
+            connection.execute(_BACKFILL_STATEMENT, updates)
+            compressed += len(updates)
+        if commit:
+            connection.commit()
+        logger.info(f"Compressed {compressed} messages (up to id {last_id})")
@@ -0,0 +1,136 @@
+"""
+Token-budgeted context window builder
+
+Packs conversation history newest-first into a token budget instead of
+sending a fixed number of messages.
+"""
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+import logging
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Role markers and separators the chat format adds around each message
+MESSAGE_TOKEN_OVERHEAD = 4
+
+# Rough characters-per-token ratio used when no tokenizer is available
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"Tokenizer unavailable, estimating token counts: {e}")
+        return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    Count the tokens in a piece of text.
+
+    Uses tiktoken when installed, otherwise estimates from the length.
+
+    Args:
+        text: Text to count
+        model: Model whose tokenizer to use (defaults to settings.openai_model)
+
+    Returns:
+        Number of tokens, excluding per-message overhead
+    """
+    encoding = _get_encoding(model or settings.openai_model)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap length-based token estimate"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def message_tokens(message: Dict) -> int:
+    """
+    Tokens a history message occupies in the prompt.
+
+    Uses the stored `token_count` when present so messages are not
+    re-tokenized every turn.
+    """
+    token_count = message.get("token_count")
+    if token_count is None:
+        token_count = count_tokens(message["content"])
+    return token_count + MESSAGE_TOKEN_OVERHEAD
+
+
+@dataclass
+class ContextWindow:
+    """History selected for a prompt and the tokens it uses"""
+    history: List[Dict] = field(default_factory=list)
+    history_tokens: int = 0
+    prompt_tokens: int = 0
+    dropped: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        """Tokens used by the whole prompt (system + history + user message)"""
+        return self.prompt_tokens + self.history_tokens
+
+
+def build_context_window(
+    user_message: str,
+    chat_history: Optional[List[Dict]],
+    preamble: Sequence[str],
+    token_budget: Optional[int] = None
+) -> ContextWindow:
+    """
+    Pack history newest-first into the token budget.
+
+    Args:
+        user_message: The user's input message
+        chat_history: Previous messages in chronological order; each a dict
+            with "role", "content" and optionally "token_count"
+        preamble: System messages sent ahead of the history
+            (system prompt, conversation summary)
+        token_budget: Budget for the whole prompt
+            (defaults to settings.context_token_budget)
+
+    Returns:
+        ContextWindow with the selected history in chronological order
+    """
+    if token_budget is None:
+        token_budget = settings.context_token_budget
+
+    prompt_tokens = count_tokens(user_message) + MESSAGE_TOKEN_OVERHEAD
+    for text in preamble:
+        prompt_tokens += count_tokens(text) + MESSAGE_TOKEN_OVERHEAD
+    remaining = token_budget - prompt_tokens
+
+    selected = []
+    used = 0
+    history = chat_history or []
+    for message in reversed(history):
+        tokens = message_tokens(message)
+        if tokens > remaining - used:
+            break
+        selected.append(message)
+        used += tokens
+
+    selected.reverse()
+    return ContextWindow(
+        history=selected,
+        history_tokens=used,
+        prompt_tokens=prompt_tokens,
+        dropped=len(history) - len(selected)
+    )
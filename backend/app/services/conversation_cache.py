@@ -0,0 +1,263 @@
+"""
+Per-session hot conversation cache
+
+Keeps the recent history and rolling summary of active chat sessions in
+process memory, so steady-state turns need no history queries. Entries
+are versioned by the session's newest message and summary boundary;
+callers check the version against the database (a one-row lookup) before
+using an entry, so writes made by other workers are picked up.
+"""
+
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Tuple
+import time
+import logging
+
+from app.config import settings
+from app.services.context_builder import message_tokens
+
+logger = logging.getLogger(__name__)
+
+# Approximate per-message bookkeeping cost on top of the content bytes
+MESSAGE_OVERHEAD_BYTES = 256
+
+
+@dataclass
+class ConversationContext:
+    """History and summary used to build a prompt"""
+    history: List[Dict] = field(default_factory=list)
+    summary: Optional[str] = None
+    summary_message_id: Optional[int] = None
+
+
+@dataclass
+class _SessionEntry:
+    summary: Optional[str]
+    summary_message_id: Optional[int]
+    last_message_id: Optional[int]  # Newest message in the session
+    expires_at: float
+    # (message dict, prompt tokens, footprint in bytes), oldest first
+    messages: Deque[Tuple[Dict, int, int]] = field(default_factory=deque)
+    tokens: int = 0
+    size: int = 0
+
+
+class ConversationCache:
+    """
+    LRU cache of recent conversation history per chat session.
+
+    Each session keeps only the newest messages that can still fit in the
+    context token budget. The cache as a whole is bounded by memory
+    footprint (content bytes plus a fixed per-message overhead); least
+    recently used sessions are evicted first. Entries expire after
+    `ttl_seconds` so idle sessions do not hold memory.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl_seconds: float,
+        token_budget: int,
+        max_messages: int
+    ):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.token_budget = token_budget
+        self.max_messages = max_messages
+        self._sessions: "OrderedDict[int, _SessionEntry]" = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def get(
+        self,
+        session_id: int,
+        exclude_message_id: Optional[int] = None
+    ) -> Optional[ConversationContext]:
+        """
+        Get the cached context for a session.
+
+        Args:
+            session_id: ID of the chat session
+            exclude_message_id: Message to leave out of the history
+
+        Returns:
+            ConversationContext, or None if the session is not cached
+        """
+        entry = self._sessions.get(session_id)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            self.invalidate(session_id)
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._sessions.move_to_end(session_id)
+        self.hits += 1
+        return ConversationContext(
+            history=[
+                message for message, _, _ in entry.messages
+                if message["id"] != exclude_message_id
+            ],
+            summary=entry.summary,
+            summary_message_id=entry.summary_message_id
+        )
+
+    def is_current(
+        self,
+        session_id: int,
+        last_message_id: Optional[int],
+        summary_message_id: Optional[int]
+    ) -> bool:
+        """
+        Check a cached session against its state in the database, dropping
+        it if another worker has changed it.
+
+        Args:
+            session_id: ID of the chat session
+            last_message_id: ID of the session's newest message
+            summary_message_id: The session's summary boundary
+
+        Returns:
+            True if the cached entry is up to date
+        """
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return False
+        if entry.last_message_id != last_message_id or entry.summary_message_id != summary_message_id:
+            self.stale += 1
+            self.invalidate(session_id)
+            return False
+        return True
+
+    def populate(
+        self,
+        session_id: int,
+        history: List[Dict],
+        summary: Optional[str],
+        summary_message_id: Optional[int],
+        last_message_id: Optional[int]
+    ) -> None:
+        """
+        Cache a session's context loaded from the database.
+
+        Args:
+            session_id: ID of the chat session
+            history: Messages newer than the summary boundary, oldest first
+            summary: Rolling summary of the session
+            summary_message_id: Last message folded into the summary
+            last_message_id: ID of the session's newest message when loaded
+        """
+        self.invalidate(session_id)
+        entry = _SessionEntry(
+            summary=summary,
+            summary_message_id=summary_message_id,
+            last_message_id=last_message_id,
+            expires_at=time.monotonic() + self.ttl_seconds
+        )
+        self._sessions[session_id] = entry
+        for message in history:
+            self._push(entry, message)
+        self._trim(entry)
+        self._evict()
+
+    def append(self, session_id: int, message: Dict) -> None:
+        """
+        Append a newly created message to a cached session (no-op if the
+        session is not cached).
+
+        Args:
+            session_id: ID of the chat session
+            message: Dict with id, role, content and token_count
+        """
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return
+        entry.last_message_id = max(entry.last_message_id or 0, message["id"])
+        self._push(entry, message)
+        self._trim(entry)
+        self._evict()
+
+    def update_summary(
+        self,
+        session_id: int,
+        summary: str,
+        summary_message_id: int
+    ) -> None:
+        """Apply a new rolling summary and drop the messages it folded in"""
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return
+        entry.summary = summary
+        entry.summary_message_id = summary_message_id
+        while entry.messages and entry.messages[0][0]["id"] <= summary_message_id:
+            self._pop(entry)
+
+    def invalidate(self, session_id: int) -> None:
+        """Drop a session from the cache (e.g. after delete or update)"""
+        entry = self._sessions.pop(session_id, None)
+        if entry is not None:
+            self._size -= entry.size
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and memory footprint"""
+        return {
+            "sessions": len(self._sessions),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "evictions": self.evictions,
+        }
+
+    def _push(self, entry: _SessionEntry, message: Dict) -> None:
+        size = len(message["content"].encode("utf-8")) + MESSAGE_OVERHEAD_BYTES
+        tokens = message_tokens(message)
+        entry.messages.append((message, tokens, size))
+        entry.tokens += tokens
+        entry.size += size
+        self._size += size
+
+    def _pop(self, entry: _SessionEntry) -> None:
+        _, tokens, size = entry.messages.popleft()
+        entry.tokens -= tokens
+        entry.size -= size
+        self._size -= size
+
+    def _trim(self, entry: _SessionEntry) -> None:
+        # Older messages can never make it into the prompt; keep one spare
+        # message so the newest turn can still be excluded
+        while len(entry.messages) > 1 and (
+            entry.tokens - entry.messages[0][1] >= self.token_budget
+            or len(entry.messages) > self.max_messages + 1
+        ):
+            self._pop(entry)
+
+    def _evict(self) -> None:
+        while self._size > self.max_bytes and len(self._sessions) > 1:
+            session_id, entry = self._sessions.popitem(last=False)
+            self._size -= entry.size
+            self.evictions += 1
+            logger.debug(f"Evicted session {session_id} from conversation cache")
+
+
+# Singleton instance
+_conversation_cache = None
+
+
+def get_conversation_cache() -> Optional[ConversationCache]:
+    """Get or create the singleton conversation cache (None if disabled)"""
+    global _conversation_cache
+    if _conversation_cache is None and settings.conversation_cache_enabled:
+        _conversation_cache = ConversationCache(
+            max_bytes=settings.conversation_cache_max_bytes,
+            ttl_seconds=settings.conversation_cache_ttl_seconds,
+            token_budget=settings.context_token_budget,
+            max_messages=settings.context_max_messages
+        )
+    return _conversation_cache
@@ -0,0 +1,192 @@
+"""
+Hedged LLM streams with a percentile-based time-to-first-token deadline
+
+If the first chunk of a stream does not arrive within the deadline, a
+second request is started; whichever produces a token first wins and
+the other is cancelled.
+"""
+
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Deque, Dict, Optional
+import asyncio
+import math
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StreamMetrics:
+    """Per-request streaming measurements"""
+    ttft: Optional[float] = None  # Seconds until the first chunk
+    hedged: bool = False  # A hedge request was started
+    hedge_won: bool = False  # The hedge produced the first token
+    cached: bool = False  # Served from the response cache
+    coalesced: bool = False  # Shared another request's upstream stream
+
+    def as_dict(self) -> Dict:
+        return {
+            "ttft_ms": None if self.ttft is None else round(self.ttft * 1000),
+            "hedged": self.hedged,
+            "hedge_won": self.hedge_won,
+            "cached": self.cached,
+            "coalesced": self.coalesced,
+        }
+
+
+async def _close(iterator: AsyncIterator, task: Optional[asyncio.Future] = None) -> None:
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except (asyncio.CancelledError, StopAsyncIteration, Exception):
+            pass
+    aclose = getattr(iterator, "aclose", None)
+    if aclose is not None:
+        try:
+            await aclose()
+        except Exception as e:
+            logger.debug(f"Error closing hedged stream: {e}")
+
+
+class HedgingPolicy:
+    """
+    Tracks upstream TTFT and runs hedged streams.
+
+    The hedge deadline is the `percentile` of recent TTFT samples, clamped
+    to [min_deadline, max_deadline]. Until `min_samples` have been seen,
+    `initial_deadline` is used.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        min_deadline: float = 1.0,
+        max_deadline: float = 10.0,
+        initial_deadline: float = 5.0,
+        window: int = 500,
+        min_samples: int = 20
+    ):
+        self.percentile = percentile
+        self.min_deadline = min_deadline
+        self.max_deadline = max_deadline
+        self.initial_deadline = initial_deadline
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def deadline(self) -> float:
+        """Seconds to wait for a first chunk before hedging"""
+        if len(self._samples) < self.min_samples:
+            return self.initial_deadline
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, math.ceil(self.percentile / 100 * len(ordered)) - 1)
+        return min(self.max_deadline, max(self.min_deadline, ordered[max(index, 0)]))
+
+    def record(self, metrics: StreamMetrics) -> None:
+        """Record the outcome of one upstream stream"""
+        self.requests += 1
+        if metrics.hedged:
+            self.hedged += 1
+        if metrics.hedge_won:
+            self.hedge_wins += 1
+        if metrics.ttft is not None:
+            self._samples.append(metrics.ttft)
+
+    def stats(self) -> Dict:
+        """Current deadline and hedge counters, for tuning"""
+        return {
+            "deadline_ms": round(self.deadline() * 1000),
+            "samples": len(self._samples),
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+        }
+
+    async def stream(
+        self,
+        primary: Callable[[], AsyncIterator[str]],
+        hedge: Callable[[], AsyncIterator[str]],
+        metrics: Optional[StreamMetrics] = None,
+        ready: Optional[asyncio.Event] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream from `primary`, hedging with `hedge` after the deadline.
+
+        Args:
+            primary: Factory for the primary upstream stream
+            hedge: Factory for the hedge stream (e.g. another deployment)
+            metrics: Filled with TTFT and hedging outcome
+            ready: Set once the primary request is actually sent (e.g. it
+                holds a pool entry); the deadline and TTFT start from then
+
+        Yields:
+            Chunks from whichever stream produced a token first
+        """
+        metrics = metrics if metrics is not None else StreamMetrics()
+        started = time.monotonic()
+        deadline = self.deadline()
+
+        primary_stream = primary().__aiter__()
+        contenders: Dict[asyncio.Future, AsyncIterator[str]] = {
+            asyncio.ensure_future(primary_stream.__anext__()): primary_stream
+        }
+
+        winner = None
+        first_chunk = None
+        error = None
+        try:
+            if ready is not None:
+                ready_task = asyncio.ensure_future(ready.wait())
+                try:
+                    await asyncio.wait([*contenders, ready_task], return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    ready_task.cancel()
+                started = time.monotonic()
+
+            done, _ = await asyncio.wait(contenders, timeout=deadline)
+            if not done:
+                metrics.hedged = True
+                logger.info(f"No first token after {deadline:.2f}s, starting hedge request")
+                hedge_stream = hedge().__aiter__()
+                contenders[asyncio.ensure_future(hedge_stream.__anext__())] = hedge_stream
+
+            while contenders and winner is None:
+                done, _ = await asyncio.wait(contenders, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    stream = contenders.pop(task)
+                    try:
+                        first_chunk = task.result()
+                    except StopAsyncIteration:
+                        pass
+                    except Exception as e:
+                        error = error or e
+                        await _close(stream)
+                        continue
+                    winner = stream
+                    break
+
+            if winner is None:
+                raise error
+        finally:
+            # Cancel the loser (or everything, if we are being cancelled)
+            for task, stream in contenders.items():
+                await _close(stream, task)
+
+        metrics.ttft = time.monotonic() - started
+        metrics.hedge_won = winner is not primary_stream
+        self.record(metrics)
+
+        if first_chunk is None:
+            return
+
+        try:
+            yield first_chunk
+            async for chunk in winner:
+                yield chunk
+        finally:
+            await _close(winner)
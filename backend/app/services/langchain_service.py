@@ -4,44 +4,282 @@ LangChain Service for AI Chat Integration
 Handles GPT-4 integration, conversation chains, and memory management.
 """
 
-from typing import List, Dict, AsyncGenerator
-from langchain_openai import ChatOpenAI
+from typing import Callable, List, Dict, AsyncGenerator, Optional, Tuple
+from langchain_openai import OpenAIEmbeddings
+import asyncio
+import time
 import logging
 
 from app.config import settings
+from app.services.llm_pool import LLMPoolExhaustedError, PoolEntry, create_llm_pool, is_rate_limit_error
+from app.services.response_cache import ResponseCache, hash_context
+from app.services.request_coalescer import StreamCoalescer
+from app.services.context_builder import ContextWindow, build_context_window, count_tokens
+from app.services.hedging import HedgingPolicy, StreamMetrics
 
 logger = logging.getLogger(__name__)
 
+SYSTEM_PROMPT = "You are a helpful AI assistant. You provide clear, accurate, and concise responses."
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an AI assistant. "
+    "Update the existing summary with the new messages. Keep facts, decisions, names, "
+    "open questions and user preferences; drop pleasantries. Reply with the summary only."
+)
+
+
+def format_summary(summary: str) -> str:
+    """Wrap a rolling conversation summary for inclusion in the prompt"""
+    return f"Summary of the earlier conversation:\n{summary}"
+
 
 class LangChainService:
     """Service for managing LangChain conversations with GPT-4"""
     
     def __init__(self):
-        """Initialize LangChain with OpenAI GPT-4"""
+        """Initialize LangChain with the configured provider (OpenAI GPT-4 by default)"""
         try:
-            self.llm = ChatOpenAI(
-                api_key=settings.openai_api_key,
-                model=settings.openai_model,
-                temperature=settings.openai_temperature,
-                max_tokens=settings.openai_max_tokens,
-                streaming=True  # Enable streaming for future WebSocket support
+            self.pool = create_llm_pool()
+            self.response_cache = self._create_response_cache()
+            self.coalescer = StreamCoalescer() if settings.llm_coalescing_enabled else None
+            self.hedging = self._create_hedging_policy()
+            logger.info(
+                f"LangChain service initialized successfully with {settings.llm_provider}:{settings.openai_model}"
             )
-            logger.info(f"LangChain service initialized successfully with {settings.openai_model}")
         except Exception as e:
             logger.error(f"Failed to initialize LangChain service: {e}")
             raise
     
+    def _create_hedging_policy(self) -> Optional[HedgingPolicy]:
+        """Create the TTFT hedging policy configured in settings, if enabled"""
+        if not settings.llm_hedging_enabled:
+            return None
+        
+        return HedgingPolicy(
+            percentile=settings.llm_hedge_percentile,
+            min_deadline=settings.llm_hedge_min_delay_ms / 1000,
+            max_deadline=settings.llm_hedge_max_delay_ms / 1000,
+            initial_deadline=settings.llm_hedge_initial_delay_ms / 1000,
+            window=settings.llm_hedge_window,
+            min_samples=settings.llm_hedge_min_samples
+        )
+    
+    def _create_response_cache(self) -> Optional[ResponseCache]:
+        """Create the response cache configured in settings, if enabled"""
+        if not settings.response_cache_enabled:
+            return None
+        
+        embeddings = None
+        if settings.response_cache_semantic_enabled:
+            embeddings = OpenAIEmbeddings(
+                api_key=settings.openai_api_key,
+                model=settings.openai_embedding_model
+            )
+        
+        return ResponseCache(
+            max_entries=settings.response_cache_max_entries,
+            ttl_seconds=settings.response_cache_ttl_seconds,
+            embeddings=embeddings,
+            similarity_threshold=settings.response_cache_similarity_threshold
+        )
+    
+    def build_context(
+        self,
+        user_message: str,
+        chat_history: List[Dict[str, str]] = None,
+        summary: Optional[str] = None
+    ) -> ContextWindow:
+        """
+        Select the history that fits the context token budget.
+        
+        Args:
+            user_message: The user's input message
+            chat_history: Previous conversation messages, oldest first
+            summary: Rolling summary of messages older than chat_history
+        
+        Returns:
+            ContextWindow with the packed history and its token usage
+        """
+        preamble = [SYSTEM_PROMPT]
+        if summary:
+            preamble.append(format_summary(summary))
+        return build_context_window(user_message, chat_history, preamble)
+    
+    def _build_messages(
+        self,
+        user_message: str,
+        chat_history: List[Dict[str, str]] = None,
+        summary: Optional[str] = None
+    ) -> Tuple[List[Tuple[str, str]], ContextWindow]:
+        """
+        Assemble the prompt sent to the model.
+        
+        Args:
+            user_message: The user's input message
+            chat_history: Previous conversation messages, packed newest-first
+                into the context token budget
+            summary: Rolling summary of messages older than chat_history
+        
+        Returns:
+            Tuple of (list of (role, content) tuples: system prompt, summary,
+            history, user message; the ContextWindow they were built from)
+        """
+        context = self.build_context(user_message, chat_history, summary)
+        logger.debug(
+            f"Context window: {len(context.history)} messages, "
+            f"{context.total_tokens} tokens ({context.dropped} dropped)"
+        )
+        
+        messages = [("system", SYSTEM_PROMPT)]
+        if summary:
+            messages.append(("system", format_summary(summary)))
+        
+        for msg in context.history:
+            if msg["role"] == "user":
+                messages.append(("human", msg["content"]))
+            elif msg["role"] == "assistant":
+                messages.append(("assistant", msg["content"]))
+        
+        messages.append(("human", user_message))
+        return messages, context
+    
+    def _cache_key_context(self, messages: List[Tuple[str, str]]) -> str:
+        """Hash everything sent before the user message, plus the model settings"""
+        return hash_context(
+            [("model", f"{settings.openai_model}:{settings.openai_temperature}")] + messages[:-1]
+        )
+    
+    def _should_retry(self, error: Exception, attempt: int, attempts: int) -> bool:
+        """Retry upstream rate limits on another entry; pool exhaustion already waited"""
+        return (
+            is_rate_limit_error(error)
+            and not isinstance(error, LLMPoolExhaustedError)
+            and attempt + 1 < attempts
+        )
+    
+    async def _invoke(self, messages: List[Tuple[str, str]], tokens: int) -> str:
+        """
+        Invoke the model on a pool entry, moving to another entry if the
+        chosen one is rate limited.
+        """
+        attempts = len(self.pool)
+        for attempt in range(attempts):
+            try:
+                async with self.pool.acquire(tokens) as entry:
+                    response = await entry.llm.ainvoke(messages)
+                    return response.content
+            except Exception as e:
+                if not self._should_retry(e, attempt, attempts):
+                    raise
+                logger.warning(f"LLM pool entry rate limited, retrying on another entry: {e}")
+    
+    async def _astream(
+        self,
+        messages: List[Tuple[str, str]],
+        tokens: int,
+        on_acquire: Optional[Callable[[PoolEntry], None]] = None,
+        exclude: Optional[PoolEntry] = None
+    ) -> AsyncGenerator[str, None]:
+        """
+        Stream non-empty chunks from a pool entry. A rate limited entry is
+        swapped for another one as long as nothing has been yielded yet.
+        
+        `on_acquire` is called with each entry used; `exclude` is avoided
+        on the first attempt.
+        """
+        attempts = len(self.pool)
+        for attempt in range(attempts):
+            yielded = False
+            try:
+                async with self.pool.acquire(tokens, exclude=exclude if attempt == 0 else None) as entry:
+                    if on_acquire is not None:
+                        on_acquire(entry)
+                    async for chunk in entry.llm.astream(messages):
+                        if chunk.content:
+                            yielded = True
+                            yield chunk.content
+                return
+            except Exception as e:
+                if yielded or not self._should_retry(e, attempt, attempts):
+                    raise
+                logger.warning(f"LLM pool entry rate limited, retrying on another entry: {e}")
+    
+    async def _astream_hedged(
+        self,
+        messages: List[Tuple[str, str]],
+        tokens: int,
+        metrics: StreamMetrics
+    ) -> AsyncGenerator[str, None]:
+        """
+        Stream from the pool, hedging with a second request if the first
+        token is late. The hedge goes to another pool entry (which may be a
+        different deployment or model), so a pool with a single entry is
+        never hedged. The deadline runs from when the primary holds a pool
+        entry, so waiting for capacity never triggers a hedge.
+        """
+        if self.hedging is None or len(self.pool) < 2:
+            async for chunk in self._astream(messages, tokens):
+                yield chunk
+            return
+        
+        acquired: List[PoolEntry] = []
+        ready = asyncio.Event()
+        
+        def on_acquire(entry: PoolEntry) -> None:
+            acquired.append(entry)
+            ready.set()
+        
+        def primary():
+            return self._astream(messages, tokens, on_acquire=on_acquire)
+        
+        def hedge():
+            return self._astream(messages, tokens, exclude=acquired[-1])
+        
+        async for chunk in self.hedging.stream(primary, hedge, metrics, ready=ready):
+            yield chunk
+    
+    def _reserved_tokens(self, context: ContextWindow) -> int:
+        """Tokens to charge against a pool entry: prompt plus the max_tokens reservation"""
+        return context.total_tokens + settings.openai_max_tokens
+    
+    async def _stream_and_cache(
+        self,
+        messages: List[Tuple[str, str]],
+        tokens: int,
+        user_message: str,
+        context_hash: Optional[str],
+        metrics: StreamMetrics
+    ) -> AsyncGenerator[str, None]:
+        """Stream non-empty chunks from the model and cache the full response"""
+        chunks = []
+        async for chunk in self._astream_hedged(messages, tokens, metrics):
+            chunks.append(chunk)
+            yield chunk
+        
+        if context_hash is not None:
+            await self.response_cache.set(user_message, context_hash, "".join(chunks))
+    
+    async def _replay_cached(self, response: str) -> AsyncGenerator[str, None]:
+        """Yield a cached response in chunks, mimicking a model stream"""
+        size = max(settings.response_cache_replay_chunk_size, 1)
+        for start in range(0, len(response), size):
+            yield response[start:start + size]
+    
     async def generate_response(
         self,
         user_message: str,
-        chat_history: List[Dict[str, str]] = None
+        chat_history: List[Dict[str, str]] = None,
+        use_cache: bool = True,
+        summary: Optional[str] = None
     ) -> str:
         """
         Generate AI response for a user message.
         
         Args:
             user_message: The user's input message
-            chat_history: Previous conversation messages (last 20 for context)
+            chat_history: Previous conversation messages, packed into the context token budget
+            use_cache: Whether the response cache may be read and written
+            summary: Rolling summary of messages older than chat_history
         
         Returns:
             AI generated response text
@@ -52,28 +290,24 @@ class LangChainService:
         try:
             logger.info(f"Generating AI response for message (length: {len(user_message)})")
             
-            # Prepare messages for the conversation
-            messages = []
-            
-            # System message
-            messages.append(("system", "You are a helpful AI assistant. You provide clear, accurate, and concise responses."))
+            messages, context = self._build_messages(user_message, chat_history, summary)
             
-            # Add chat history
-            if chat_history:
-                for msg in chat_history[-20:]:  # Only last 20 messages for context
-                    if msg["role"] == "user":
-                        messages.append(("human", msg["content"]))
-                    elif msg["role"] == "assistant":
-                        messages.append(("assistant", msg["content"]))
-            
-            # Add current message
-            messages.append(("human", user_message))
+            cache = self.response_cache if use_cache else None
+            if cache is not None:
+                context_hash = self._cache_key_context(messages)
+                cached = await cache.get(user_message, context_hash)
+                if cached is not None:
+                    logger.info(f"AI response served from cache (length: {len(cached)})")
+                    return cached
             
             # Create prompt and invoke
-            response = await self.llm.ainvoke(messages)
+            response = await self._invoke(messages, self._reserved_tokens(context))
+            
+            if cache is not None:
+                await cache.set(user_message, context_hash, response)
             
-            logger.info(f"AI response generated successfully (length: {len(response.content)})")
-            return response.content
+            logger.info(f"AI response generated successfully (length: {len(response)})")
+            return response
         
         except Exception as e:
             logger.error(f"AI response generation failed: {e}", exc_info=True)
@@ -82,14 +316,24 @@ class LangChainService:
     async def stream_response(
         self,
         user_message: str,
-        chat_history: List[Dict[str, str]] = None
+        chat_history: List[Dict[str, str]] = None,
+        use_cache: bool = True,
+        summary: Optional[str] = None,
+        metrics: Optional[StreamMetrics] = None
     ) -> AsyncGenerator[str, None]:
         """
         Stream AI response for a user message chunk by chunk.
         
+        Cached responses are replayed as a sequence of chunks so callers
+        see the same protocol as a live stream.
+        
         Args:
             user_message: The user's input message
-            chat_history: Previous conversation messages (last 20 for context)
+            chat_history: Previous conversation messages, packed into the context token budget
+            use_cache: Whether the response cache may be read and written
+            summary: Rolling summary of messages older than chat_history
+            metrics: Filled with time to first token and whether the
+                response was cached, coalesced or hedged
         
         Yields:
             AI response text chunks
@@ -97,37 +341,99 @@ class LangChainService:
         Raises:
             Exception: If AI generation fails
         """
+        metrics = metrics if metrics is not None else StreamMetrics()
+        started = time.monotonic()
         try:
             logger.info(f"Streaming AI response for message (length: {len(user_message)})")
             
-            # Prepare messages for the conversation
-            messages = []
+            messages, context = self._build_messages(user_message, chat_history, summary)
+            
+            cache = self.response_cache if use_cache else None
+            context_hash = None
+            if cache is not None:
+                context_hash = self._cache_key_context(messages)
+                cached = await cache.get(user_message, context_hash)
+                if cached is not None:
+                    metrics.cached = True
+                    metrics.ttft = time.monotonic() - started
+                    async for chunk in self._replay_cached(cached):
+                        yield chunk
+                    logger.info(f"AI response replayed from cache (length: {len(cached)})")
+                    return
             
-            # System message
-            messages.append(("system", "You are a helpful AI assistant. You provide clear, accurate, and concise responses."))
+            # Not called when the request joins another request's stream
+            metrics.coalesced = True
             
-            # Add chat history
-            if chat_history:
-                for msg in chat_history[-20:]:  # Only last 20 messages for context
-                    if msg["role"] == "user":
-                        messages.append(("human", msg["content"]))
-                    elif msg["role"] == "assistant":
-                        messages.append(("assistant", msg["content"]))
+            def upstream():
+                metrics.coalesced = False
+                return self._stream_and_cache(
+                    messages, self._reserved_tokens(context), user_message, context_hash, metrics
+                )
             
-            # Add current message
-            messages.append(("human", user_message))
+            # Stream response, sharing one upstream call between identical requests
+            if self.coalescer is not None:
+                flight_key = hash_context([("cache", str(cache is not None))] + messages)
+                stream = self.coalescer.stream(flight_key, upstream)
+            else:
+                stream = upstream()
             
-            # Stream response
-            async for chunk in self.llm.astream(messages):
-                if chunk.content:
-                    yield chunk.content
+            first = True
+            try:
+                async for chunk in stream:
+                    if first:
+                        # As seen by this caller, including queueing in the pool
+                        metrics.ttft = time.monotonic() - started
+                        first = False
+                    yield chunk
+            finally:
+                # Close the upstream call promptly if the caller stops early
+                await stream.aclose()
             
-            logger.info("AI response streaming completed")
+            logger.info(
+                f"AI response streaming completed (ttft: {metrics.as_dict()['ttft_ms']}ms, "
+                f"hedged: {metrics.hedged}, coalesced: {metrics.coalesced})"
+            )
         
         except Exception as e:
             logger.error(f"AI response streaming failed: {e}", exc_info=True)
             raise
     
+    async def summarize(
+        self,
+        previous_summary: Optional[str],
+        new_messages: List[Dict[str, str]]
+    ) -> str:
+        """
+        Fold new messages into a rolling conversation summary.
+        
+        Args:
+            previous_summary: Current summary, or None for the first fold
+            new_messages: Messages to fold in, oldest first
+        
+        Returns:
+            Updated summary text
+        """
+        transcript = "\n".join(
+            f"{msg['role'].upper()}: {msg['content']}" for msg in new_messages
+        )
+        messages = [
+            ("system", SUMMARY_PROMPT),
+            ("human", f"Existing summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}")
+        ]
+        
+        tokens = sum(count_tokens(content) for _, content in messages) + settings.openai_max_tokens
+        response = await self._invoke(messages, tokens)
+        logger.info(f"Conversation summary updated (length: {len(response)})")
+        return response
+    
+    def pool_stats(self) -> List[Dict]:
+        """Live per-entry utilization of the upstream LLM pool"""
+        return self.pool.stats()
+    
+    def hedging_stats(self) -> Optional[Dict]:
+        """TTFT hedge deadline and counters, or None if hedging is disabled"""
+        return self.hedging.stats() if self.hedging is not None else None
+    
     def health_check(self) -> bool:
         """
         Check if LangChain service is healthy and can connect to OpenAI.
@@ -137,7 +443,7 @@ class LangChainService:
         """
         try:
             # Simple test to verify service is initialized
-            return self.llm is not None
+            return len(self.pool) > 0
         except Exception as e:
             logger.error(f"LangChain health check failed: {e}")
             return False
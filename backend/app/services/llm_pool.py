@@ -0,0 +1,250 @@
+"""
+Pool of upstream LLM credentials/deployments
+
+Each entry tracks its own requests-per-minute and tokens-per-minute
+budgets; requests are routed to the entry with the most headroom. Budgets
+are per worker process: divide the account limits by the worker count.
+"""
+
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional
+import asyncio
+import json
+import time
+import logging
+import openai
+
+from app.config import settings
+from app.services.llm_providers import create_chat_model
+
+logger = logging.getLogger(__name__)
+
+
+class LLMPoolExhaustedError(Exception):
+    """No pool entry had rate limit headroom within the acquire timeout"""
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Whether an exception is an upstream (or pool) rate limit"""
+    if isinstance(error, (LLMPoolExhaustedError, openai.RateLimitError)):
+        return True
+    return getattr(error, "status_code", None) == 429
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `per_minute` units per minute.
+
+    A limit of 0 disables the bucket (unlimited).
+    """
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self.capacity = float(per_minute)
+        self._level = float(per_minute)
+        self._updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.per_minute <= 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.per_minute / 60)
+        self._updated = now
+
+    def available(self) -> float:
+        """Units currently available"""
+        if self.unlimited:
+            return float("inf")
+        self._refill()
+        return self._level
+
+    def headroom(self) -> float:
+        """Fraction of capacity currently available (1.0 = idle)"""
+        if self.unlimited:
+            return 1.0
+        return self.available() / self.capacity
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available"""
+        if self.unlimited:
+            return 0.0
+        missing = min(amount, self.capacity) - self.available()
+        return max(0.0, missing * 60 / self.per_minute)
+
+    def consume(self, amount: float) -> None:
+        if not self.unlimited:
+            self._refill()
+            self._level -= amount
+
+
+@dataclass
+class PoolEntry:
+    """One upstream credential or deployment"""
+    name: str
+    llm: Any
+    requests: TokenBucket
+    tokens: TokenBucket
+    in_flight: int = 0
+    total_requests: int = 0
+    total_tokens: int = 0
+    rate_limited: int = 0
+    errors: int = 0
+    cooldown_until: float = 0.0
+
+    def can_serve(self, tokens: int) -> bool:
+        return (
+            time.monotonic() >= self.cooldown_until
+            and self.requests.wait_time(1) == 0
+            and self.tokens.wait_time(tokens) == 0
+        )
+
+    def headroom(self) -> float:
+        return min(self.requests.headroom(), self.tokens.headroom())
+
+    def wait_time(self, tokens: int) -> float:
+        return max(
+            self.cooldown_until - time.monotonic(),
+            self.requests.wait_time(1),
+            self.tokens.wait_time(tokens)
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "rpm_limit": self.requests.per_minute,
+            "tpm_limit": self.tokens.per_minute,
+            "rpm_available": None if self.requests.unlimited else round(self.requests.available()),
+            "tpm_available": None if self.tokens.unlimited else round(self.tokens.available()),
+            "utilization": round(1 - self.headroom(), 3),
+            "in_flight": self.in_flight,
+            "total_requests": self.total_requests,
+            "total_tokens": self.total_tokens,
+            "rate_limited": self.rate_limited,
+            "errors": self.errors,
+            "cooling_down": time.monotonic() < self.cooldown_until,
+        }
+
+
+class LLMPool:
+    """
+    Route LLM calls across several upstream entries.
+
+    Token usage is charged the way OpenAI counts it: prompt tokens plus the
+    max_tokens reservation. An entry that returns a rate limit error is
+    taken out of rotation for `cooldown_seconds`.
+    """
+
+    def __init__(
+        self,
+        entries: List[PoolEntry],
+        acquire_timeout: float = 30.0,
+        cooldown_seconds: float = 10.0
+    ):
+        if not entries:
+            raise ValueError("LLM pool needs at least one entry")
+        self.entries = entries
+        self.acquire_timeout = acquire_timeout
+        self.cooldown_seconds = cooldown_seconds
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _pick(self, tokens: int, exclude: Optional[PoolEntry]) -> Optional[PoolEntry]:
+        candidates = [
+            entry for entry in self.entries
+            if entry is not exclude and entry.can_serve(tokens)
+        ]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda entry: (entry.headroom(), -entry.in_flight))
+
+    @asynccontextmanager
+    async def acquire(
+        self,
+        tokens: int,
+        exclude: Optional[PoolEntry] = None
+    ) -> AsyncIterator[PoolEntry]:
+        """
+        Reserve capacity on the entry with the most headroom.
+
+        Waits for capacity up to `acquire_timeout` seconds.
+
+        Args:
+            tokens: Tokens to charge (prompt tokens + max_tokens)
+            exclude: Entry to avoid (e.g. the one a hedged request is running on)
+
+        Yields:
+            The selected PoolEntry; use entry.llm for the call
+
+        Raises:
+            LLMPoolExhaustedError: If no entry had capacity in time
+        """
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            entry = self._pick(tokens, exclude)
+            if entry is not None:
+                break
+            waits = [e.wait_time(tokens) for e in self.entries if e is not exclude]
+            delay = min(waits) if waits else self.acquire_timeout
+            if time.monotonic() + delay > deadline:
+                raise LLMPoolExhaustedError("rate_limit: no LLM pool capacity available")
+            await asyncio.sleep(max(delay, 0.01))
+
+        entry.requests.consume(1)
+        entry.tokens.consume(tokens)
+        entry.in_flight += 1
+        entry.total_requests += 1
+        entry.total_tokens += tokens
+        try:
+            yield entry
+        except Exception as e:
+            if is_rate_limit_error(e):
+                entry.rate_limited += 1
+                entry.cooldown_until = time.monotonic() + self.cooldown_seconds
+                logger.warning(f"LLM pool entry {entry.name} rate limited, cooling down")
+            else:
+                entry.errors += 1
+            raise
+        finally:
+            entry.in_flight -= 1
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Live per-entry utilization"""
+        return [entry.stats() for entry in self.entries]
+
+
+def _entry_from_config(config: Dict[str, Any], index: int) -> PoolEntry:
+    provider = config.get("provider", settings.llm_provider)
+    overrides = {}
+    if provider == "openai":
+        for key in ("api_key", "model", "base_url", "temperature", "max_tokens"):
+            if key in config:
+                overrides[key] = config[key]
+
+    return PoolEntry(
+        name=config.get("name", f"{provider}-{index}"),
+        llm=create_chat_model(provider, **overrides),
+        requests=TokenBucket(int(config.get("rpm", settings.openai_rpm_limit))),
+        tokens=TokenBucket(int(config.get("tpm", settings.openai_tpm_limit)))
+    )
+
+
+def create_llm_pool() -> LLMPool:
+    """
+    Build the pool from settings.
+
+    LLM_POOL_DEPLOYMENTS is a JSON list of entries such as
+    {"name": "key-a", "api_key": "sk-...", "model": "gpt-4", "rpm": 500,
+    "tpm": 80000}; when empty a single entry uses OPENAI_API_KEY.
+    """
+    configs = json.loads(settings.llm_pool_deployments) if settings.llm_pool_deployments else [{"name": "default"}]
+    entries = [_entry_from_config(config, index) for index, config in enumerate(configs)]
+    logger.info(f"LLM pool initialized with {len(entries)} entries")
+    return LLMPool(
+        entries,
+        acquire_timeout=settings.llm_pool_acquire_timeout_seconds,
+        cooldown_seconds=settings.llm_pool_cooldown_seconds
+    )
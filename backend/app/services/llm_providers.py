@@ -0,0 +1,230 @@
+"""
+Chat model providers
+
+Builds the LangChain chat model used by LangChainService. Besides OpenAI,
+a deterministic fake model is available for offline load testing.
+"""
+
+from typing import Any, Iterator, AsyncIterator, List, Optional, Tuple
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+import asyncio
+import hashlib
+import random
+import time
+import logging
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_FAKE_VOCABULARY = (
+    "the", "a", "model", "answer", "is", "that", "you", "can", "use", "this",
+    "to", "and", "of", "in", "response", "data", "example", "chat", "with",
+    "for", "it", "simple", "step", "then", "result", "when", "each", "value",
+    "request", "system", "works", "because", "here", "we", "should", "note",
+)
+
+
+class FakeLLMRateLimitError(Exception):
+    """Injected upstream rate limit (message mirrors OpenAI's 429 errors)"""
+    status_code = 429
+
+
+class FakeLLMTimeoutError(TimeoutError):
+    """Injected upstream timeout"""
+
+
+class FakeLLMStreamError(RuntimeError):
+    """Injected failure part-way through a stream"""
+
+
+class FakeStreamingChatModel(BaseChatModel):
+    """
+    Deterministic local chat model with latency and failure knobs.
+
+    Responses are derived from a hash of the prompt, so the same prompt
+    always yields the same tokens. Timing follows time_to_first_token_ms
+    and inter_token_ms; response length is drawn from a normal
+    distribution. Error injection rates are probabilities per call.
+    """
+
+    time_to_first_token_ms: float = 300.0
+    inter_token_ms: float = 20.0
+    response_tokens_mean: int = 150
+    response_tokens_stddev: int = 50
+    response_tokens_max: int = 1000
+    rate_limit_error_rate: float = 0.0
+    timeout_error_rate: float = 0.0
+    mid_stream_error_rate: float = 0.0
+    timeout_ms: float = 10000.0
+    seed: int = 0
+
+    _error_rng: random.Random = PrivateAttr()
+
+    def model_post_init(self, __context: Any) -> None:
+        self._error_rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming"
+
+    def _plan(self, messages: List[BaseMessage]) -> Tuple[List[str], Optional[str], int]:
+        """
+        Decide the tokens and any injected failure for one call.
+
+        Returns:
+            (tokens, failure kind or None, index of the token to fail at)
+        """
+        prompt = "\n".join(f"{m.type}:{m.content}" for m in messages)
+        digest = hashlib.sha256(f"{self.seed}:{prompt}".encode("utf-8")).digest()
+        rng = random.Random(digest)
+
+        length = int(rng.gauss(self.response_tokens_mean, self.response_tokens_stddev))
+        length = max(1, min(length, self.response_tokens_max))
+        words = [rng.choice(_FAKE_VOCABULARY) for _ in range(length)]
+        tokens = [words[0]] + [f" {word}" for word in words[1:]]
+
+        roll = self._error_rng.random()
+        if roll < self.rate_limit_error_rate:
+            return tokens, "rate_limit", 0
+        roll -= self.rate_limit_error_rate
+        if roll < self.timeout_error_rate:
+            return tokens, "timeout", 0
+        roll -= self.timeout_error_rate
+        if roll < self.mid_stream_error_rate:
+            return tokens, "mid_stream", self._error_rng.randrange(len(tokens))
+        return tokens, None, len(tokens)
+
+    def _failure(self, kind: str) -> Exception:
+        if kind == "rate_limit":
+            return FakeLLMRateLimitError("Error code: 429 - rate_limit_exceeded (injected by fake LLM)")
+        if kind == "timeout":
+            return FakeLLMTimeoutError("Request timed out (injected by fake LLM)")
+        return FakeLLMStreamError("Stream interrupted (injected by fake LLM)")
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        tokens, failure, fail_at = self._plan(messages)
+        if failure == "timeout":
+            time.sleep(self.timeout_ms / 1000)
+            raise self._failure(failure)
+        if failure == "rate_limit":
+            raise self._failure(failure)
+
+        time.sleep(self.time_to_first_token_ms / 1000)
+        for index, token in enumerate(tokens):
+            if index == fail_at and failure:
+                raise self._failure(failure)
+            if index:
+                time.sleep(self.inter_token_ms / 1000)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        tokens, failure, fail_at = self._plan(messages)
+        if failure == "timeout":
+            await asyncio.sleep(self.timeout_ms / 1000)
+            raise self._failure(failure)
+        if failure == "rate_limit":
+            raise self._failure(failure)
+
+        await asyncio.sleep(self.time_to_first_token_ms / 1000)
+        for index, token in enumerate(tokens):
+            if index == fail_at and failure:
+                raise self._failure(failure)
+            if index:
+                await asyncio.sleep(self.inter_token_ms / 1000)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        content = "".join(chunk.message.content for chunk in self._stream(messages, stop, run_manager))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        chunks = [chunk.message.content async for chunk in self._astream(messages, stop, run_manager)]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(chunks)))])
+
+
+def create_chat_model(provider: Optional[str] = None, **overrides: Any) -> BaseChatModel:
+    """
+    Build the chat model for a provider.
+
+    Args:
+        provider: "openai" or "fake" (defaults to settings.llm_provider)
+        **overrides: Constructor arguments that replace the settings defaults
+
+    Returns:
+        LangChain chat model
+
+    Raises:
+        ValueError: If the provider is unknown, or OpenAI has no API key
+    """
+    provider = (provider or settings.llm_provider).lower()
+
+    if provider == "openai":
+        from langchain_openai import ChatOpenAI
+
+        options = {
+            "api_key": settings.openai_api_key,
+            "model": settings.openai_model,
+            "temperature": settings.openai_temperature,
+            "max_tokens": settings.openai_max_tokens,
+            "streaming": True,
+        }
+        options.update(overrides)
+        if not options["api_key"]:
+            raise ValueError("OpenAI provider requires an API key (OPENAI_API_KEY or the deployment's api_key)")
+        return ChatOpenAI(**options)
+
+    if provider == "fake":
+        options = {
+            "time_to_first_token_ms": settings.fake_llm_ttft_ms,
+            "inter_token_ms": settings.fake_llm_inter_token_ms,
+            "response_tokens_mean": settings.fake_llm_response_tokens_mean,
+            "response_tokens_stddev": settings.fake_llm_response_tokens_stddev,
+            "response_tokens_max": settings.openai_max_tokens,
+            "rate_limit_error_rate": settings.fake_llm_rate_limit_error_rate,
+            "timeout_error_rate": settings.fake_llm_timeout_error_rate,
+            "mid_stream_error_rate": settings.fake_llm_mid_stream_error_rate,
+            "seed": settings.fake_llm_seed,
+        }
+        options.update(overrides)
+        logger.warning("Using fake LLM provider - responses are synthetic")
+        return FakeStreamingChatModel(**options)
+
+    raise ValueError(f"Unknown LLM provider: {provider}")
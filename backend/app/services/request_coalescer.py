@@ -0,0 +1,133 @@
+"""
+Single-flight coalescing for identical in-flight LLM streams
+
+Concurrent requests with the same key share one upstream stream; chunks
+are fanned out to every subscriber through its own queue.
+"""
+
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+class _Failure:
+    """Queue item carrying an upstream error to subscribers"""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class _Flight:
+    """One upstream stream and the subscribers attached to it"""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.chunks: List[str] = []
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.finished = False
+        self.failure: Optional[_Failure] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def publish(self, item) -> None:
+        for queue in self.subscribers:
+            queue.put_nowait(item)
+
+
+class StreamCoalescer:
+    """
+    Share one upstream async stream between identical concurrent requests.
+
+    Each subscriber gets an unbounded queue, so a slow consumer only grows
+    its own backlog and never delays the producer or other subscribers.
+    Subscribers that join after the stream started are first replayed the
+    chunks already produced. The upstream stream is cancelled once every
+    subscriber has gone away.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.started = 0
+        self.joined = 0
+
+    def in_flight(self) -> int:
+        """Number of upstream streams currently running"""
+        return len(self._flights)
+
+    async def stream(
+        self,
+        key: str,
+        factory: Callable[[], AsyncIterator[str]]
+    ) -> AsyncIterator[str]:
+        """
+        Subscribe to the stream for `key`, starting it if needed.
+
+        Args:
+            key: Identity of the request (e.g. hash of the assembled prompt)
+            factory: Zero-argument callable returning the upstream iterator;
+                only called when no stream for `key` is in flight
+
+        Yields:
+            Chunks produced by the shared upstream stream
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(key)
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(self._produce(flight, factory))
+            self.started += 1
+        else:
+            self.joined += 1
+            logger.info(f"Coalesced request onto in-flight stream ({len(flight.subscribers)} subscribers)")
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for chunk in flight.chunks:
+            queue.put_nowait(chunk)
+        if flight.failure is not None:
+            queue.put_nowait(flight.failure)
+        elif flight.finished:
+            queue.put_nowait(_END)
+        flight.subscribers.add(queue)
+
+        try:
+            while True:
+                item = await queue.get()
+                if item is _END:
+                    return
+                if isinstance(item, _Failure):
+                    raise item.error
+                yield item
+        finally:
+            flight.subscribers.discard(queue)
+            if not flight.subscribers and not flight.finished and flight.task is not None:
+                # Identical requests from now on start a new stream rather
+                # than join this one while it is being cancelled
+                if self._flights.get(flight.key) is flight:
+                    del self._flights[flight.key]
+                flight.task.cancel()
+
+    async def _produce(
+        self,
+        flight: _Flight,
+        factory: Callable[[], AsyncIterator[str]]
+    ) -> None:
+        try:
+            async for chunk in factory():
+                flight.chunks.append(chunk)
+                flight.publish(chunk)
+            flight.finished = True
+            flight.publish(_END)
+        except asyncio.CancelledError:
+            flight.failure = _Failure(asyncio.CancelledError())
+            flight.publish(flight.failure)
+            raise
+        except Exception as e:
+            flight.failure = _Failure(e)
+            flight.publish(flight.failure)
+        finally:
+            flight.finished = True
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
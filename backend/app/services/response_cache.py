@@ -0,0 +1,224 @@
+"""
+Response cache for LangChain generations
+
+Caches AI responses keyed on the normalized prompt plus a hash of the
+context window, with optional embedding-similarity lookups.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+import hashlib
+import json
+import math
+import re
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = " .!?"
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Normalize a prompt for cache lookups.
+
+    Case, repeated whitespace and trailing punctuation are ignored so that
+    "Hi!" and "hi" share an entry.
+    """
+    normalized = _WHITESPACE_RE.sub(" ", prompt.casefold()).strip()
+    return normalized.rstrip(_TRAILING_PUNCTUATION) or normalized
+
+
+def hash_context(messages: Sequence[Tuple[str, str]]) -> str:
+    """
+    Hash the context window (everything sent before the current prompt).
+
+    Args:
+        messages: (role, content) tuples in prompt order
+
+    Returns:
+        Hex digest identifying the context window
+    """
+    payload = json.dumps(list(messages), ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _unit_vector(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(v * v for v in vector))
+    if norm == 0:
+        return vector
+    return [v / norm for v in vector]
+
+
+@dataclass
+class CacheEntry:
+    """A cached response"""
+    response: str
+    context_hash: str
+    expires_at: float
+    embedding: Optional[List[float]] = None
+
+
+@dataclass
+class CacheStats:
+    """Hit/miss counters for the response cache"""
+    hits: int = 0
+    semantic_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class ResponseCache:
+    """
+    In-process LRU/TTL cache of AI responses.
+
+    Entries are keyed on (context hash, normalized prompt). When an
+    embeddings model is supplied, misses on the exact key fall back to a
+    cosine-similarity search over entries that share the same context hash.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl_seconds: float = 3600,
+        embeddings=None,
+        similarity_threshold: float = 0.95
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[Tuple[str, str], CacheEntry]" = OrderedDict()
+        self._by_context: Dict[str, Set[Tuple[str, str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, prompt: str, context_hash: str) -> Optional[str]:
+        """
+        Look up a cached response.
+
+        Args:
+            prompt: The user's prompt (normalized internally)
+            context_hash: Hash of the context window, see hash_context()
+
+        Returns:
+            Cached response text, or None on a miss
+        """
+        key = (context_hash, normalize_prompt(prompt))
+        entry = self._entries.get(key)
+
+        if entry is not None and self._expired(key, entry):
+            entry = None
+
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return entry.response
+
+        if self.embeddings is not None and self._by_context.get(context_hash):
+            response = await self._semantic_get(key[1], context_hash)
+            if response is not None:
+                self.stats.semantic_hits += 1
+                return response
+
+        self.stats.misses += 1
+        return None
+
+    async def set(self, prompt: str, context_hash: str, response: str) -> None:
+        """
+        Store a response in the cache.
+
+        Args:
+            prompt: The user's prompt (normalized internally)
+            context_hash: Hash of the context window, see hash_context()
+            response: Full AI response text
+        """
+        key = (context_hash, normalize_prompt(prompt))
+
+        embedding = None
+        if self.embeddings is not None:
+            embedding = await self._embed(key[1])
+
+        self._entries[key] = CacheEntry(
+            response=response,
+            context_hash=context_hash,
+            expires_at=time.monotonic() + self.ttl_seconds,
+            embedding=embedding
+        )
+        self._entries.move_to_end(key)
+        self._by_context.setdefault(context_hash, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            old_key, _ = self._entries.popitem(last=False)
+            self._forget(old_key)
+            self.stats.evictions += 1
+
+    def clear(self) -> None:
+        """Drop all cached entries"""
+        self._entries.clear()
+        self._by_context.clear()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Return counters plus the current number of entries"""
+        stats = self.stats.as_dict()
+        stats["size"] = len(self._entries)
+        return stats
+
+    def _expired(self, key: Tuple[str, str], entry: CacheEntry) -> bool:
+        if entry.expires_at > time.monotonic():
+            return False
+        del self._entries[key]
+        self._forget(key)
+        self.stats.expirations += 1
+        return True
+
+    def _forget(self, key: Tuple[str, str]) -> None:
+        keys = self._by_context.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_context[key[0]]
+
+    async def _embed(self, text: str) -> Optional[List[float]]:
+        try:
+            return _unit_vector(await self.embeddings.aembed_query(text))
+        except Exception as e:
+            logger.warning(f"Response cache embedding failed, using exact match only: {e}")
+            return None
+
+    async def _semantic_get(self, prompt: str, context_hash: str) -> Optional[str]:
+        query = await self._embed(prompt)
+        if query is None:
+            return None
+
+        best_key = None
+        best_score = self.similarity_threshold
+        for key in list(self._by_context.get(context_hash, ())):
+            entry = self._entries[key]
+            if self._expired(key, entry) or entry.embedding is None:
+                continue
+            score = sum(a * b for a, b in zip(query, entry.embedding))
+            if score >= best_score:
+                best_key, best_score = key, score
+
+        if best_key is None:
+            return None
+
+        self._entries.move_to_end(best_key)
+        logger.debug(f"Semantic cache hit (score: {best_score:.3f})")
+        return self._entries[best_key].response
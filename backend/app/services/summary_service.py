@@ -0,0 +1,150 @@
+"""
+Rolling conversation summaries
+
+Folds older turns of a chat session into ChatSession.summary in the
+background, so prompts stay a constant size as sessions grow.
+"""
+
+from typing import Set
+from sqlalchemy import select, update, func
+import asyncio
+import logging
+
+from app.config import settings
+from app.database.session import AsyncSessionLocal
+from app.models.chat_session import ChatSession
+from app.models.message import Message, MessageRole, MessageStatus, message_content
+from app.services import chat_service
+from app.services.admission import get_admission_controller
+from app.services.conversation_cache import get_conversation_cache
+from app.services.langchain_service import get_langchain_service
+
+logger = logging.getLogger(__name__)
+
+# Sessions with a summary update running on this worker
+_in_progress: Set[int] = set()
+# Strong references so background tasks are not garbage collected mid-run
+_tasks: Set[asyncio.Task] = set()
+
+
+def schedule_summary_update(session_id: int) -> None:
+    """
+    Update the session summary in the background if enough new messages
+    have accumulated. Safe to call after every turn.
+    
+    Args:
+        session_id: ID of the chat session
+    """
+    if not settings.summary_enabled or session_id in _in_progress:
+        return
+    
+    _in_progress.add(session_id)
+    task = asyncio.create_task(_run_summary_update(session_id))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def _run_summary_update(session_id: int) -> None:
+    try:
+        await update_session_summary(session_id)
+    except Exception as e:
+        logger.error(f"Failed to update summary for session {session_id}: {e}", exc_info=True)
+    finally:
+        _in_progress.discard(session_id)
+
+
+async def update_session_summary(
+    session_id: int,
+    session_factory=AsyncSessionLocal
+) -> bool:
+    """
+    Fold unsummarized messages into the session summary.
+    
+    Runs once at least settings.summary_interval_messages messages beyond
+    the settings.summary_keep_recent_messages most recent ones are not yet
+    summarized. The most recent messages always stay raw, and the fold
+    stops before any response still being streamed.
+    
+    No database connection is held during the LLM call, which waits for an
+    admission slot like any other request from the session's user. The
+    result is written only if no other worker moved the summary boundary
+    in the meantime.
+    
+    Args:
+        session_id: ID of the chat session
+        session_factory: Creates the short-lived database sessions
+    
+    Returns:
+        True if the summary was updated
+    """
+    # Let this turn's queued writes land before counting messages
+    await chat_service.wait_for_writes(session_id)
+    async with session_factory() as db:
+        session = await db.get(ChatSession, session_id)
+        if session is None:
+            return False
+        user_id = session.user_id
+        summary = session.summary
+        boundary = session.summary_message_id
+        
+        unsummarized = select(Message.id).where(Message.session_id == session_id)
+        if boundary is not None:
+            unsummarized = unsummarized.where(Message.id > boundary)
+        
+        finished = unsummarized.where(Message.status != MessageStatus.STREAMING.value)
+        pending = (
+            await db.execute(select(func.count()).select_from(finished.subquery()))
+        ).scalar_one()
+        keep_recent = settings.summary_keep_recent_messages
+        if pending < settings.summary_interval_messages + keep_recent:
+            return False
+        
+        query = (
+            select(
+                Message.id,
+                Message.role,
+                Message.content_plain.label("content"),
+                Message.content_zstd,
+                Message.status
+            )
+            .where(Message.id.in_(unsummarized.scalar_subquery()))
+            .order_by(Message.id)
+            .limit(pending - keep_recent)
+        )
+        rows = (await db.execute(query)).all()
+        # Release the connection before the LLM call
+        await db.commit()
+    
+    # Stop at a response still being written: the boundary must not pass it
+    # before its final content is stored
+    for index, row in enumerate(rows):
+        if row.status == MessageStatus.STREAMING.value:
+            rows = rows[:index]
+            break
+    if not rows:
+        return False
+    
+    history = [{"role": MessageRole(row.role).value, "content": message_content(row)} for row in rows]
+    last_message_id = rows[-1].id
+    async with get_admission_controller().slot(user_id):
+        new_summary = await get_langchain_service().summarize(summary, history)
+    
+    async with session_factory() as db:
+        # Compare-and-set: only apply if the boundary has not moved
+        result = await db.execute(
+            update(ChatSession)
+            .where(
+                ChatSession.id == session_id,
+                ChatSession.summary_message_id.is_not_distinct_from(boundary)
+            )
+            .values(summary=new_summary, summary_message_id=last_message_id)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+    
+    if result.rowcount:
+        cache = get_conversation_cache()
+        if cache is not None:
+            cache.update_summary(session_id, new_summary, last_message_id)
+        logger.info(f"Folded {len(rows)} messages into summary for session {session_id}")
+    return bool(result.rowcount)
@@ -0,0 +1,286 @@
+"""
+Write-behind persistence for chat turns
+
+Message inserts, content checkpoints, final message updates and session
+timestamp bumps from every session on this worker are gathered for a few
+milliseconds and written in batched statements with one commit:
+
+- inserts: one multi-row INSERT ... RETURNING (callers await the new IDs)
+- checkpoints and final updates: one executemany UPDATE each
+- session timestamps: one UPDATE ... WHERE id IN (...)
+
+Callers that do not need a result (final updates, timestamps) need not
+wait. Reads of a session call wait_for(session_id) first, so a session
+always sees its own writes.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+from sqlalchemy import bindparam, func, insert, update
+import asyncio
+import logging
+
+from app.config import settings
+from app.database.session import AsyncSessionLocal
+from app.models.chat_session import ChatSession
+from app.models.message import Message, MessageRole, content_values
+
+logger = logging.getLogger(__name__)
+
+_messages = Message.__table__
+_sessions = ChatSession.__table__
+
+# Applied in this order within a batch (a message's checkpoints before its
+# final content); inserts come first as other writes need their IDs
+_INSERT, _APPEND, _FINISH, _TOUCH = "insert", "append", "finish", "touch"
+
+_APPEND_STATEMENT = (
+    update(_messages)
+    .where(_messages.c.id == bindparam("b_id"))
+    .values(content=_messages.c.content + bindparam("b_delta"))
+)
+_FINISH_STATEMENT = (
+    update(_messages)
+    .where(_messages.c.id == bindparam("b_id"))
+    .values(
+        content=bindparam("b_content"),
+        content_zstd=bindparam("b_content_zstd"),
+        token_count=bindparam("b_token_count"),
+        status=bindparam("b_status")
+    )
+)
+
+
+class WriteBehindClosedError(RuntimeError):
+    """The queue has shut down and accepts no more writes"""
+
+
+@dataclass
+class _Write:
+    kind: str
+    session_id: int
+    params: Dict[str, Any]
+    future: asyncio.Future = field(repr=False)
+
+
+class WriteBehindQueue:
+    """
+    Batches chat writes across sessions.
+
+    At most `max_pending` writes may be queued or in flight; further
+    writers wait (backpressure). A batch that fails is retried one write
+    at a time so a single bad row does not fail the others.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = 0.005,
+        max_batch: int = 500,
+        max_pending: int = 10000,
+        session_factory=AsyncSessionLocal
+    ):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.session_factory = session_factory
+        self._writes: List[_Write] = []
+        self._space = asyncio.Semaphore(max_pending)
+        self._wakeup = asyncio.Event()
+        self._by_session: Dict[int, Set[asyncio.Future]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self.flushes = 0
+        self.written = 0
+        self.failed = 0
+
+    async def insert_message(
+        self,
+        session_id: int,
+        role: str,
+        content: str,
+        token_count: Optional[int],
+        status: str
+    ) -> Message:
+        """
+        Insert a message and wait for its batch to commit.
+
+        Returns:
+            A detached Message with its ID and created_at set
+        """
+        params = {
+            "session_id": session_id,
+            "role": MessageRole(role),
+            "token_count": token_count,
+            "status": status,
+        }
+        message_id, created_at = await (await self._enqueue(
+            _INSERT, session_id, {**params, **content_values(content)}
+        ))
+        return Message(id=message_id, created_at=created_at, content=content, **params)
+
+    async def append_content(self, session_id: int, message_id: int, delta: str) -> asyncio.Future:
+        """Queue a content checkpoint; the returned future resolves on commit"""
+        return self._track(await self._enqueue(_APPEND, session_id, {"b_id": message_id, "b_delta": delta}))
+
+    async def finish_message(
+        self,
+        session_id: int,
+        message_id: int,
+        content: str,
+        token_count: Optional[int],
+        status: str
+    ) -> asyncio.Future:
+        """Queue a message's final content and status"""
+        return self._track(await self._enqueue(_FINISH, session_id, {
+            "b_id": message_id,
+            **{f"b_{name}": value for name, value in content_values(content).items()},
+            "b_token_count": token_count,
+            "b_status": status,
+        }))
+
+    async def touch_session(self, session_id: int) -> asyncio.Future:
+        """Queue an updated_at bump for a session"""
+        return self._track(await self._enqueue(_TOUCH, session_id, {}))
+
+    async def wait_for(self, session_id: Optional[int] = None) -> None:
+        """Wait until queued writes of a session (or of all sessions) are committed"""
+        if session_id is None:
+            pending = [f for futures in self._by_session.values() for f in futures]
+        else:
+            pending = list(self._by_session.get(session_id, ()))
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def close(self) -> None:
+        """Flush everything queued, then stop accepting writes"""
+        self._closed = True
+        await self.wait_for()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        logger.info(f"Write-behind queue closed after {self.written} writes in {self.flushes} flushes")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": len(self._writes),
+            "pending": sum(len(f) for f in self._by_session.values()),
+            "flushes": self.flushes,
+            "written": self.written,
+            "failed": self.failed,
+        }
+
+    def _track(self, future: asyncio.Future) -> asyncio.Future:
+        # Failures are logged by the flusher; don't warn if nobody awaits
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        return future
+
+    async def _enqueue(self, kind: str, session_id: int, params: Dict[str, Any]) -> asyncio.Future:
+        """Queue a write, waiting for room if the queue is full; returns its future"""
+        if self._closed:
+            raise WriteBehindClosedError("Write-behind queue is closed")
+        await self._space.acquire()
+
+        future = asyncio.get_running_loop().create_future()
+        self._writes.append(_Write(kind, session_id, params, future))
+        session_futures = self._by_session.setdefault(session_id, set())
+        session_futures.add(future)
+
+        def done(_):
+            self._space.release()
+            session_futures.discard(future)
+            if not session_futures and self._by_session.get(session_id) is session_futures:
+                del self._by_session[session_id]
+        future.add_done_callback(done)
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+        return future
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            if len(self._writes) < self.max_batch and not self._closed:
+                # Let writes from other sessions gather
+                await asyncio.sleep(self.flush_interval)
+            batch, self._writes = self._writes[:self.max_batch], self._writes[self.max_batch:]
+            if not self._writes:
+                self._wakeup.clear()
+            if batch:
+                await self._flush(batch)
+
+    async def _flush(self, batch: List[_Write]) -> None:
+        try:
+            results = await self._write(batch)
+        except Exception as e:
+            if len(batch) > 1:
+                logger.warning(f"Write-behind batch of {len(batch)} failed ({e}); retrying individually")
+                for write in batch:
+                    await self._flush([write])
+                return
+            self.failed += 1
+            logger.error(f"Write-behind {batch[0].kind} for session {batch[0].session_id} failed: {e}")
+            if not batch[0].future.done():
+                batch[0].future.set_exception(e)
+            return
+
+        self.flushes += 1
+        self.written += len(batch)
+        for write, result in zip(batch, results):
+            if not write.future.done():
+                write.future.set_result(result)
+
+    async def _write(self, batch: List[_Write]) -> List[Any]:
+        """Apply a batch in one transaction; returns a result per write"""
+        by_kind: Dict[str, List[_Write]] = {_INSERT: [], _APPEND: [], _FINISH: [], _TOUCH: []}
+        for write in batch:
+            by_kind[write.kind].append(write)
+
+        results: Dict[int, Any] = {}
+        async with self.session_factory() as db:
+            try:
+                inserts = by_kind[_INSERT]
+                if inserts:
+                    rows = (await db.execute(
+                        insert(_messages).returning(
+                            _messages.c.id, _messages.c.created_at, sort_by_parameter_order=True
+                        ),
+                        [write.params for write in inserts]
+                    )).all()
+                    for write, row in zip(inserts, rows):
+                        results[id(write)] = (row.id, row.created_at)
+
+                if by_kind[_APPEND]:
+                    await db.execute(_APPEND_STATEMENT, [write.params for write in by_kind[_APPEND]])
+                if by_kind[_FINISH]:
+                    await db.execute(_FINISH_STATEMENT, [write.params for write in by_kind[_FINISH]])
+                if by_kind[_TOUCH]:
+                    await db.execute(
+                        update(_sessions)
+                        .where(_sessions.c.id.in_({write.session_id for write in by_kind[_TOUCH]}))
+                        .values(updated_at=func.now())
+                    )
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+
+        return [results.get(id(write)) for write in batch]
+
+
+# Singleton instance
+_write_behind = None
+
+
+def get_write_behind() -> Optional[WriteBehindQueue]:
+    """Get the write-behind queue, or None if disabled"""
+    global _write_behind
+    if not settings.write_behind_enabled:
+        return None
+    if _write_behind is None:
+        _write_behind = WriteBehindQueue(
+            flush_interval=settings.write_behind_flush_ms / 1000,
+            max_batch=settings.write_behind_max_batch,
+            max_pending=settings.write_behind_max_pending
+        )
+    return _write_behind
@@ -0,0 +1,127 @@
+"""
+Regression benchmark: database statements per REST chat turn
+
+Sends chat turns through POST /api/chat/sessions/{id}/messages in-process
+and counts the SQL statements and commits each one issues. A turn should
+cost three statements (authentication, begin_turn, finish_turn) and two
+commits. Exits non-zero if any turn exceeds --max-queries, so it can gate
+CI.
+
+The fused turn statements need PostgreSQL; point DATABASE_URL at a
+scratch database (tables are created if missing):
+
+    cd backend
+    python scripts/bench_chat_turn_queries.py --turns 50
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("DEBUG", "false")
+# Background summaries would be counted against the turn
+os.environ.setdefault("SUMMARY_ENABLED", "false")
+
+import httpx
+from sqlalchemy import event
+
+from app.auth.jwt_handler import create_access_token
+from app.database.base import Base
+from app.database.session import AsyncSessionLocal, engine
+from app.main import app
+from app.models.chat_session import ChatSession
+from app.models.user import User
+
+
+async def create_fixture() -> tuple:
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        name = f"bench-{uuid.uuid4().hex[:12]}"
+        user = User(username=name, email=f"{name}@example.com", hashed_password="!", session_count=1)
+        db.add(user)
+        await db.flush()
+        session = ChatSession(user_id=user.id, title="Chat turn query benchmark")
+        db.add(session)
+        await db.commit()
+        return user.id, session.id
+
+
+class Counter:
+    """Statements and commits on the primary engine"""
+
+    def __init__(self):
+        self.statements = 0
+        self.commits = 0
+        self.log = []
+        event.listen(engine.sync_engine, "before_cursor_execute", self._statement)
+        event.listen(engine.sync_engine, "commit", self._commit)
+
+    def _statement(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements += 1
+        self.log.append(" ".join(statement.split())[:100])
+
+    def _commit(self, conn):
+        self.commits += 1
+
+    def reset(self) -> None:
+        self.statements = self.commits = 0
+        self.log = []
+
+
+async def main(args: argparse.Namespace) -> int:
+    user_id, session_id = await create_fixture()
+    token = create_access_token({"sub": str(user_id), "user_id": user_id})
+    print(f"Database: {engine.dialect.name}")
+    if engine.dialect.name != "postgresql":
+        print("  note: not PostgreSQL, so turns use the unfused multi-statement path")
+
+    counter = Counter()
+    statements, commits, latencies = [], [], []
+    worst_log = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        headers = {"Authorization": f"Bearer {token}"}
+        for turn in range(args.turns):
+            counter.reset()
+            t0 = time.monotonic()
+            response = await client.post(
+                f"/api/chat/sessions/{session_id}/messages",
+                json={"content": f"Benchmark turn {turn}"},
+                headers=headers
+            )
+            latencies.append((time.monotonic() - t0) * 1000)
+            response.raise_for_status()
+            statements.append(counter.statements)
+            commits.append(counter.commits)
+            if counter.statements >= max(statements):
+                worst_log = list(counter.log)
+
+    print(
+        f"{args.turns} turns: statements per turn min {min(statements)} / max {max(statements)}, "
+        f"commits per turn max {max(commits)}, "
+        f"latency p50 {statistics.median(latencies):.1f} ms (fake LLM)"
+    )
+    await engine.dispose()
+
+    if max(statements) > args.max_queries:
+        print(f"FAIL: expected at most {args.max_queries} statements per turn; worst turn ran:")
+        for statement in worst_log:
+            print(f"  {statement}")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--max-queries", type=int, default=3,
+                        help="Statements a turn may issue, including authentication")
+    sys.exit(asyncio.run(main(parser.parse_args())))
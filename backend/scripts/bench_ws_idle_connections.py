@@ -0,0 +1,142 @@
+"""
+Regression benchmark: idle WebSockets must not pin database connections
+
+Starts the API in-process, opens N idle chat WebSockets against one chat
+session and reports how many pooled database connections are checked out
+while they sit idle, plus REST latency under that load. Exits non-zero if
+more than --max-connections are held, so it can gate CI.
+
+Point DATABASE_URL at a scratch database (tables are created if missing):
+
+    cd backend
+    LLM_PROVIDER=fake python scripts/bench_ws_idle_connections.py --sockets 1000
+    python scripts/bench_ws_idle_connections.py --endpoint multiplexed
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("DEBUG", "false")
+
+import httpx
+import uvicorn
+import websockets
+
+from app.auth.jwt_handler import create_access_token
+from app.database.base import Base
+from app.database.session import AsyncSessionLocal, engine
+from app.main import app
+from app.models.chat_session import ChatSession
+from app.models.user import User
+
+
+def raise_fd_limit(needed: int) -> None:
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(needed, hard), hard))
+
+
+async def create_fixture() -> tuple:
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        name = f"bench-{uuid.uuid4().hex[:12]}"
+        user = User(username=name, email=f"{name}@example.com", hashed_password="!")
+        db.add(user)
+        await db.flush()
+        session = ChatSession(user_id=user.id, title="WebSocket idle benchmark")
+        db.add(session)
+        await db.commit()
+        return user.id, session.id
+
+
+def checked_out() -> int:
+    pool = engine.pool
+    return pool.checkedout() if hasattr(pool, "checkedout") else 0
+
+
+async def main(args: argparse.Namespace) -> int:
+    raise_fd_limit(args.sockets * 2 + 256)
+    user_id, session_id = await create_fixture()
+    token = create_access_token({"sub": str(user_id), "user_id": user_id})
+
+    server = uvicorn.Server(uvicorn.Config(
+        app, host="127.0.0.1", port=args.port, log_level="warning"
+    ))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    if args.endpoint == "multiplexed":
+        url = f"ws://127.0.0.1:{args.port}/api/chat/ws?token={token}"
+    else:
+        url = f"ws://127.0.0.1:{args.port}/api/chat/ws/{session_id}?token={token}"
+
+    handshakes = asyncio.Semaphore(args.handshake_concurrency)
+    sockets = []
+
+    async def connect() -> None:
+        async with handshakes:
+            sockets.append(await websockets.connect(url, open_timeout=60))
+
+    started = time.monotonic()
+    results = await asyncio.gather(*[connect() for _ in range(args.sockets)], return_exceptions=True)
+    failures = [r for r in results if isinstance(r, Exception)]
+    print(f"Opened {len(sockets)}/{args.sockets} sockets in {time.monotonic() - started:.1f}s")
+    if failures:
+        print(f"  {len(failures)} failed, e.g. {failures[0]!r}")
+
+    # Let handshakes finish their database work, then sample while idle
+    await asyncio.sleep(args.settle)
+    samples = []
+    for _ in range(10):
+        samples.append(checked_out())
+        await asyncio.sleep(args.settle / 10)
+    held = max(samples)
+    print(f"Pool connections checked out while idle: max {held} (pool: {engine.pool.status()})")
+
+    # REST must not be starved by the idle sockets
+    latencies = []
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=60) as client:
+        headers = {"Authorization": f"Bearer {token}"}
+        for _ in range(args.rest_requests):
+            t0 = time.monotonic()
+            response = await client.get(f"/api/chat/sessions/{session_id}", headers=headers)
+            latencies.append((time.monotonic() - t0) * 1000)
+            response.raise_for_status()
+    print(
+        f"REST GET /api/chat/sessions/{{id}} with {len(sockets)} idle sockets: "
+        f"p50 {statistics.median(latencies):.1f} ms, max {max(latencies):.1f} ms"
+    )
+
+    await asyncio.gather(*[ws.close() for ws in sockets], return_exceptions=True)
+    server.should_exit = True
+    await server_task
+    await engine.dispose()
+
+    if failures or held > args.max_connections:
+        print(f"FAIL: expected at most {args.max_connections} connections and no failed sockets")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sockets", type=int, default=1000)
+    parser.add_argument("--endpoint", choices=["session", "multiplexed"], default="session")
+    parser.add_argument("--max-connections", type=int, default=1,
+                        help="Connections idle sockets may hold in total")
+    parser.add_argument("--handshake-concurrency", type=int, default=100)
+    parser.add_argument("--settle", type=float, default=2.0, help="Seconds to wait before sampling")
+    parser.add_argument("--rest-requests", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8765)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,57 @@
+"""
+Maintenance: train a content dictionary and compress existing messages
+
+Migration 011 does this once when it runs with CONTENT_COMPRESSION_ENABLED;
+run this afterwards to retrain on newer chat history or to compress rows
+written while compression was off. Running workers fetch a new
+dictionary the first time they read a row compressed with it.
+
+    cd backend
+    CONTENT_COMPRESSION_ENABLED=true python scripts/compress_message_content.py --train
+    CONTENT_COMPRESSION_ENABLED=true python scripts/compress_message_content.py --backfill
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.config import settings
+from app.database.session import engine
+from app.services import content_compression
+
+
+async def main(args: argparse.Namespace) -> int:
+    if not settings.content_compression_enabled:
+        print("CONTENT_COMPRESSION_ENABLED is false; nothing would be compressed")
+        return 1
+
+    async with engine.connect() as connection:
+        await connection.run_sync(content_compression.load_dictionaries)
+        if args.train:
+            dict_id = await connection.run_sync(
+                content_compression.train_dictionary,
+                dict_size=args.dict_size,
+                max_samples=args.max_samples
+            )
+            await connection.commit()
+            print(f"Trained dictionary {dict_id}" if dict_id else "Too few messages to train a dictionary")
+        if args.backfill:
+            compressed = await connection.run_sync(
+                content_compression.backfill, batch_size=args.batch_size, commit=True
+            )
+            print(f"Compressed {compressed} messages")
+    await engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--train", action="store_true", help="Train and store a new dictionary")
+    parser.add_argument("--backfill", action="store_true", help="Compress messages over the threshold")
+    parser.add_argument("--dict-size", type=int, default=64 * 1024)
+    parser.add_argument("--max-samples", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    sys.exit(asyncio.run(main(parser.parse_args())))
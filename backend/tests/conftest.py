@@ -0,0 +1,12 @@
+"""
+Test settings
+
+The components under test are pure asyncio; settings only need to load,
+so they point at a throwaway SQLite database and the fake LLM provider.
+"""
+
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ["LLM_PROVIDER"] = "fake"
@@ -0,0 +1,27 @@
+"""Helpers for driving components with the fake LLM provider"""
+
+from typing import AsyncIterator, Callable
+
+from app.services.llm_providers import FakeStreamingChatModel
+
+
+def fake_model(ttft_ms: float = 0.0, inter_token_ms: float = 0.0, tokens: int = 8, **options) -> FakeStreamingChatModel:
+    """Fake chat model producing exactly `tokens` tokens per response"""
+    return FakeStreamingChatModel(
+        time_to_first_token_ms=ttft_ms,
+        inter_token_ms=inter_token_ms,
+        response_tokens_mean=tokens,
+        response_tokens_stddev=0,
+        response_tokens_max=tokens,
+        **options
+    )
+
+
+def fake_stream(model: FakeStreamingChatModel, prompt: str = "hello") -> Callable[[], AsyncIterator[str]]:
+    """Zero-argument factory streaming the model's response text to `prompt`"""
+
+    async def stream() -> AsyncIterator[str]:
+        async for chunk in model.astream(prompt):
+            if chunk.content:
+                yield chunk.content
+    return stream
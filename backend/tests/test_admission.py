@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from app.services.admission import AdmissionController, AdmissionQueueFullError, AdmissionTimeoutError
+
+
+async def _run_queued(controller, requests):
+    """
+    Hold the only slot for user 1, queue `requests` (user IDs) in order,
+    then release it; returns the order in which the queued requests ran.
+    """
+    order = []
+    holding = asyncio.Event()
+    release = asyncio.Event()
+
+    async def hold():
+        async with controller.slot(1):
+            holding.set()
+            await release.wait()
+
+    async def request(user_id):
+        async with controller.slot(user_id):
+            order.append(user_id)
+            await asyncio.sleep(0)
+
+    holder = asyncio.ensure_future(hold())
+    await holding.wait()
+    tasks = []
+    for user_id in requests:
+        tasks.append(asyncio.ensure_future(request(user_id)))
+        await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(holder, *tasks)
+    return order
+
+
+def test_users_alternate_instead_of_fifo():
+    async def main():
+        controller = AdmissionController(max_concurrency=1)
+        order = await _run_queued(controller, [1, 1, 1, 2, 2, 2])
+
+        # User 1 already holds a slot, so user 2 goes first
+        assert order == [2, 1, 2, 1, 2, 1]
+        assert controller.stats()["active"] == 0
+
+    asyncio.run(main())
+
+
+def test_weight_gives_larger_share():
+    async def main():
+        controller = AdmissionController(max_concurrency=1)
+        controller.set_weight(2, 2.0)
+        order = await _run_queued(controller, [1, 1, 1, 2, 2, 2, 2])
+
+        assert order[:6].count(2) == 4
+
+    asyncio.run(main())
+
+
+def test_queue_timeout_and_capacity():
+    async def main():
+        controller = AdmissionController(max_concurrency=1, max_queue=1, queue_timeout=0.05)
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.slot(1):
+                await release.wait()
+
+        holder = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(controller.slot(2).__aenter__())
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionQueueFullError):
+            async with controller.slot(3):
+                pass
+        with pytest.raises(AdmissionTimeoutError):
+            await waiter
+
+        release.set()
+        await holder
+        assert controller.stats() == {
+            "max_concurrency": 1,
+            "active": 0,
+            "queued": 0,
+            "admitted": 1,
+            "timed_out": 1,
+            "rejected": 1,
+        }
+
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+import asyncio
+
+from app.services.hedging import HedgingPolicy, StreamMetrics
+from tests.fakes import fake_model, fake_stream
+
+
+async def _collect(chunks):
+    return "".join([chunk async for chunk in chunks])
+
+
+def _policy(deadline: float) -> HedgingPolicy:
+    return HedgingPolicy(min_deadline=deadline, max_deadline=deadline, initial_deadline=deadline)
+
+
+def test_fast_primary_is_not_hedged():
+    async def main():
+        policy = _policy(0.2)
+        primary = fake_stream(fake_model(ttft_ms=10), "primary")
+        hedge_calls = []
+
+        def hedge():
+            hedge_calls.append(1)
+            return fake_stream(fake_model(), "hedge")()
+
+        metrics = StreamMetrics()
+        text = await _collect(policy.stream(primary, hedge, metrics))
+
+        assert text == await _collect(primary())
+        assert not metrics.hedged and not metrics.hedge_won
+        assert hedge_calls == []
+        assert metrics.ttft is not None and metrics.ttft < 0.2
+
+    asyncio.run(main())
+
+
+def test_hedge_wins_when_primary_is_slow():
+    async def main():
+        policy = _policy(0.05)
+        primary = fake_stream(fake_model(ttft_ms=2000), "primary")
+        hedge = fake_stream(fake_model(ttft_ms=10), "hedge")
+
+        metrics = StreamMetrics()
+        text = await asyncio.wait_for(_collect(policy.stream(primary, hedge, metrics)), 1)
+
+        assert text == await _collect(hedge())
+        assert metrics.hedged and metrics.hedge_won
+        assert policy.stats()["hedge_wins"] == 1
+
+    asyncio.run(main())
+
+
+def test_primary_wins_against_slower_hedge():
+    async def main():
+        policy = _policy(0.05)
+        primary = fake_stream(fake_model(ttft_ms=100), "primary")
+        hedge = fake_stream(fake_model(ttft_ms=2000), "hedge")
+
+        metrics = StreamMetrics()
+        text = await asyncio.wait_for(_collect(policy.stream(primary, hedge, metrics)), 1)
+
+        assert text == await _collect(primary())
+        assert metrics.hedged and not metrics.hedge_won
+        assert (policy.hedged, policy.hedge_wins) == (1, 0)
+
+    asyncio.run(main())
+
+
+def test_deadline_follows_ttft_percentile():
+    policy = HedgingPolicy(percentile=90, min_deadline=0.1, max_deadline=5, initial_deadline=2, min_samples=10)
+    assert policy.deadline() == 2
+
+    for ttft in range(1, 11):
+        policy.record(StreamMetrics(ttft=ttft / 10))
+    assert policy.deadline() == 0.9
+
+    policy.record(StreamMetrics(ttft=60))
+    assert policy.deadline() == 1.0
@@ -0,0 +1,56 @@
+import pytest
+
+from app.services import llm_pool
+from app.services.llm_pool import TokenBucket
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(llm_pool.time, "monotonic", clock)
+    return clock
+
+
+def test_consume_and_refill(clock):
+    bucket = TokenBucket(per_minute=600)
+    assert bucket.available() == 600
+
+    bucket.consume(500)
+    assert bucket.available() == 100
+    assert bucket.headroom() == pytest.approx(100 / 600)
+
+    # 10 units per second
+    clock.now += 3
+    assert bucket.available() == pytest.approx(130)
+
+    clock.now += 120
+    assert bucket.available() == 600
+
+
+def test_wait_time(clock):
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.wait_time(10) == 0
+
+    bucket.consume(70)
+    assert bucket.available() == -10
+    assert bucket.wait_time(5) == pytest.approx(15)
+    # Requests larger than the bucket wait for a full bucket, not forever
+    assert bucket.wait_time(1000) == pytest.approx(70)
+
+
+def test_zero_limit_is_unlimited(clock):
+    bucket = TokenBucket(per_minute=0)
+    bucket.consume(10 ** 9)
+
+    assert bucket.unlimited
+    assert bucket.available() == float("inf")
+    assert bucket.headroom() == 1.0
+    assert bucket.wait_time(10 ** 9) == 0
@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from app.services.llm_providers import FakeLLMStreamError
+from app.services.request_coalescer import StreamCoalescer
+from tests.fakes import fake_model, fake_stream
+
+
+class _CountingFactory:
+    """Factory wrapper counting how many upstream streams were started"""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.factory()
+
+
+async def _collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+def test_identical_requests_share_one_stream():
+    async def main():
+        coalescer = StreamCoalescer()
+        factory = _CountingFactory(fake_stream(fake_model(tokens=10, inter_token_ms=5)))
+
+        first = asyncio.ensure_future(_collect(coalescer.stream("key", factory)))
+        await asyncio.sleep(0.02)
+        # Joins mid-stream; gets the chunks produced so far replayed
+        second = asyncio.ensure_future(_collect(coalescer.stream("key", factory)))
+
+        a, b = await asyncio.gather(first, second)
+        assert a == b and len(a) == 10
+        assert factory.calls == 1
+        assert (coalescer.started, coalescer.joined) == (1, 1)
+        assert coalescer.in_flight() == 0
+
+    asyncio.run(main())
+
+
+def test_different_keys_do_not_share():
+    async def main():
+        coalescer = StreamCoalescer()
+        factory = _CountingFactory(fake_stream(fake_model(tokens=3)))
+
+        await asyncio.gather(
+            _collect(coalescer.stream("a", factory)),
+            _collect(coalescer.stream("b", factory))
+        )
+        assert factory.calls == 2
+
+    asyncio.run(main())
+
+
+def test_upstream_cancelled_when_last_subscriber_leaves():
+    async def main():
+        coalescer = StreamCoalescer()
+        factory = _CountingFactory(fake_stream(fake_model(tokens=50, inter_token_ms=10)))
+
+        first = coalescer.stream("key", factory)
+        second = coalescer.stream("key", factory)
+        await first.__anext__()
+        await second.__anext__()
+        flight = coalescer._flights["key"]
+
+        await first.aclose()
+        await asyncio.sleep(0)
+        assert not flight.task.done()
+
+        await second.aclose()
+        await asyncio.wait([flight.task], timeout=1)
+        assert flight.task.cancelled()
+        assert coalescer.in_flight() == 0
+
+    asyncio.run(main())
+
+
+def test_request_after_cancel_starts_fresh_stream():
+    async def main():
+        coalescer = StreamCoalescer()
+        model = fake_model(tokens=5, inter_token_ms=10)
+        factory = _CountingFactory(fake_stream(model))
+        expected = await _collect(fake_stream(model)())
+
+        abandoned = coalescer.stream("key", factory)
+        await abandoned.__anext__()
+        await abandoned.aclose()
+
+        # Must not join the flight that is being cancelled
+        assert await _collect(coalescer.stream("key", factory)) == expected
+        assert factory.calls == 2
+        assert coalescer.joined == 0
+
+    asyncio.run(main())
+
+
+def test_upstream_error_reaches_every_subscriber():
+    async def main():
+        coalescer = StreamCoalescer()
+        factory = _CountingFactory(fake_stream(fake_model(tokens=20, inter_token_ms=1, mid_stream_error_rate=1.0)))
+
+        results = await asyncio.gather(
+            _collect(coalescer.stream("key", factory)),
+            _collect(coalescer.stream("key", factory)),
+            return_exceptions=True
+        )
+        assert all(isinstance(result, FakeLLMStreamError) for result in results)
+        assert factory.calls == 1
+
+        with pytest.raises(FakeLLMStreamError):
+            await _collect(coalescer.stream("key", factory))
+        assert factory.calls == 2
+
+    asyncio.run(main())
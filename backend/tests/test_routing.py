@@ -0,0 +1,72 @@
+import pytest
+
+from app.database import routing
+from app.database.routing import ReplicaRouter
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(routing.time, "monotonic", clock)
+    return clock
+
+
+def _router(lag: float = 0.0, **options) -> ReplicaRouter:
+    # Engines are only handed back, never used
+    router = ReplicaRouter("primary", {"replica": "replica"}, **options)
+    router.replicas[0].healthy = True
+    router.replicas[0].lag_seconds = lag
+    return router
+
+
+def test_reads_go_to_healthy_replica():
+    router = _router()
+    assert router.read_engine(1) == "replica"
+    assert router.read_engine(None) == "replica"
+
+
+def test_read_your_writes_window(clock):
+    router = _router(read_your_writes_seconds=5)
+    router.note_write(1)
+
+    assert router.read_engine(1) == "primary"
+    assert router.read_engine(2) == "replica"
+
+    clock.now += 5
+    assert router.read_engine(1) == "replica"
+    assert router.stats()["recent_writers"] == 0
+
+
+def test_window_covers_replica_lag(clock):
+    router = _router(lag=8, max_lag_seconds=10, read_your_writes_seconds=5)
+    router.note_write(1)
+
+    clock.now += 6
+    assert router.read_engine(1) == "primary"
+    clock.now += 2
+    assert router.read_engine(1) == "replica"
+
+
+def test_lagging_or_unhealthy_replica_falls_back_to_primary():
+    router = _router(lag=30, max_lag_seconds=10)
+    assert router.read_engine(1) == "primary"
+
+    router.replicas[0].lag_seconds = 0
+    router.replicas[0].healthy = False
+    assert router.read_engine(1) == "primary"
+    assert router.fallbacks == 2
+
+
+def test_no_replicas_uses_primary():
+    router = ReplicaRouter("primary", {})
+    router.note_write(1)
+    assert router.read_engine(1) == "primary"
+    assert not router.enabled
@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+
+from app.chat.stream_registry import ResumeUnavailableError, StreamRegistry
+from tests.fakes import fake_model, fake_stream
+
+
+async def _collect(frames):
+    return [frame async for frame in frames]
+
+
+def _text(frames):
+    return "".join(frame["content"] for frame in frames if frame["type"] == "chunk")
+
+
+def test_resume_replays_tail_then_live_frames():
+    async def main():
+        registry = StreamRegistry(max_bytes=1024, grace_seconds=1, ttl_seconds=1)
+        release = asyncio.Event()
+
+        async def producer(stream):
+            await stream.publish({"type": "chunk", "content": "hello "})
+            await stream.publish({"type": "chunk", "content": "world"})
+            await release.wait()
+            await stream.publish({"type": "chunk", "content": "!"})
+            await stream.publish({"type": "done"})
+
+        stream = registry.start(user_id=1, session_id=1, producer=producer)
+        await asyncio.sleep(0)
+
+        # Client saw "hello wo" and reconnects
+        resumed = asyncio.ensure_future(_collect(stream.subscribe(offset=8)))
+        await asyncio.sleep(0)
+        release.set()
+        frames = await resumed
+
+        assert _text(frames) == "rld!"
+        assert frames[-1]["type"] == "done"
+        assert frames[-2]["offset"] == stream.offset == 12
+
+    asyncio.run(main())
+
+
+def test_resume_from_fake_llm_stream():
+    async def main():
+        registry = StreamRegistry(max_bytes=64 * 1024, grace_seconds=1, ttl_seconds=1)
+        model = fake_model(tokens=20, inter_token_ms=1)
+        expected = "".join([chunk async for chunk in fake_stream(model)()])
+
+        async def producer(stream):
+            async for chunk in fake_stream(model)():
+                await stream.publish({"type": "chunk", "content": chunk})
+            await stream.publish({"type": "done"})
+
+        stream = registry.start(user_id=1, session_id=1, producer=producer)
+        await stream.task
+
+        assert _text(await _collect(stream.subscribe(0))) == expected
+        assert _text(await _collect(stream.subscribe(10))) == expected[10:]
+
+    asyncio.run(main())
+
+
+def test_ring_buffer_evicts_oldest_chunks():
+    async def main():
+        registry = StreamRegistry(max_bytes=10, grace_seconds=1, ttl_seconds=1)
+
+        async def producer(stream):
+            for chunk in ("aaaa", "bbbb", "cccc", "dddd"):
+                await stream.publish({"type": "chunk", "content": chunk})
+            await stream.publish({"type": "done"})
+
+        stream = registry.start(user_id=1, session_id=1, producer=producer)
+        await stream.task
+
+        assert stream.base_offset == 8
+        assert _text(await _collect(stream.subscribe(8))) == "ccccdddd"
+        with pytest.raises(ResumeUnavailableError):
+            stream.subscribe(4)
+        with pytest.raises(ResumeUnavailableError):
+            stream.subscribe(17)
+
+    asyncio.run(main())
+
+
+def test_unattached_stream_is_cancelled_after_grace():
+    async def main():
+        registry = StreamRegistry(max_bytes=1024, grace_seconds=0.05, ttl_seconds=1)
+
+        async def producer(stream):
+            await stream.publish({"type": "chunk", "content": "partial"})
+            await asyncio.sleep(10)
+
+        stream = registry.start(user_id=1, session_id=1, producer=producer)
+        frames = stream.subscribe(0)
+        assert (await frames.__anext__())["content"] == "partial"
+        await frames.aclose()
+
+        await asyncio.sleep(0.1)
+        assert stream.task.cancelled()
+        assert stream.terminal_frame["type"] == "cancelled"
+        assert registry.get(stream.stream_id, user_id=2) is None
+        assert registry.get(stream.stream_id, user_id=1) is stream
+
+    asyncio.run(main())
+
+
+def test_resubscribing_keeps_generation_running():
+    async def main():
+        registry = StreamRegistry(max_bytes=1024, grace_seconds=0.05, ttl_seconds=1)
+        release = asyncio.Event()
+
+        async def producer(stream):
+            await stream.publish({"type": "chunk", "content": "one"})
+            await release.wait()
+            await stream.publish({"type": "done"})
+
+        stream = registry.start(user_id=1, session_id=1, producer=producer)
+        frames = stream.subscribe(0)
+        await frames.__anext__()
+        await frames.aclose()
+
+        resumed = asyncio.ensure_future(_collect(stream.subscribe(3)))
+        await asyncio.sleep(0.1)
+        release.set()
+
+        assert [frame["type"] for frame in await resumed] == ["done"]
+        assert not stream.task.cancelled()
+
+    asyncio.run(main())
@@ -28,7 +28,7 @@ export function ChatProvider({ children }: { children: ReactNode }) {
   const loadSessions = async () => {
     try {
       setIsLoading(true);
-      const data = await chatService.getSessions(50, 0);
+      const data = await chatService.getSessions(50);
       setSessions(data.sessions);
     } catch (error) {
       console.error('Load sessions error:', error);
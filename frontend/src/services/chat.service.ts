@@ -9,6 +9,7 @@ import {
   ChatSessionList,
   ChatSessionWithMessages,
   MessageCreate,
+  MessagePage,
   ChatMessagePair,
 } from "@/types/chat.types";
 
@@ -23,14 +24,15 @@ export async function createSession(
 }
 
 /**
- * Get all chat sessions for current user
+ * Get a page of chat sessions for current user (pass the previous
+ * page's next_cursor for the next page)
  */
 export async function getSessions(
   limit: number = 20,
-  offset: number = 0
+  cursor?: string | null
 ): Promise<ChatSessionList> {
   const response = await apiClient.get<ChatSessionList>("/chat/sessions", {
-    params: { limit, offset },
+    params: cursor ? { limit, cursor } : { limit },
   });
   return response.data;
 }
@@ -47,6 +49,21 @@ export async function getSession(
   return response.data;
 }
 
+/**
+ * Get a page of a session's messages (newest page by default; pass
+ * `before` or `after` cursors from a previous page to move through history)
+ */
+export async function getMessages(
+  sessionId: number,
+  options: { limit?: number; before?: string; after?: string } = {}
+): Promise<MessagePage> {
+  const response = await apiClient.get<MessagePage>(
+    `/chat/sessions/${sessionId}/messages`,
+    { params: options }
+  );
+  return response.data;
+}
+
 /**
  * Update a chat session title
  */
@@ -86,6 +103,7 @@ const chatService = {
   createSession,
   getSessions,
   getSession,
+  getMessages,
   updateSession,
   deleteSession,
   sendMessage,
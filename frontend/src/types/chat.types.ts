@@ -22,11 +22,19 @@ export interface ChatSessionWithMessages extends ChatSession {
   messages: Message[];
 }
 
+export interface MessagePage {
+  messages: Message[];
+  has_more: boolean;
+  before_cursor: string | null;
+  after_cursor: string | null;
+}
+
 export interface ChatSessionList {
   sessions: ChatSession[];
   total: number;
   limit: number;
   offset: number;
+  next_cursor: string | null;
 }
 
 export interface MessageCreate {